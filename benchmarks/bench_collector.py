@@ -0,0 +1,165 @@
+"""
+    Collector load generator for LPS
+
+    Simulates an exam hall of LPS clients uploading to one collector on this
+    machine. Every client holds a keep-alive connection and uploads batches of
+    journal lines in the wire format of session.Uploader, backing off when the
+    collector answers 503. A dashboard polls the aggregates meanwhile. The
+    collector runs in its own process so the clients don't share its GIL.
+
+    Reports accepted events per second, upload and dashboard latency
+    percentiles, refused uploads and the collector's queue and write counters.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_collector.py --clients 200 --duration 10
+"""
+import gzip
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+from proctoring.collector import Collector
+from proctoring.session import Journal, SessionStarted, GazeAway, ProcessViolation, TabActivity
+
+def run_collector(path, conn):
+    """
+    Runs a collector until told to stop, then sends back its counters.
+    """
+    collector = Collector(path, port=0)
+    conn.send(collector.start())
+    conn.recv()
+    collector.stop()
+    conn.send(collector.stats())
+
+def batch_body(events, start):
+    """
+    Returns a compressed batch of synthetic exam events.
+    """
+    now = datetime.now()
+    lines = [Journal.dumps(SessionStarted(now, {"bash"}))] if start else []
+    for i in range(events - len(lines)):
+        kind = random.random()
+        if kind < 0.6:
+            event = GazeAway(time.time(), random.uniform(0.25, 3.0))
+        elif kind < 0.8:
+            event = ProcessViolation(now, random.randint(1000, 60000), random.choice(["discord", "slack", "bash"]))
+        else:
+            event = TabActivity(now, "navigated", f"https://canvas.test/courses/{i % 7}/quizzes/{i % 13}")
+        lines.append(Journal.dumps(event))
+    return gzip.compress(("\n".join(lines) + "\n").encode())
+
+async def request(reader, writer, method, path, headers, body):
+    """
+    Sends a request on a keep-alive connection.
+
+    Returns:
+        tuple: Status code and Retry-After header.
+    """
+    head = [f"{method} {path} HTTP/1.1", "Host: collector", f"Content-Length: {len(body)}"]
+    head.extend(f"{name}: {value}" for name, value in headers.items())
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+    status = int((await reader.readline()).split()[1])
+    length, retry_after = 0, None
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "retry-after":
+            retry_after = float(value)
+    await reader.readexactly(length)
+    return status, retry_after
+
+async def client(index, port, deadline, bodies, interval, latencies, counters):
+    """
+    Uploads batches until the deadline, one at a time like the upload client.
+    Batches are prepared up front so the load generator isn't the bottleneck.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    session = f"session-{index:04d}"
+    # Spread the clients over the first interval like an exam hall starting
+    await asyncio.sleep(random.uniform(0, interval))
+    sequence = 0
+    while time.monotonic() < deadline:
+        body = bodies[0] if sequence == 0 else random.choice(bodies[1:])
+        headers = {"Content-Encoding": "gzip", "Content-Type": "application/x-ndjson", "X-LPS-Session": session,
+                   "X-LPS-Student": f"student-{index:04d}", "X-LPS-Batch": sequence}
+        start = time.perf_counter()
+        status, retry_after = await request(reader, writer, "POST", "/events", headers, body)
+        latencies.append(time.perf_counter() - start)
+        if status == 204:
+            counters["events"] += counters["per_batch"]
+            sequence += 1
+            await asyncio.sleep(interval)
+        else:
+            counters["refused"] += 1
+            await asyncio.sleep(retry_after or 1)
+    writer.close()
+
+async def dashboard(port, deadline, latencies):
+    """
+    Polls the aggregates of all students once a second.
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        await request(reader, writer, "GET", "/students", {}, b"")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(1)
+    writer.close()
+
+async def load(port, args):
+    """
+    Runs all clients and the dashboard.
+
+    Returns:
+        tuple: Upload latencies, dashboard latencies, counters and elapsed seconds.
+    """
+    latencies, queries, counters = [], [], {"events": 0, "refused": 0, "per_batch": args.events}
+    bodies = [batch_body(args.events, True)] + [batch_body(args.events, False) for _ in range(50)]
+    start = time.monotonic()
+    deadline = start + args.duration
+    await asyncio.gather(dashboard(port, deadline, queries),
+                         *(client(i, port, deadline, bodies, args.interval, latencies, counters)
+                           for i in range(args.clients)))
+    return latencies, queries, counters, time.monotonic() - start
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def main():
+    """
+    Runs the load against a fresh collector and prints the results.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--events", type=int, default=100, help="events per batch")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between batches of a client, 0 uploads back to back")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=run_collector, args=(f"{folder}/collector.sqlite3", child))
+        process.start()
+        port = parent.recv()
+        latencies, queries, counters, elapsed = asyncio.run(load(port, args))
+        parent.send("stop")
+        stats = parent.recv()
+        process.join()
+
+    offered = args.clients * args.events / args.interval if args.interval else float("inf")
+    print(f"{args.clients} clients, {args.events} events per batch, offered {offered:.0f} events/s")
+    print(f"accepted {counters['events'] / elapsed:.0f} events/s, {len(latencies) / elapsed:.0f} uploads/s, "
+          f"refused {counters['refused']}")
+    print(f"upload latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"p99.9 {percentile(latencies, 0.999) * 1000:.1f} ms, max {max(latencies, default=0) * 1000:.1f} ms")
+    print(f"dashboard latency p50 {percentile(queries, 0.5) * 1000:.1f} ms, max {max(queries, default=0) * 1000:.1f} ms")
+    print(f"collector: {stats['written']} events written in {stats['transactions']} transactions, "
+          f"peak queue {stats['peak_queue']}, {stats['students']} students")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+    Exec gate benchmark for LPS
+
+    Measures the latency of starting a whitelisted program without and with
+    the exec permission gate. Runs the programs as nobody so only they are
+    gated, needs root and fanotify.
+
+    Usage: sudo PYTHONPATH=src python benchmarks/bench_execgate.py
+"""
+import pwd
+import time
+import subprocess
+
+from proctoring.processes.execgate import ExecGate
+
+EXECS = 500
+
+def spawn(user):
+    """
+    Starts a whitelisted program EXECS times.
+
+    Returns:
+        float: Mean microseconds per start.
+    """
+    start = time.perf_counter()
+    for _ in range(EXECS):
+        subprocess.run(["/bin/true"], user=user)
+    return (time.perf_counter() - start) / EXECS * 1e6
+
+def main():
+    """
+    Prints the start latency without and with the gate.
+    """
+    nobody = pwd.getpwnam("nobody").pw_uid
+    ungated = spawn(nobody)
+    gate = ExecGate(nobody, ["true"], set(), lambda pid, name: None)
+    gate.start()
+    try:
+        gated = spawn(nobody)
+    finally:
+        gate.stop()
+    print(f"{'ungated':>10}{'gated':>10}{'overhead':>10}")
+    print(f"{ungated:>8.0f}us{gated:>8.0f}us{gated - ungated:>8.0f}us")
+    print(f"verdicts: {gate.stats()}")
+
+if __name__ == "__main__":
+    main()
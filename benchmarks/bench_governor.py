@@ -0,0 +1,140 @@
+"""
+    Resource governor benchmark for LPS
+
+    Emulates a small laptop by running on at most two CPUs. A stand-in browser
+    renders a fixed amount of work every 100 ms next to CPU-bound stand-ins for
+    the gaze tracker and the process scanner, once without and once with the
+    resource governor. Responsiveness is how long a browser frame takes and how
+    late its timer fires.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_governor.py
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+from proctoring.workers import WorkerFactory
+from proctoring.governor import Governor
+
+DURATION = 15
+CPUS = 2
+FRAME_PERIOD = 0.1
+FRAME_WORK = 200000
+
+def browser(stop, results):
+    """
+    Stand-in browser rendering a frame every period.
+    """
+    lateness, frames = [], []
+    due = time.perf_counter()
+    while not stop.is_set():
+        due += FRAME_PERIOD
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lateness.append(max(0.0, time.perf_counter() - due))
+        start = time.perf_counter()
+        sum(i * i for i in range(FRAME_WORK))
+        frames.append(time.perf_counter() - start)
+    results.put({"lateness": lateness, "frames": frames})
+
+def gaze(stop, throttle):
+    """
+    Stand-in gaze tracker running matrix products as fast as allowed.
+    """
+    import numpy as np
+    if throttle is not None:
+        Governor.apply("gaze")
+    matrix = np.random.rand(192, 192)
+    while not stop.is_set():
+        frame_start = time.perf_counter()
+        for _ in range(20):
+            matrix @ matrix
+        Governor.pace(throttle, frame_start)
+
+def scanner(stop, throttle):
+    """
+    Stand-in process scanner listing all processes every scan interval.
+    """
+    import psutil
+    if throttle is not None:
+        Governor.apply("process_monitor")
+    while not stop.wait(Governor.SCAN_INTERVAL[throttle.value if throttle else 0]):
+        for _ in psutil.process_iter(["pid", "name", "username"]):
+            pass
+
+def run(governed):
+    """
+    Runs the stand-ins for the benchmark duration.
+
+    Args:
+        governed (bool): Whether the resource governor is used.
+
+    Returns:
+        dict: Frame time and timer lateness percentiles in milliseconds, and the
+            highest throttle level reached.
+    """
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[:CPUS])
+    if governed:
+        Governor.limit_threads()
+    factory = WorkerFactory(["numpy", "psutil", "proctoring.governor"])
+    factory.warm()
+    context = factory.context
+    events, results, stop = context.Queue(), context.Queue(), context.Event()
+    governor = Governor(context, interval=1.0) if governed else None
+    throttle = governor.throttle if governor else None
+
+    workers = [
+        factory.start("browser", browser, (stop, results), events),
+        factory.start("gaze", gaze, (stop, throttle), events),
+        factory.start("process_monitor", scanner, (stop, throttle), events)
+    ]
+    if governor:
+        governor.start(workers[0].pid)
+    time.sleep(DURATION)
+    if governor:
+        governor.stop()
+    stop.set()
+    measured = results.get()
+    for worker in workers:
+        worker.join()
+
+    percentile = lambda values, p: sorted(values)[int(len(values) * p)] * 1000
+    return {
+        "frame_p50_ms": percentile(measured["frames"], 0.5),
+        "frame_p99_ms": percentile(measured["frames"], 0.99),
+        "lateness_p50_ms": percentile(measured["lateness"], 0.5),
+        "lateness_p99_ms": percentile(measured["lateness"], 0.99),
+        "frames": len(measured["frames"]),
+        "max_throttle_level": governor.max_level if governor else 0
+    }
+
+def main():
+    """
+    Runs both modes in fresh interpreters, as thread limits only apply at startup.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["governed", "ungoverned"])
+    args = parser.parse_args()
+    if args.mode:
+        print(json.dumps(run(args.mode == "governed")))
+        return
+
+    results = {}
+    for mode in ("ungoverned", "governed"):
+        child = subprocess.run([sys.executable, __file__, "--mode", mode], capture_output=True, text=True, check=True)
+        results[mode] = json.loads(child.stdout.strip().splitlines()[-1])
+
+    expected = DURATION / FRAME_PERIOD
+    print(f"{'':<22}{'ungoverned':>12}{'governed':>12}")
+    for key in ("frame_p50_ms", "frame_p99_ms", "lateness_p50_ms", "lateness_p99_ms"):
+        print(f"{key:<22}" + "".join(f"{results[mode][key]:>12.1f}" for mode in results))
+    print(f"{'frames rendered':<22}" + "".join(f"{results[mode]['frames']:>7}/{expected:<4.0f}" for mode in results))
+    print(f"{'max throttle level':<22}" + "".join(f"{results[mode]['max_throttle_level']:>12}" for mode in results))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+    Session journal benchmark for LPS
+
+    Appends a mix of session events to a journal in a temporary directory with
+    different sync intervals and reports throughput, append latency and the
+    number of fsyncs. A sync interval of 0 commits every event on its own.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_journal.py
+"""
+import os
+import time
+import tempfile
+import statistics
+from datetime import datetime
+
+from proctoring.session import Journal, GazeAway, ProcessViolation, TabActivity, ProxyStatus
+
+EVENTS = 20000
+SYNC_INTERVALS = [0, 0.01, 0.1, 1.0]
+
+def events(count):
+    """
+    Generates a mix of session events.
+    """
+    now = datetime.now()
+    mix = [
+        GazeAway(time.time(), 1.25),
+        ProcessViolation(now, 4242, "discord"),
+        TabActivity(now, "navigated", "https://canvas.kth.se/courses/12345/quizzes/678"),
+        ProxyStatus({"requests": 1200, "requests_per_second": 4.2, "errors": 0, "blocked": 3,
+                     "upstream_latency_ms": 35.1, "upstream_latency_max_ms": 410.0})
+    ]
+    return [mix[i % len(mix)] for i in range(count)]
+
+def run(sync_interval, count):
+    """
+    Appends events to a fresh journal.
+
+    Returns:
+        dict: Events per second, append latency percentiles in microseconds and fsyncs.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        journal = Journal(os.path.join(folder, "session.jsonl"), sync_interval)
+        latencies = []
+        start = time.perf_counter()
+        for event in events(count):
+            before = time.perf_counter()
+            journal.append(event)
+            latencies.append(time.perf_counter() - before)
+        journal.close()
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(journal.path)
+
+    latencies.sort()
+    return {
+        "events_per_second": count / elapsed,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p99_us": latencies[int(len(latencies) * 0.99)] * 1e6,
+        "mean_us": statistics.fmean(latencies) * 1e6,
+        "commits": journal.commits,
+        "bytes_per_event": size / count
+    }
+
+def main():
+    """
+    Runs the benchmark for every sync interval and prints the results.
+    """
+    print(f"{'sync interval':>14}{'events/s':>12}{'p50':>10}{'p99':>10}{'fsyncs':>8}{'bytes/event':>13}")
+    for sync_interval in SYNC_INTERVALS:
+        # Committing every event is slow, fewer events are enough to measure it
+        result = run(sync_interval, EVENTS // 10 if sync_interval == 0 else EVENTS)
+        print(f"{sync_interval:>12} s{result['events_per_second']:>12.0f}{result['p50_us']:>8.1f}us"
+              f"{result['p99_us']:>8.1f}us{result['commits']:>8}{result['bytes_per_event']:>13.0f}")
+
+if __name__ == "__main__":
+    main()
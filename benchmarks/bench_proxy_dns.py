@@ -0,0 +1,125 @@
+"""
+    Exam proxy DNS cache benchmark for LPS
+
+    Loads a page fanning out to several hosts through the exam proxy, against
+    a local stand-in origin that adds latency to every new connection and
+    request and a stand-in resolver that adds latency to every lookup. Measures
+    time to first byte of the page and time until all assets are loaded, on
+    the first load and on a reload with new connections, without the DNS cache,
+    with it and with it warmed at proxy start.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_proxy_dns.py
+"""
+import time
+import asyncio
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from proctoring.browser import whitelist_mitm
+from proctoring.browser.proxy import ProxyEngine
+from proctoring.browser.dns_mitm import DnsCache
+
+HOSTS = ["canvas.test", "du11hjcvx0uqb.cloudfront.test", "instructure-uploads.amazonaws.test",
+         "login.ug.test", "sso.canvaslms.test"]
+ASSETS_PER_HOST = 6
+DNS_DELAY = 0.04
+CONNECT_DELAY = 0.03
+REQUEST_DELAY = 0.005
+
+class Origin(BaseHTTPRequestHandler):
+    """
+    Stand-in origin with a delay per new connection, like TCP and TLS
+    handshakes with a distant server, and per request.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        time.sleep(CONNECT_DELAY)
+        super().setup()
+
+    def do_GET(self):
+        time.sleep(REQUEST_DELAY)
+        body = b"x" * 2048
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+async def resolve(host):
+    """
+    Stand-in resolver with a lookup delay, every host is the local origin.
+    """
+    await asyncio.sleep(DNS_DELAY)
+    return ["127.0.0.1"], 300
+
+def load(proxy_port, origin_port):
+    """
+    Loads the page, then the assets of every host in parallel over one keep-alive connection per host.
+
+    Returns:
+        tuple: Seconds to the first byte of the page and to the last asset.
+    """
+    start = time.perf_counter()
+
+    def fetch(host, paths):
+        conn = http.client.HTTPConnection("127.0.0.1", proxy_port, timeout=30)
+        first = None
+        for path in paths:
+            conn.request("GET", f"http://{host}:{origin_port}{path}")
+            response = conn.getresponse()
+            response.read(1)
+            first = first or time.perf_counter()
+            response.read()
+        conn.close()
+        return first
+
+    ttfb = fetch(HOSTS[0], ["/"]) - start
+    with ThreadPoolExecutor(len(HOSTS)) as pool:
+        list(pool.map(fetch, HOSTS, [[f"/asset-{i}.js" for i in range(ASSETS_PER_HOST)]] * len(HOSTS)))
+    return ttfb, time.perf_counter() - start
+
+def measure(cache, warm, origin_port):
+    """
+    Loads the page twice through a fresh proxy.
+
+    Args:
+        cache (bool): Cache DNS answers for their TTL.
+        warm (bool): Resolve all hosts when the proxy starts.
+        origin_port (int): Port of the stand-in origin.
+
+    Returns:
+        list: TTFB and page load seconds of the first load and the reload.
+    """
+    engine = ProxyEngine(port=0)
+    engine.dns.cache = DnsCache(resolve, max_ttl=DnsCache.MAX_TTL if cache else 0)
+    engine.dns.warm_hosts = HOSTS if warm else []
+    port = engine.start()
+    try:
+        # Warming runs while the exam window opens, give it that time
+        time.sleep(2 * DNS_DELAY)
+        return [load(port, origin_port), load(port, origin_port)]
+    finally:
+        engine.stop()
+
+def main():
+    """
+    Prints TTFB and page load times for each configuration.
+    """
+    whitelist_mitm.WHITELIST_PATTERNS = [whitelist_mitm.format_domain_pattern(host) for host in HOSTS]
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    print(f"{'dns':>12}{'ttfb':>10}{'load':>10}{'ttfb reload':>14}{'reload':>10}")
+    for name, cache, warm in [("uncached", False, False), ("cached", True, False), ("warmed", True, True)]:
+        (ttfb, page), (reload_ttfb, reload) = measure(cache, warm, port)
+        print(f"{name:>12}{ttfb * 1000:>8.0f}ms{page * 1000:>8.0f}ms{reload_ttfb * 1000:>12.0f}ms{reload * 1000:>8.0f}ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
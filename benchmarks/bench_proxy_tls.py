@@ -0,0 +1,130 @@
+"""
+    Exam proxy TLS benchmark for LPS
+
+    Measures HTTPS through the exam proxy to a local TLS stand-in origin, with
+    whitelisted hosts intercepted and decrypted like before, and relayed
+    without interception. Reports new tunnels per second, each with a TLS
+    handshake and a small request, and bulk throughput over one tunnel.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_proxy_tls.py
+"""
+import os
+import ssl
+import time
+import tempfile
+import threading
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from mitmproxy import certs
+
+from proctoring.browser import whitelist_mitm
+from proctoring.browser.proxy import ProxyEngine
+
+TUNNELS = 200
+DOWNLOADS = 50
+ASSET = os.urandom(1024 * 1024)
+
+class Origin(BaseHTTPRequestHandler):
+    """
+    TLS stand-in origin serving a small page and a large asset with keep-alive.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = ASSET if self.path == "/asset" else b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def origin(folder):
+    """
+    Starts the stand-in origin with a self-signed certificate.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    key, cert = certs.create_ca("LPS benchmark", "127.0.0.1", 2048)
+    path = os.path.join(folder, "origin.pem")
+    with open(path, "wb") as file:
+        file.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        file.write(cert.public_bytes(serialization.Encoding.PEM))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(path)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def connect(proxy_port, origin_port):
+    """
+    Opens a tunnel to the origin through the proxy.
+    """
+    conn = http.client.HTTPSConnection("127.0.0.1", proxy_port, timeout=30, context=ssl._create_unverified_context())
+    conn.set_tunnel("127.0.0.1", origin_port)
+    return conn
+
+def get(conn, path):
+    """
+    Sends a GET request on a connection and reads the whole response.
+    """
+    conn.request("GET", path)
+    return conn.getresponse().read()
+
+def measure(passthrough, origin_port):
+    """
+    Runs both workloads through a fresh proxy.
+
+    Args:
+        passthrough (bool): Relay TLS to whitelisted hosts without interception.
+        origin_port (int): Port of the stand-in origin.
+
+    Returns:
+        tuple: Tunnels per second and megabytes per second.
+    """
+    engine = ProxyEngine(port=0)
+    engine.whitelist.passthrough = passthrough
+    port = engine.start()
+    # The stand-in's certificate is self-signed
+    engine._master.options.update(ssl_insecure=True)
+    try:
+        start = time.perf_counter()
+        for _ in range(TUNNELS):
+            conn = connect(port, origin_port)
+            get(conn, "/")
+            conn.close()
+        tunnels = TUNNELS / (time.perf_counter() - start)
+
+        conn = connect(port, origin_port)
+        get(conn, "/")
+        start = time.perf_counter()
+        for _ in range(DOWNLOADS):
+            get(conn, "/asset")
+        throughput = DOWNLOADS * len(ASSET) / 2**20 / (time.perf_counter() - start)
+        conn.close()
+    finally:
+        engine.stop()
+    return tunnels, throughput
+
+def main():
+    """
+    Prints tunnels per second and throughput with and without interception.
+    """
+    whitelist_mitm.WHITELIST_PATTERNS = [whitelist_mitm.format_domain_pattern("127.0.0.1")]
+    with tempfile.TemporaryDirectory() as folder:
+        server = origin(folder)
+        port = server.server_address[1]
+        print(f"{'mode':>12}{'tunnels/s':>12}{'MB/s':>10}")
+        for name, passthrough in [("intercept", False), ("passthrough", True)]:
+            tunnels, throughput = measure(passthrough, port)
+            print(f"{name:>12}{tunnels:>12.0f}{throughput:>10.0f}")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+    Report benchmark for LPS
+
+    Measures the time from the end of an exam until its report is written, for
+    sessions with a growing number of table rows. Batch renders every row after
+    the exam like a recovered report, incremental renders them while the exam
+    runs and only finishes the report at the end. The gaze-away charts are
+    measured for a 5 hour exam with a growing number of intervals.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_report.py
+"""
+import os
+import time
+import random
+import tempfile
+from array import array
+from datetime import datetime, timedelta
+
+from proctoring.report import Report
+from proctoring.session import ProcessViolation, TabActivity
+
+ROWS = [100, 1000, 10000]
+GAZE_INTERVALS = [1000, 10000, 50000]
+GAZE_EXAM_SECONDS = 5 * 3600
+
+def session(rows):
+    """
+    Builds a session snapshot with half process violations and half tab activity.
+    """
+    start = datetime(2025, 1, 1, 9, 0, 0)
+    violations = [ProcessViolation(start + timedelta(seconds=i), 10000 + i, f"process-{i}") for i in range(0, rows, 2)]
+    tabs = [TabActivity(start + timedelta(seconds=i), "navigated", f"https://canvas.kth.se/courses/{i}") for i in range(1, rows, 2)]
+    return {
+        "start": start, "end": start + timedelta(seconds=rows), "gazeaway": 95.0,
+        "violations": violations, "tabs": tabs,
+        "metrics": [("frames_total", "gaze", 36000), ("scan_seconds_sum", "process_monitor", 1.25)]
+    }
+
+def batch(snapshot):
+    """
+    Renders the whole report after the exam.
+
+    Returns:
+        float: Seconds to write the report.
+    """
+    start = time.perf_counter()
+    Report.generate_report(snapshot, "batch")
+    return time.perf_counter() - start
+
+def incremental(snapshot):
+    """
+    Renders the rows in the background as they arrive and finishes the report at the end.
+
+    Returns:
+        float: Seconds to write the report once the exam ended.
+    """
+    writer = Report.writer(snapshot["start"], "incremental")
+    writer.start()
+    for event in sorted(snapshot["violations"] + snapshot["tabs"], key=lambda event: event.timestamp):
+        writer.add(event)
+    # The rows were drawn during the exam, wait for them outside the measurement
+    while not writer._queue.empty():
+        time.sleep(0.01)
+    start = time.perf_counter()
+    writer.finish(snapshot)
+    return time.perf_counter() - start
+
+def gaze(count):
+    """
+    Finishes a report of a 5 hour exam with gaze-away intervals and no table rows.
+
+    Returns:
+        float: Seconds to write the report.
+    """
+    start = datetime(2025, 1, 1, 9, 0, 0)
+    intervals = array("d")
+    for t in sorted(random.uniform(0, GAZE_EXAM_SECONDS) for _ in range(count)):
+        intervals.extend((start.timestamp() + t, random.uniform(0.25, 3.0)))
+    snapshot = {"start": start, "end": start + timedelta(seconds=GAZE_EXAM_SECONDS), "gazeaway": sum(intervals[1::2]),
+                "gaze_intervals": intervals, "violations": [], "tabs": []}
+    writer = Report.writer(start, "gaze")
+    begin = time.perf_counter()
+    writer.finish(snapshot)
+    return time.perf_counter() - begin
+
+def main():
+    """
+    Runs both approaches for every session size and prints the time to report.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        print(f"{'rows':>8}{'batch':>12}{'incremental':>14}")
+        for rows in ROWS:
+            snapshot = session(rows)
+            print(f"{rows:>8}{batch(snapshot) * 1000:>10.0f}ms{incremental(snapshot) * 1000:>12.0f}ms")
+        print()
+        print(f"{'intervals':>10}{'finish':>10}")
+        for count in GAZE_INTERVALS:
+            print(f"{count:>10}{gaze(count) * 1000:>8.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+    Gaze re-scoring benchmark for LPS
+
+    Records synthetic exam sessions at 30 frames per second and re-scores them
+    for the default grid of thresholds and minimum durations. Compares replaying
+    the frames through Gaze._time for every setting with scoring the whole
+    grid with NumPy, and scoring all sessions in one process with one per core.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_rescore.py --sessions 200 --minutes 60
+"""
+import os
+import time
+import argparse
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from proctoring.gaze import Gaze, rescore
+from proctoring.gaze.recording import GazeRecording
+
+FPS = 30
+
+def record(path, minutes, seed):
+    """
+    Writes a synthetic recording of a session of the given length.
+    """
+    rng = np.random.default_rng(seed)
+    frames = np.empty(int(minutes * 60 * FPS), dtype=GazeRecording.DTYPE)
+    frames["t"] = 1.7e9 + np.cumsum(rng.uniform(0.8, 1.2, len(frames)) / FPS)
+    frames["x"] = np.cumsum(rng.normal(0, 0.01, len(frames))) % 0.4 - 0.2
+    frames["y"] = np.cumsum(rng.normal(0, 0.005, len(frames))) % 0.3 - 0.15
+    np.save(path, frames)
+
+def replay(frames):
+    """
+    Replays a recording through Gaze._time with the live settings.
+
+    Returns:
+        int: Reported gaze-aways.
+    """
+    events = []
+    tracker = Gaze.__new__(Gaze)
+    tracker._queue = SimpleNamespace(put=events.append)
+    tracker._metrics = SimpleNamespace(inc=lambda name: None)
+    tracker._gazeaway = False
+    tracker._track = {}
+    clock = SimpleNamespace(now=0.0)
+    with mock.patch("time.time", lambda: clock.now):
+        for t, x, y in frames.tolist():
+            clock.now = t
+            tracker._track["g_normal"] = (x, y, 1.0)
+            tracker._time()
+    return len(events)
+
+def main():
+    """
+    Records the sessions and prints the scoring times.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    settings = len(rescore.X_THRESHOLDS) * len(rescore.Y_THRESHOLDS) * len(rescore.MIN_DURATIONS)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = [os.path.join(folder, f"session-{i:04d}.npy") for i in range(args.sessions)]
+        for i, path in enumerate(paths):
+            record(path, args.minutes, i)
+        frames = GazeRecording.load(paths[0])
+        print(f"{args.sessions} sessions of {args.minutes:g} minutes, {len(frames)} frames "
+              f"({os.path.getsize(paths[0]) / 2**20:.1f} MiB) each, {settings} settings")
+
+        start = time.perf_counter()
+        replay(frames)
+        replayed = time.perf_counter() - start
+        start = time.perf_counter()
+        rescore.score(frames, rescore.X_THRESHOLDS, rescore.Y_THRESHOLDS, rescore.MIN_DURATIONS)
+        scored = time.perf_counter() - start
+        print(f"one session: replay {replayed * 1e3:.0f} ms per setting, {replayed * settings:.1f} s for the grid, "
+              f"NumPy {scored * 1e3:.0f} ms for the grid ({replayed * settings / scored:.0f}x)")
+
+        for processes in sorted({1, args.processes}):
+            start = time.perf_counter()
+            rescore.rescore(paths, processes=processes)
+            elapsed = time.perf_counter() - start
+            print(f"all sessions, {processes} processes: {elapsed:.2f} s, {args.sessions / elapsed:.1f} sessions/s")
+
+if __name__ == "__main__":
+    main()
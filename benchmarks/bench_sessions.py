@@ -0,0 +1,12 @@
+"""
+    Capacity benchmark for LPS
+
+    Runs the headless session simulator with an increasing number of
+    concurrent exams. See proctoring.simulator for the options.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_sessions.py --sessions 1 4 16 --duration 30
+"""
+from proctoring.simulator import main
+
+if __name__ == "__main__":
+    main()
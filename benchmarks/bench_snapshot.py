@@ -0,0 +1,64 @@
+"""
+    Process snapshot benchmark for LPS
+
+    Compares the startup checks walking the process table once per prohibited
+    name with a single snapshot indexed by name, for growing lists of
+    prohibited applications.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_snapshot.py
+"""
+import time
+
+import psutil
+
+from proctoring.snapshot import ProcessSnapshot
+
+NAMES = [1, 10, 100]
+REPEAT = 5
+
+def per_name(names):
+    """
+    Checks every name with its own walk over all processes, like the startup checks used to.
+    """
+    running = []
+    for name in names:
+        for process in psutil.process_iter():
+            try:
+                if name == process.name().lower():
+                    running.append(name)
+                    break
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+    return running
+
+def single_pass(names):
+    """
+    Checks every name against one snapshot.
+    """
+    snapshot = ProcessSnapshot.take()
+    return [name for name in names if snapshot.running(name)]
+
+def best(function, names):
+    """
+    Returns the fastest of REPEAT runs in milliseconds.
+    """
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function(names)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+def main():
+    """
+    Runs both approaches for every list size and prints the results.
+    """
+    print(f"Processes: {len(psutil.pids())}")
+    print(f"{'names':>6}{'per name':>12}{'snapshot':>12}")
+    for count in NAMES:
+        # Names that aren't running make the per-name walk visit every process
+        names = [f"prohibited-{i}" for i in range(count)]
+        print(f"{count:>6}{best(per_name, names):>10.1f}ms{best(single_pass, names):>10.1f}ms")
+
+if __name__ == "__main__":
+    main()
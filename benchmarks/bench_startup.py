@@ -0,0 +1,103 @@
+"""
+    Startup benchmark for LPS
+
+    Measures what the entry point costs before the first window appears. Runs the
+    entry point in a fresh interpreter under python -X importtime, checks that no
+    heavy monitoring dependency is imported on the way to the window and compares
+    import time and time-to-first-window against their budgets.
+
+    Usage: python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Budgets in seconds, measured on a 2-core student laptop
+IMPORT_BUDGET = 0.25
+WINDOW_BUDGET = 0.5
+
+# Modules that must only be loaded after the window is shown
+HEAVY_MODULES = ["cv2", "mediapipe", "selenium", "webdriver_manager", "psutil", "plyer", "reportlab", "mitmproxy", "numpy"]
+
+# Runs in the child interpreter: load the entry point and draw the window
+PROBE = """
+import sys, json, time, runpy
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+app = runpy.run_path(sys.argv[1] + "/__main__.py", run_name="lps")
+imported = time.perf_counter() - start
+window = None
+try:
+    root, _ = app["create_app"]()
+    root.update()
+    window = time.perf_counter() - start
+    root.destroy()
+except Exception as e:
+    print(f"No window: {e}", file=sys.stderr)
+print(json.dumps({"imported": imported, "window": window}), flush=True)
+"""
+
+def parse_importtime(stderr):
+    """
+    Parses the output of python -X importtime.
+
+    Args:
+        stderr (str): Standard error of the child interpreter.
+
+    Returns:
+        dict: Cumulative import time in seconds by module name.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative_us) / 1e6
+    return modules
+
+def run():
+    """
+    Runs the startup probe in a fresh interpreter.
+
+    Returns:
+        dict: Entry point import time, time-to-first-window (None without a display),
+            wall time until the probe reported, and heavy modules that were imported.
+    """
+    start = time.perf_counter()
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, os.path.abspath(SRC)],
+        capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - start
+    probe = json.loads(child.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(child.stderr)
+    return {
+        "import_time": probe["imported"],
+        "window_time": probe["window"],
+        "wall_time": wall,
+        "heavy_imported": [m for m in HEAVY_MODULES if m in modules]
+    }
+
+def main():
+    """
+    Prints the startup measurements and exits non-zero when a budget is exceeded.
+    """
+    result = run()
+    print(f"Entry point import time: {result['import_time'] * 1000:.0f} ms (budget {IMPORT_BUDGET * 1000:.0f} ms)")
+    if result["window_time"] is not None:
+        print(f"Time to first window:    {result['window_time'] * 1000:.0f} ms (budget {WINDOW_BUDGET * 1000:.0f} ms)")
+    else:
+        print("Time to first window:    skipped, no display available")
+    print(f"Heavy modules imported:  {result['heavy_imported'] or 'none'}")
+
+    failed = bool(result["heavy_imported"]) or result["import_time"] > IMPORT_BUDGET
+    if result["window_time"] is not None and result["window_time"] > WINDOW_BUDGET:
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+    Worker supervision benchmark for LPS
+
+    Crashes and stalls a supervised worker forked from the zygote preloaded
+    with the modules of the proctoring system, and reports how long the
+    supervisor takes to notice, how long the restarted worker takes to run
+    again and how long the component wasn't covered. Also reports the cost of
+    a heartbeat in the main loop of a component.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_supervisor.py --trials 10 --stall-timeout 2
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import tempfile
+
+from proctoring.proctoring import Proctoring
+from proctoring.workers import WorkerFactory
+from proctoring.supervisor import Supervisor
+
+def flaky(flag, failure, stop):
+    """
+    Worker target beating like a component at 30 frames per second, crashing
+    or stalling once after a moment on its first run.
+    """
+    first = not os.path.exists(flag)
+    if first:
+        open(flag, "w").close()
+    failing = time.monotonic() + 0.5
+    while not stop.wait(1 / 30):
+        Supervisor.beat()
+        if first and time.monotonic() > failing:
+            if failure == "crash":
+                sys.exit(1)
+            time.sleep(3600)
+
+def trial(factory, failure, stall_timeout, folder):
+    """
+    Runs one failure of a supervised worker.
+
+    Returns:
+        CoverageGap: The gap the failure caused.
+    """
+    stop = factory.context.Event()
+    events = factory.context.Queue()
+    supervisor = Supervisor(factory, events, stall_timeout=stall_timeout)
+    supervisor.supervise("bench", flaky, (os.path.join(folder, f"{failure}-{time.monotonic_ns()}"), failure, stop))
+    supervisor.start()
+    while not supervisor.gaps:
+        time.sleep(0.01)
+    supervisor.stop()
+    stop.set()
+    return supervisor.gaps[0]
+
+def main():
+    """
+    Runs the trials and prints the latencies.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--stall-timeout", type=float, default=2.0, help="seconds without a heartbeat until a worker counts as stalled")
+    args = parser.parse_args()
+
+    factory = WorkerFactory(Proctoring.PRELOAD_MODULES)
+    factory.warm()
+    heartbeat = factory.context.Value("d", 0.0, lock=False)
+    Supervisor.install(heartbeat)
+    start = time.perf_counter()
+    for _ in range(100000):
+        Supervisor.beat()
+    print(f"heartbeat: {(time.perf_counter() - start) / 100000 * 1e9:.0f} ns per beat")
+    Supervisor.install(None)
+
+    print(f"{args.trials} trials per failure, checked every {Supervisor.INTERVAL} s, stall timeout {args.stall_timeout} s")
+    print(f"{'failure':<10}{'detection p50':>15}{'max':>8}{'restart p50':>13}{'max':>8}{'gap p50':>10}{'max':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for failure in ("crash", "stall"):
+            gaps = [trial(factory, failure, args.stall_timeout, folder) for _ in range(args.trials)]
+            columns = []
+            for values in ([gap.detection for gap in gaps], [gap.restart for gap in gaps], [gap.duration for gap in gaps]):
+                columns.append(f"{statistics.median(values) * 1000:>9.0f} ms{max(values) * 1000:>5.0f} ms")
+            print(f"{failure:<10}{columns[0]:>19}{columns[1]:>19}{columns[2]:>16}")
+
+if __name__ == "__main__":
+    main()
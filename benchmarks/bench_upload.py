@@ -0,0 +1,96 @@
+"""
+    Session upload benchmark for LPS
+
+    Streams events through the upload client to a local stand-in collector,
+    once answering immediately and once with a delay per request like a
+    distant or overloaded collector. Reports upload throughput, the cost of
+    adding an event on the session thread, compression ratio and peak
+    buffered events.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_upload.py
+"""
+import time
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from proctoring.session import Uploader, ProcessViolation, TabActivity
+
+EVENTS = 50000
+SLOW_DELAY = 0.2
+
+class Collector(BaseHTTPRequestHandler):
+    """
+    Stand-in collector discarding uploads after a configurable delay.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.delay)
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def events():
+    """
+    Returns a mix of session events like a busy exam produces.
+    """
+    now = datetime.now()
+    return [ProcessViolation(now, i, f"process-{i % 40}") if i % 2 else
+            TabActivity(now, "navigated", f"https://canvas.test/courses/{i % 7}/quizzes/{i % 13}")
+            for i in range(EVENTS)]
+
+def measure(delay, folder):
+    """
+    Adds all events, then closes the uploader once they are delivered.
+
+    Args:
+        delay (float): Seconds the collector waits per request.
+        folder (str): Spool folder.
+
+    Returns:
+        dict: Throughput, add latency, compression ratio and peak buffer.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Collector)
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    uploader = Uploader(f"http://127.0.0.1:{server.server_address[1]}", f"session-{delay}", "student", folder)
+    uploader.start()
+
+    latencies = []
+    peak = 0
+    start = time.perf_counter()
+    for event in events():
+        before = time.perf_counter()
+        uploader.add(event)
+        latencies.append(time.perf_counter() - before)
+        peak = max(peak, len(uploader._buffer))
+    uploader.close()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    latencies.sort()
+    stats = uploader.stats()
+    return {"events/s": stats["uploaded"] / elapsed, "p50 add": latencies[len(latencies) // 2],
+            "p99 add": latencies[int(len(latencies) * 0.99)], "ratio": stats["raw_bytes"] / max(1, stats["sent_bytes"]),
+            "peak": peak, "spooled": stats["spooled"]}
+
+def main():
+    """
+    Prints upload throughput and add latency with a fast and a slow collector.
+    """
+    print(f"{'collector':>10}{'events/s':>10}{'p50 add':>10}{'p99 add':>10}{'ratio':>7}{'peak':>7}{'spooled':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, delay in [("fast", 0), ("slow", SLOW_DELAY)]:
+            result = measure(delay, folder)
+            print(f"{name:>10}{result['events/s']:>10.0f}{result['p50 add'] * 1e6:>8.1f}us{result['p99 add'] * 1e6:>8.1f}us"
+                  f"{result['ratio']:>7.1f}{result['peak']:>7}{result['spooled']:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+    Worker start benchmark for LPS
+
+    Starts the three monitoring component workers with the spawn start method,
+    which imports every component in each worker, and from the preloaded
+    forkserver zygote used by the proctoring system. Reports the spawn latency
+    per component and the memory of all proctoring processes while the workers
+    are idle.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_workers.py
+"""
+import time
+import multiprocessing
+
+from proctoring.proctoring import Proctoring
+from proctoring.workers import WorkerFactory, _bootstrap
+from proctoring.session import WorkerStarted
+
+COMPONENTS = {
+    "gaze": ["proctoring.gaze.gaze"],
+    "browser": ["proctoring.browser.browser"],
+    "process_monitor": ["proctoring.processes.processes"]
+}
+
+def idle(stop):
+    """
+    Worker target waiting until the benchmark is done.
+    """
+    stop.wait()
+
+def run_spawn():
+    """
+    Starts every component in a fresh interpreter.
+
+    Returns:
+        tuple: Spawn latency in seconds per component and the MemoryUsage.
+    """
+    context = multiprocessing.get_context("spawn")
+    events, stop = context.Queue(), context.Event()
+    workers = []
+    for component, modules in COMPONENTS.items():
+        workers.append(context.Process(target=_bootstrap, args=(component, time.monotonic(), modules, events, idle, (stop,))))
+        workers[-1].start()
+    return collect(events, stop, workers)
+
+def run_zygote():
+    """
+    Starts every component from a warm, preloaded forkserver zygote.
+
+    Returns:
+        tuple: Spawn latency in seconds per component and the MemoryUsage.
+    """
+    factory = WorkerFactory([m for m in Proctoring.PRELOAD_MODULES if m != "__main__"])
+    context = factory.context
+    events, stop = context.Queue(), context.Event()
+
+    # The zygote is started when the GUI is idle, well before the exam starts
+    factory.warm()
+    factory.start("warmup", idle, (stop,), events)
+    events.get()
+
+    workers = [factory.start(component, idle, (stop,), events) for component in COMPONENTS]
+    return collect(events, stop, workers)
+
+def collect(events, stop, workers):
+    """
+    Waits for all workers to report, measures memory and stops them.
+
+    Returns:
+        tuple: Spawn latency in seconds per component and the MemoryUsage.
+    """
+    latencies = {}
+    while len(latencies) < len(COMPONENTS):
+        event = events.get(timeout=120)
+        if isinstance(event, WorkerStarted) and event.component in COMPONENTS:
+            latencies[event.component] = event.latency
+    memory = WorkerFactory.memory()
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return latencies, memory
+
+def main():
+    """
+    Runs both start methods and prints latency and memory side by side.
+    """
+    results = {"spawn": run_spawn(), "zygote": run_zygote()}
+    print(f"{'component':<18}" + "".join(f"{method:>12}" for method in results))
+    for component in COMPONENTS:
+        print(f"{component:<18}" + "".join(f"{r[0][component] * 1000:>9.0f} ms" for r in results.values()))
+    for field in ("rss", "pss", "uss"):
+        print(f"{'total ' + field.upper():<18}" + "".join(f"{getattr(r[1], field) / 2**20:>9.0f} MB" for r in results.values()))
+    for method, (_, memory) in results.items():
+        print(f"{method}: {memory.processes} processes, {(memory.rss - memory.pss) / 2**20:.0f} MB shared copy-on-write")
+
+if __name__ == "__main__":
+    main()
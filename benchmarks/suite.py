@@ -0,0 +1,303 @@
+"""
+    Benchmark suite for LPS
+
+    Runs the hot paths of every subsystem without a camera, GPU or network,
+    on synthetic inputs: gaze analysis of a frame, re-scoring a gaze
+    recording, process scans and comparisons of a large process table,
+    whitelist lookups against a long host list, the report of a 10k row exam
+    and event round trips from a worker to the session. Every result is compared with its budget in
+    baseline.json, and the suite exits with status 1 if a benchmark exceeds
+    its budget. Lower is better for every result.
+
+    Usage:
+        PYTHONPATH=src python benchmarks/suite.py                  run all and check the budgets
+        PYTHONPATH=src python benchmarks/suite.py gaze report      run the benchmarks starting with these names
+        PYTHONPATH=src python benchmarks/suite.py --update         store the results as the new baseline
+
+    --update keeps configured budgets and gives new benchmarks a budget of
+    HEADROOM times their result. Tighten or loosen budgets by editing the file.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import statistics
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+HEADROOM = 2.0
+REPEAT = 5
+
+BENCHMARKS = {}
+
+def benchmark(name, unit):
+    """
+    Registers a benchmark function returning its results by metric name.
+
+    Args:
+        name (str): Name of the benchmark, prefixed to its metric names.
+        unit (str): Unit of the results, for display.
+    """
+    def register(function):
+        BENCHMARKS[name] = (function, unit)
+        return function
+    return register
+
+def best(operation, number, repeat=REPEAT):
+    """
+    Times an operation, the fastest of several rounds like timeit.
+
+    Args:
+        operation (callable): Operation to time.
+        number (int): Calls per round.
+        repeat (int): Rounds.
+
+    Returns:
+        float: Seconds per call in the fastest round.
+    """
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            operation()
+        rounds.append((time.perf_counter() - start) / number)
+    return min(rounds)
+
+@benchmark("gaze", "us")
+def gaze():
+    """
+    Gaze._analyze on one 640x480 frame, with the face detector replaced by
+    recorded landmarks of a face looking slightly off screen.
+    """
+    import numpy as np
+    from proctoring.gaze import Gaze
+
+    rng = random.Random(1)
+    landmarks = [SimpleNamespace(x=rng.uniform(0.3, 0.7), y=rng.uniform(0.3, 0.7), z=rng.uniform(-0.05, 0.05))
+                 for _ in range(478)]
+    result = SimpleNamespace(face_landmarks=[landmarks])
+    tracker = Gaze.__new__(Gaze)
+    tracker._frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    tracker._detector = SimpleNamespace(detect=lambda image: result)
+    tracker._frames = 1
+    tracker._track = {"y_running_average": 0, "g_normal": None}
+
+    def analyze():
+        tracker._frames += 1
+        tracker._analyze()
+    return {"analyze": best(analyze, 2000) * 1e6}
+
+@benchmark("rescore", "ms")
+def rescore():
+    """
+    rescore.score of a one hour gaze recording at 30 frames per second for
+    the default grid of thresholds and minimum durations.
+    """
+    import bench_rescore
+    from proctoring.gaze import rescore
+    from proctoring.gaze.recording import GazeRecording
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "session.npy")
+        bench_rescore.record(path, 60, 1)
+        frames = GazeRecording.load(path)
+    grid = (rescore.X_THRESHOLDS, rescore.Y_THRESHOLDS, rescore.MIN_DURATIONS)
+    return {"grid_1h": best(lambda: rescore.score(frames, *grid), 3) * 1e3}
+
+def process_table(count, churn, seed):
+    """
+    Builds a synthetic process table like psutil.process_iter yields it.
+
+    Args:
+        count (int): Processes in the table.
+        churn (float): Fraction of processes replaced by new ones.
+        seed (int): Seed of the table.
+
+    Returns:
+        list: Objects with an info dict of pid, name and username.
+    """
+    rng = random.Random(seed)
+    names = [f"process-{i}" for i in range(count // 8)]
+    processes = []
+    for pid in range(1000, 1000 + count):
+        if rng.random() < churn:
+            pid += 10 * count
+        username = "student" if pid % 4 else "root"
+        processes.append(SimpleNamespace(info={"pid": pid, "name": names[pid % len(names)], "username": username}))
+    return processes
+
+@benchmark("processes", "ms")
+def processes():
+    """
+    ProcessMonitor._get_user_processes on a table of 5000 processes and
+    _compare_processes between two scans with 2% of the processes replaced.
+    """
+    from proctoring.processes.processes import ProcessMonitor
+
+    monitor = ProcessMonitor(queue.Queue(), queue.Queue())
+    monitor.username = "student"
+    old, new = process_table(5000, 0, 1), process_table(5000, 0.02, 1)
+    with mock.patch("psutil.process_iter", lambda attrs: iter(old)):
+        previous = monitor._get_user_processes()
+    with mock.patch("psutil.process_iter", lambda attrs: iter(new)):
+        scan = best(monitor._get_user_processes, 20) * 1e3
+        current = monitor._get_user_processes()
+    compare = best(lambda: monitor._compare_processes(previous, current), 50) * 1e3
+    return {"scan_5k": scan, "compare_5k": compare}
+
+@benchmark("whitelist", "us")
+def whitelist():
+    """
+    whitelist_mitm.is_whitelisted with 1000 whitelisted domains, for hosts
+    matching early, late and not at all.
+    """
+    from proctoring.browser import whitelist_mitm
+
+    domains = [f"site-{i}.example.test" for i in range(1000)]
+    patterns = whitelist_mitm.WHITELIST_PATTERNS
+    whitelist_mitm.WHITELIST_PATTERNS = [whitelist_mitm.format_domain_pattern(domain) for domain in domains]
+    try:
+        hosts = {"first": "cdn.site-0.example.test", "last": "cdn.site-999.example.test", "miss": "tracker.ads.test"}
+        return {f"lookup_1k_{case}": best(lambda: whitelist_mitm.is_whitelisted(host), 20) * 1e6
+                for case, host in hosts.items()}
+    finally:
+        whitelist_mitm.WHITELIST_PATTERNS = patterns
+
+@benchmark("report", "ms")
+def report():
+    """
+    Report.generate_report of an exam with 10k table rows, and finishing the
+    incrementally rendered report of the same exam.
+    """
+    import bench_report
+
+    snapshot = bench_report.session(10000)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            generate = min(bench_report.batch(snapshot) for _ in range(3)) * 1e3
+            finish = min(bench_report.incremental(snapshot) for _ in range(3)) * 1e3
+        finally:
+            os.chdir(cwd)
+    return {"generate_10k": generate, "finish_10k": finish}
+
+def send_events(events, count):
+    """
+    Worker target sending gaze-away events stamped with the time they are sent.
+    """
+    from proctoring.session import GazeAway
+    for _ in range(count):
+        events.put(GazeAway(time.time(), 0.0))
+        time.sleep(0.0005)
+
+@benchmark("queue", "ms")
+def round_trip():
+    """
+    Latency of events from a worker of the proctoring system until the
+    session aggregator handled them, over the events queue.
+    """
+    from proctoring.proctoring import Proctoring
+    from proctoring.simulator import SimulatedSession
+
+    count = 2000
+    proctoring = Proctoring(governor=False)
+    events = proctoring._queues["events"]
+    session = SimulatedSession(events)
+    session.start(set())
+    worker = proctoring._workers.start("bench", send_events, (events, count), events)
+    worker.join()
+    while len(session.latencies["GazeAway"]) < count:
+        time.sleep(0.01)
+    session.stop()
+    latencies = sorted(session.latencies["GazeAway"])
+    return {"round_trip_p50": statistics.median(latencies) * 1e3,
+            "round_trip_p99": latencies[int(len(latencies) * 0.99)] * 1e3}
+
+def run(names):
+    """
+    Runs the selected benchmarks.
+
+    Args:
+        names (list): Prefixes of the benchmarks to run, empty for all.
+
+    Returns:
+        dict: Result and unit by metric name.
+    """
+    results = {}
+    for name, (function, unit) in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        for metric, value in function().items():
+            results[f"{name}.{metric}"] = (value, unit)
+    return results
+
+def check(results, baseline):
+    """
+    Compares results with their budgets and prints them.
+
+    Args:
+        results (dict): Result and unit by metric name.
+        baseline (dict): Baseline and budget by metric name.
+
+    Returns:
+        list: Metrics over budget.
+    """
+    failed = []
+    print(f"{'benchmark':<30}{'result':>12}{'baseline':>12}{'budget':>12}  status")
+    for metric, (value, unit) in results.items():
+        entry = baseline.get(metric)
+        if entry is None:
+            print(f"{metric:<30}{value:>10.2f}{unit:<2}{'-':>12}{'-':>12}  new")
+            continue
+        status = "ok" if value <= entry["budget"] else "OVER BUDGET"
+        if value > entry["budget"]:
+            failed.append(metric)
+        print(f"{metric:<30}{value:>10.2f}{unit:<2}{entry['baseline']:>10.2f}{unit:<2}{entry['budget']:>10.2f}{unit:<2}"
+              f"  {status} ({value / entry['baseline']:.2f}x)")
+    return failed
+
+def update(results, baseline):
+    """
+    Stores the results as the baseline, keeping configured budgets.
+
+    Args:
+        results (dict): Result and unit by metric name.
+        baseline (dict): Baseline and budget by metric name, updated in place.
+    """
+    for metric, (value, unit) in results.items():
+        budget = baseline.get(metric, {}).get("budget", round(value * HEADROOM, 3))
+        baseline[metric] = {"baseline": round(value, 3), "budget": budget, "unit": unit}
+    with open(BASELINE, "w") as file:
+        json.dump(dict(sorted(baseline.items())), file, indent=2)
+        file.write("\n")
+
+def main():
+    """
+    Runs the suite and checks or updates the baseline.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", help="run only benchmarks starting with these names")
+    parser.add_argument("--update", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as file:
+            baseline = json.load(file)
+    results = run(args.names)
+    failed = check(results, baseline)
+    if args.update:
+        update(results, baseline)
+        print(f"Baseline updated in {BASELINE}")
+    elif failed:
+        print(f"{len(failed)} benchmarks over budget: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -12,48 +12,64 @@ from tkinter import messagebox
 from proctoring import Proctoring
 from proctoring.examGUI import ExamGUI
 
-def main():
+# Milliseconds between checks for the process snapshot when starting an exam
+SNAPSHOT_POLL_MS = 20
+
+def create_app(demo=False, cache=False, governor=True, enforce=False, upload=None, profile=None, record_gaze=False):
     """
-    Initialize and run the LPS application.
+    Create the main window and connect it to the proctoring system.
     
-    Sets up the GUI, processes command line arguments, and establishes the connection
-    between the GUI controls and the proctoring system functionality.
+    Only the GUI and the lightweight proctoring core are loaded here, monitoring
+    components are imported when first needed or by Proctoring.preload.
     
-    Command line arguments:
-        -h, --help: Display help message
-        -d, --demo: Run in demo mode with camera feed for eye tracking
+    Args:
+        demo (bool): Run in demo mode with camera feed for eye tracking.
+        cache (bool): Cache static assets of whitelisted sites in the exam proxy.
+        governor (bool): Limit the CPU use of the monitoring components.
+        enforce (bool): Deny unauthorized programs before they run.
+        upload (str): URL of the collector to upload sessions to.
+        profile (str): Profile the monitoring components, "cprofile" or "sample".
+        record_gaze (bool): Record the gaze vector of every frame for re-scoring.
+        
+    Returns:
+        tuple: The Tk root window and the Proctoring instance.
     """
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(prog='LPS', add_help=False)
-    parser.add_argument('-h', '--help', help="show this help message and exit", action="store_true")
-    parser.add_argument('-d', '--demo', help="run the program in demo mode", action="store_true")
-    args = vars(parser.parse_args())
-
-    # Display help if requested and exit
-    if args["help"]:
-        parser.print_help()
-        return
-
-    # Initialize proctoring system
-    proctoring = Proctoring(demo=args["demo"])
-    
-    # Set up GUI window and components
+    # Set up GUI window and components first so it shows immediately
     root = tk.Tk()
     app = ExamGUI(root)
+
+    # Initialize proctoring system, heavy components are loaded lazily
+    proctoring = Proctoring(demo=demo, cache=cache, governor=governor, enforce=enforce, upload=upload,
+                            profile=profile, record_gaze=record_gaze)
     
     # Callback functions for GUI buttons
     def start_exam():
         """Handle exam start button click."""
         if not proctoring.running:
-            valid, message = proctoring.valid_startup()
-            if valid:
-                proctoring.start_exam()
-            else:
-                messagebox.showerror("Invalid Startup", 
-                    f"Please close the following programs before starting:\n{message}")
+            # Check the processes running now, not when the window opened
+            app.start_button.configure(state="disabled")
+            proctoring.snapshots.refresh()
+            check_startup()
         else:
             messagebox.showinfo("Exam Status", "An exam is already running.")
 
+    def check_startup():
+        """Start the exam once the process snapshot is taken, keeping the window responsive meanwhile."""
+        if not proctoring.snapshots.ready():
+            root.after(SNAPSHOT_POLL_MS, check_startup)
+            return
+        app.start_button.configure(state="normal")
+        try:
+            valid, message = proctoring.valid_startup()
+        except Exception as e:
+            messagebox.showerror("Invalid Startup", f"Couldn't check the running programs: {e}")
+            return
+        if valid:
+            proctoring.start_exam()
+        else:
+            messagebox.showerror("Invalid Startup", 
+                f"Please close the following programs before starting:\n{message}")
+
     def stop_exam():
         """Handle exam stop button click."""
         if proctoring.running:
@@ -73,6 +89,56 @@ def main():
     app.start_button.configure(command=start_exam)
     app.stop_button.configure(command=stop_exam)
     app.exit_button.configure(command=exit_app)
+
+    return root, proctoring
+
+def main():
+    """
+    Initialize and run the LPS application.
+    
+    Sets up the GUI, processes command line arguments, and establishes the connection
+    between the GUI controls and the proctoring system functionality.
+    
+    Command line arguments:
+        -h, --help: Display help message
+        -d, --demo: Run in demo mode with camera feed for eye tracking
+        -c, --cache: Cache static assets of whitelisted sites in the exam proxy
+        --no-governor: Don't limit the CPU use of the monitoring components
+        -e, --enforce: Deny unauthorized programs before they run (Linux, needs CAP_SYS_ADMIN)
+        -u, --upload URL: Upload sessions and reports to the collector at URL
+        --profile [MODE]: Profile the monitoring components with cprofile (default) or sample
+        --record-gaze: Record the gaze vector of every frame into exams/gaze for re-scoring
+        -r, --recover JOURNAL: Generate the report of an interrupted exam from its journal
+    """
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(prog='LPS', add_help=False)
+    parser.add_argument('-h', '--help', help="show this help message and exit", action="store_true")
+    parser.add_argument('-d', '--demo', help="run the program in demo mode", action="store_true")
+    parser.add_argument('-c', '--cache', help="cache static assets of whitelisted sites", action="store_true")
+    parser.add_argument('--no-governor', help="don't limit the CPU use of the monitoring components", action="store_true")
+    parser.add_argument('-e', '--enforce', help="deny unauthorized programs before they run (Linux, needs CAP_SYS_ADMIN)", action="store_true")
+    parser.add_argument('-u', '--upload', help="upload sessions and reports to the collector at URL", metavar="URL")
+    parser.add_argument('--profile', help="profile the monitoring components into exams/profile, with cprofile (default) or sample",
+                        nargs="?", const="cprofile", choices=["cprofile", "sample"], metavar="MODE")
+    parser.add_argument('--record-gaze', help="record the gaze vector of every frame into exams/gaze for re-scoring", action="store_true")
+    parser.add_argument('-r', '--recover', help="generate the report of an interrupted exam from its journal", metavar="JOURNAL")
+    args = vars(parser.parse_args())
+
+    # Display help if requested and exit
+    if args["help"]:
+        parser.print_help()
+        return
+
+    # Rebuild the report of an interrupted exam without starting the GUI
+    if args["recover"]:
+        Proctoring.recover(args["recover"])
+        return
+
+    # Build the window, then load the monitoring components in the background
+    root, proctoring = create_app(demo=args["demo"], cache=args["cache"], governor=not args["no_governor"], enforce=args["enforce"],
+                                  upload=args["upload"], profile=args["profile"],
+                                  record_gaze=args["record_gaze"])
+    root.after_idle(proctoring.preload)
     
     # Start the GUI event loop
     root.mainloop()
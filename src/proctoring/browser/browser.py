@@ -3,18 +3,22 @@
     
     Implements a controlled and monitored browser environment for exam sessions.
     Uses Selenium with Chrome to provide a locked-down browsing experience with
-    proxy-based content filtering.
+    proxy-based content filtering. The filtering proxy runs in-process.
 """
 import os
-import subprocess
-import time
-import signal
+import threading
 import psutil
+from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 
+from .proxy import ProxyEngine
+from .devtools import TabMonitor
+from proctoring.session.events import TabActivity, ProxyStatus, ComponentStopped
+from proctoring.session.metrics import Metrics
+
 class Browser:
     """
     A class to manage a controlled browser environment for exam sessions.
@@ -25,14 +29,24 @@ class Browser:
 
     Attributes:
         driver (webdriver.Chrome): Selenium WebDriver instance for controlling Chrome.
-        mitmdump_proc (subprocess.Popen): Process handle for the mitmproxy instance.
-        queue (Queue): Queue for receiving commands from the main process.
+        proxy (ProxyEngine): The embedded filtering proxy.
+        tab_monitor (TabMonitor): DevTools event stream for tab and window activity.
+        stop (multiprocessing.Event): Set by the main process to end the browser session.
+        from_queue (Queue): Queue for sending startup status to the main process.
         browser_process (psutil.Process): Process handle for the browser process.
         pid_queue (Queue): Queue for sending internal PIDs to the main process.
-        _active (bool): Flag indicating whether the browser should continue running.
+        event_queue (Queue): Queue for sending tab activity and proxy statistics to the session.
+        cache_dir (str): Directory for the proxy asset cache, None if caching is disabled.
+        metrics (Metrics): Proxy metrics, only updated from the main thread of the browser process.
+        _reported_pids (set): Browser process IDs already sent to the main process.
+        _pids_lock (threading.Lock): Guards _reported_pids, the main loop and the tab monitor thread both report.
     """
     
-    def __init__(self, to_queue=None, from_queue=None, pid_queue=None):
+    PROXY_PORT = 8080
+    STATS_INTERVAL = 5
+    DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "lps", "assets")
+
+    def __init__(self, stop=None, from_queue=None, pid_queue=None, event_queue=None, cache_dir=None):
         """
         Initializes the Browser controller.
         
@@ -40,50 +54,56 @@ class Browser:
         browser and proxy management.
         
         Args:
-            to_queue (Queue): Queue for receiving commands from the main process.
+            stop (multiprocessing.Event): Set by the main process to end the browser session.
             from_queue (Queue): Queue for sending status to the main process.
             pid_queue (Queue): Queue for sending process IDs to be excluded from monitoring.
+            event_queue (Queue): Queue for sending tab activity and proxy statistics to the session.
+            cache_dir (str): Directory for the proxy asset cache, None to disable caching.
         """
         self.driver = None
-        self.mitmdump_proc = None
-        self.to_queue = to_queue
+        self.proxy = None
+        self.tab_monitor = None
+        self.stop = stop if stop is not None else threading.Event()
         self.from_queue = from_queue
         self.browser_process = None
         self.pid_queue = pid_queue
-        self._active = True
+        self.event_queue = event_queue
+        self.cache_dir = cache_dir
+        self.metrics = Metrics("browser", event_queue)
+        self._reported_pids = set()
+        self._pids_lock = threading.Lock()
         
     def run(self):
         """
         Main method to set up and run the controlled browser environment.
         
         Coordinates the setup of the proxy server and browser, handles any exceptions,
-        and ensures proper cleanup when the browser session ends.
+        and ensures proper cleanup when the browser session ends. The stop is
+        acknowledged once the final proxy statistics have been sent.
         """
         try:
-            self._setup_mitmdump()
+            self._setup_proxy()
             self._setup_browser()
             self._start_browser()
         except Exception as e:
             print(f"Browser error: {str(e)}")
+            self.from_queue.put({"type": "error", "message": str(e)})
         finally:
             self._cleanup()
+            self.event_queue.put(ComponentStopped("browser", datetime.now()))
             
-    def _setup_mitmdump(self):
+    def _setup_proxy(self):
         """
-        Sets up the mitmproxy server with content filtering.
+        Sets up the in-process mitmproxy server with content filtering.
         
-        Launches mitmproxy with a custom script that implements website whitelisting
-        to restrict access to approved sites only.
-        """
-        script_path = os.path.join(os.path.dirname(__file__), "whitelist_mitm.py")
-        self.mitmdump_proc = subprocess.Popen(
-            ["mitmdump", "-s", script_path],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            preexec_fn=os.setsid
-        )
-        # Report the process ID to exclude it from monitoring
-        self.pid_queue.put(self.mitmdump_proc.pid)
+        Starts mitmproxy in-process with the whitelist addon that restricts access
+        to approved sites only, and reports readiness once the port is bound. When a
+        cache directory is set, the asset cache addon is loaded after the whitelist
+        so only allowed hosts are cached.
+        """
+        self.proxy = ProxyEngine(port=self.PROXY_PORT, cache_dir=self.cache_dir)
+        port = self.proxy.start()
+        self.from_queue.put({"type": "proxy_ready", "port": port})
         
     def _setup_browser(self):
         """
@@ -92,7 +112,7 @@ class Browser:
         Sets up Chrome with proxy settings, kiosk mode, and other security
         options to create a locked-down browsing environment for exams.
         """
-        proxy = "127.0.0.1:8080"
+        proxy = f"127.0.0.1:{self.PROXY_PORT}"
         print(f"Setting up proxy: {proxy}")
 
         # Configure Chrome options for secure exam environment
@@ -100,7 +120,9 @@ class Browser:
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
         options.add_argument(f"--proxy-server=http://{proxy}")
-        options.add_argument("--ignore-certificate-errors")
+        # Only the asset cache intercepts TLS, otherwise whitelisted hosts are tunnelled with their own certificates
+        if self.cache_dir:
+            options.add_argument("--ignore-certificate-errors")
         options.add_argument("--start-maximized")
         options.add_argument("--kiosk")
         options.add_argument("--verbose")
@@ -116,37 +138,74 @@ class Browser:
         
         # Track browser process and child processes
         self.browser_process = psutil.Process(self.driver.service.process.pid)
-        self.pid_queue.put(self.browser_process.pid)
-        for p in self.browser_process.children(recursive=True):
-            self.pid_queue.put(p.pid)
+        self._report_browser_pids()
+
+        # Subscribe to tab and window events of the browser
+        self.tab_monitor = TabMonitor(TabMonitor.websocket_url(self.driver), self._on_tab_event)
+        self.tab_monitor.start()
 
-        
     def _start_browser(self):
         """
-        Starts the browser session and monitors for control commands.
+        Starts the browser session and waits for the stop signal.
         
-        Navigates to the initial page and enters a monitoring loop to check
-        for commands from the main process, particularly the stop signal.
+        Navigates to the initial page and blocks waiting for the main process to
+        set the stop event. Tab events are pushed by the tab monitor, the wait only
+        times out to report proxy statistics.
         """
         print("Testing connection...")
         self.driver.get("https://canvas.kth.se")
         print("Navigation successful")
         self.from_queue.put("navigated")
         
-        # Main loop to monitor for stop commands
-        while self._active:
-            for p in self.browser_process.children(recursive=True):
-                self.pid_queue.put(p.pid)
-            if self.to_queue:
-                try:
-                    msg = self.to_queue.get_nowait()
-                    if msg == "STOP":
-                        print("Received stop signal, closing browser...")
-                        self._active = False
-                        break
-                except:
-                    pass
-            time.sleep(0.1)
+        # Main loop waiting for the stop signal
+        while not self.stop.wait(self.STATS_INTERVAL):
+            self._report_proxy_stats()
+            self._report_browser_pids()
+        print("Received stop signal, closing browser...")
+
+    def _on_tab_event(self, event):
+        """
+        Forwards a tab event to the session.
+        
+        New tabs and navigations can start renderer processes, so the browser
+        process tree is reported again as well.
+        
+        Args:
+            event (dict): Tab event from the tab monitor.
+        """
+        self.event_queue.put(TabActivity(event['timestamp'], event['event'], event['url']))
+        if event['event'] != 'destroyed':
+            self._report_browser_pids()
+
+    def _report_browser_pids(self):
+        """
+        Sends browser process IDs not reported before to the main process.
+        """
+        try:
+            pids = [self.browser_process.pid] + [p.pid for p in self.browser_process.children(recursive=True)]
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return
+        with self._pids_lock:
+            new = [pid for pid in pids if pid not in self._reported_pids]
+            self._reported_pids.update(new)
+        for pid in new:
+            self.pid_queue.put(pid)
+
+    def _report_proxy_stats(self):
+        """
+        Sends the current proxy statistics to the session, also as metrics.
+        """
+        stats = self.proxy.snapshot()
+        self.event_queue.put(ProxyStatus(stats))
+        for name in ("requests", "tunnelled", "blocked", "errors"):
+            self.metrics.set(f"proxy_{name}", stats[name])
+        self.metrics.set("proxy_requests_per_second", stats["requests_per_second"])
+        self.metrics.set("proxy_upstream_latency_ms", stats["upstream_latency_ms"])
+        self.metrics.set("proxy_ttfb_ms", stats["ttfb_ms"])
+        self.metrics.set("proxy_dns_hits", stats["dns"]["hits"])
+        self.metrics.set("proxy_dns_misses", stats["dns"]["misses"])
+        self.metrics.set("browser_processes", len(self._reported_pids))
+        self.metrics.flush()
             
     def _cleanup(self):
         """
@@ -155,16 +214,19 @@ class Browser:
         Ensures proper termination of the browser and proxy processes
         to prevent orphaned processes and resource leaks.
         """
-        if self.mitmdump_proc:
+        # Quit Chrome first, it owns the DevTools connection and the proxy's clients
+        if self.driver:
             try:
-                # Terminate the entire process group to catch child processes
-                os.killpg(os.getpgid(self.mitmdump_proc.pid), signal.SIGTERM)
-                self.mitmdump_proc.wait(timeout=5)
+                self.driver.quit()
             except Exception as e:
-                print(f"Warning during mitmdump cleanup: {e}")
+                print(f"Warning during browser cleanup: {e}")
 
-        if self.driver:
+        if self.tab_monitor:
+            self.tab_monitor.stop()
+
+        if self.proxy:
             try:
-                self.driver.quit()
+                self._report_proxy_stats()
+                self.proxy.stop()
             except Exception as e:
-                print(f"Warning during browser cleanup: {e}")
\ No newline at end of file
+                print(f"Warning during proxy cleanup: {e}")
\ No newline at end of file
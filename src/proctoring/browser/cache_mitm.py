@@ -0,0 +1,530 @@
+"""
+    Asset cache addon for the LPS exam proxy
+
+    Opt-in mitmproxy addon stage that keeps cacheable responses from whitelisted
+    hosts in a bounded on-disk cache. Repeated loads of static Canvas bundles are
+    answered locally, stale entries are revalidated with ETag/Last-Modified and the
+    cache evicts the least recently used entries once it grows past its size cap.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from mitmproxy import http, ctx
+
+class AssetCache:
+    """
+    A bounded, LRU evicted on-disk cache for HTTP responses.
+
+    Only stores responses that are cacheable per their Cache-Control headers and
+    keeps the validators needed to revalidate them once they go stale. The class
+    has no mitmproxy dependency so it can be exercised against any HTTP client.
+
+    Attributes:
+        directory (str): Folder holding the cached bodies and metadata.
+        max_bytes (int): Upper bound for the total size of cached bodies.
+        size (int): Current total size of cached bodies.
+        hits (int): Requests answered from cache without contacting origin.
+        revalidated (int): Stale entries confirmed by origin with a 304.
+        misses (int): Requests that had to be fetched from origin.
+        stores (int): Responses written to the cache.
+        evictions (int): Entries removed to stay below max_bytes.
+        _entries (OrderedDict): Entry metadata by key, least recently used first.
+    """
+
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+    CACHEABLE_STATUS = (200, 203, 301, 308)
+    HOP_BY_HOP = ("connection", "keep-alive", "transfer-encoding", "proxy-connection", "upgrade", "te", "trailer")
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Initializes the cache and loads any entries left by a previous session.
+
+        Args:
+            directory (str): Folder to store cached responses in.
+            max_bytes (int): Upper bound for the total size of cached bodies.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def lookup(self, method, url, request_headers):
+        """
+        Looks up a request in the cache.
+
+        Args:
+            method (str): HTTP method of the request.
+            url (str): Full request URL.
+            request_headers (dict): Request headers with lowercase names.
+
+        Returns:
+            tuple: ("hit", response) when the entry can be served as is,
+                ("revalidate", conditional_headers) when a stale entry has validators,
+                or ("miss", None) otherwise. Responses are (status, headers, body) tuples.
+        """
+        if method != "GET" or "no-store" in self.parse_cache_control(request_headers.get("cache-control", "")):
+            return "miss", None
+
+        key = self.key(url)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return "miss", None
+
+        self._entries.move_to_end(key)
+        if not entry["no_cache"] and time.time() < entry["expires"]:
+            response = self._read(key, entry)
+            if response is None:
+                # The body is gone and so is the entry, its validators are useless
+                self.misses += 1
+                return "miss", None
+            self.hits += 1
+            return "hit", response
+
+        # Stale, ask origin whether our copy is still valid
+        conditional = {}
+        if entry["etag"]:
+            conditional["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            conditional["If-Modified-Since"] = entry["last_modified"]
+        if conditional:
+            return "revalidate", conditional
+
+        self._remove(key)
+        self.misses += 1
+        return "miss", None
+
+    def complete(self, method, url, request_headers, status, headers, body, revalidating=False):
+        """
+        Hands an origin response to the cache.
+
+        Refreshes the stored entry on a successful revalidation and stores new
+        responses when they are cacheable.
+
+        Args:
+            method (str): HTTP method of the request.
+            url (str): Full request URL.
+            request_headers (dict): Request headers with lowercase names.
+            status (int): Status code returned by origin.
+            headers (list): Response headers as (name, value) pairs.
+            body (bytes): Raw response body.
+            revalidating (bool): Whether the request carried our conditional headers.
+
+        Returns:
+            tuple: Response to send to the client as a (status, headers, body) tuple,
+                the cached one when origin confirmed it with a 304. None if origin
+                confirmed a copy that is gone by now, the 304 answers a condition the
+                client never sent, so the request must be repeated without it.
+        """
+        key = self.key(url)
+        if revalidating:
+            entry = self._entries.get(key)
+            if status == 304:
+                if entry is not None:
+                    self._refresh(key, entry, headers)
+                    cached = self._read(key, entry)
+                    if cached is not None:
+                        self.revalidated += 1
+                        return cached
+                self.misses += 1
+                return None
+            self.misses += 1
+
+        if self.is_storable(method, request_headers, status, headers, body):
+            self._store(key, url, status, headers, body)
+        return status, headers, body
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Hit, miss, revalidation, store and eviction counters and the cache size.
+        """
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.size
+        }
+
+    def is_storable(self, method, request_headers, status, headers, body):
+        """
+        Decides whether a response may be stored, following RFC 9111 for a shared cache.
+
+        Args:
+            method (str): HTTP method of the request.
+            request_headers (dict): Request headers with lowercase names.
+            status (int): Response status code.
+            headers (list): Response headers as (name, value) pairs.
+            body (bytes): Raw response body.
+
+        Returns:
+            bool: True if the response can be cached.
+        """
+        if method != "GET" or status not in self.CACHEABLE_STATUS or body is None:
+            return False
+        if len(body) > self.max_bytes:
+            return False
+
+        lookup = {name.lower(): value for name, value in headers}
+        directives = self.parse_cache_control(lookup.get("cache-control", ""))
+        if "no-store" in directives or "private" in directives:
+            return False
+        if "no-store" in self.parse_cache_control(request_headers.get("cache-control", "")):
+            return False
+        if "authorization" in request_headers and "public" not in directives:
+            return False
+        if "set-cookie" in lookup:
+            return False
+        vary = {v.strip().lower() for v in lookup.get("vary", "").split(",") if v.strip()}
+        if vary - {"accept-encoding"}:
+            return False
+
+        return self.freshness_lifetime(lookup, directives) > 0 or "etag" in lookup or "last-modified" in lookup
+
+    def _store(self, key, url, status, headers, body):
+        """
+        Writes a response to disk and evicts older entries if needed.
+
+        Args:
+            key (str): Cache key of the response.
+            url (str): Full request URL.
+            status (int): Response status code.
+            headers (list): Response headers as (name, value) pairs.
+            body (bytes): Raw response body.
+        """
+        if key in self._entries:
+            self._remove(key)
+
+        lookup = {name.lower(): value for name, value in headers}
+        directives = self.parse_cache_control(lookup.get("cache-control", ""))
+        entry = {
+            "url": url,
+            "status": status,
+            "headers": [[n, v] for n, v in headers if n.lower() not in self.HOP_BY_HOP],
+            "expires": time.time() + self.freshness_lifetime(lookup, directives) - self.age(lookup),
+            "no_cache": "no-cache" in directives,
+            "etag": lookup.get("etag"),
+            "last_modified": lookup.get("last-modified"),
+            "size": len(body)
+        }
+
+        base = os.path.join(self.directory, key)
+        with open(base + ".body", "wb") as f:
+            f.write(body)
+        with open(base + ".meta", "w") as f:
+            json.dump(entry, f)
+
+        self._entries[key] = entry
+        self.size += entry["size"]
+        self.stores += 1
+        self._evict()
+
+    def _refresh(self, key, entry, headers):
+        """
+        Updates a stored entry with the headers from a 304 response.
+
+        Args:
+            key (str): Cache key of the entry.
+            entry (dict): Entry metadata.
+            headers (list): Headers of the 304 response as (name, value) pairs.
+        """
+        lookup = {name.lower(): value for name, value in headers}
+        stored = {name.lower(): value for name, value in entry["headers"]}
+        for name in ("cache-control", "expires", "date", "etag", "last-modified"):
+            if name in lookup:
+                stored[name] = lookup[name]
+        directives = self.parse_cache_control(stored.get("cache-control", ""))
+
+        entry["headers"] = [[n, stored[n.lower()]] for n, _ in entry["headers"] if n.lower() in stored]
+        entry["expires"] = time.time() + self.freshness_lifetime(stored, directives) - self.age(lookup)
+        entry["etag"] = stored.get("etag")
+        entry["last_modified"] = stored.get("last-modified")
+        with open(os.path.join(self.directory, key) + ".meta", "w") as f:
+            json.dump(entry, f)
+
+    def _read(self, key, entry):
+        """
+        Reads a cached response from disk.
+
+        Args:
+            key (str): Cache key of the entry.
+            entry (dict): Entry metadata.
+
+        Returns:
+            tuple: (status, headers, body), or None if the body is gone.
+        """
+        path = os.path.join(self.directory, key) + ".body"
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+            os.utime(path)
+        except OSError:
+            self._remove(key)
+            return None
+        headers = [(n, v) for n, v in entry["headers"] if n.lower() != "content-length"]
+        headers.append(("Content-Length", str(len(body))))
+        return entry["status"], headers, body
+
+    def _evict(self):
+        """
+        Removes least recently used entries until the cache fits within max_bytes.
+        """
+        while self.size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        """
+        Removes an entry and its files.
+
+        Args:
+            key (str): Cache key of the entry.
+        """
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.size -= entry["size"]
+        base = os.path.join(self.directory, key)
+        for path in (base + ".body", base + ".meta"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _load_index(self):
+        """
+        Rebuilds the in-memory index from the metadata files on disk.
+
+        Entries are ordered by last access time of their body, which is touched
+        on every read, so LRU order survives restarts.
+        """
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".meta"):
+                continue
+            key = name[:-len(".meta")]
+            base = os.path.join(self.directory, key)
+            try:
+                with open(base + ".meta") as f:
+                    entry = json.load(f)
+                found.append((os.path.getmtime(base + ".body"), key, entry))
+            except (OSError, ValueError):
+                self._remove(key)
+
+        for _, key, entry in sorted(found):
+            self._entries[key] = entry
+            self.size += entry["size"]
+        self._evict()
+
+    @staticmethod
+    def key(url):
+        """
+        Creates the cache key for a URL.
+
+        Args:
+            url (str): Full request URL.
+
+        Returns:
+            str: Hex digest used as file name for the entry.
+        """
+        return hashlib.sha256(url.encode("utf-8", "surrogateescape")).hexdigest()
+
+    @staticmethod
+    def parse_cache_control(value):
+        """
+        Parses a Cache-Control header value.
+
+        Args:
+            value (str): Header value, e.g. "public, max-age=600".
+
+        Returns:
+            dict: Lowercase directive names mapped to their value or None.
+        """
+        directives = {}
+        for part in value.split(","):
+            name, _, arg = part.strip().partition("=")
+            if name:
+                directives[name.lower()] = arg.strip('"') if arg else None
+        return directives
+
+    @staticmethod
+    def age(headers):
+        """
+        Reads how long a response already spent in caches before reaching us.
+
+        Args:
+            headers (dict): Response headers with lowercase names.
+
+        Returns:
+            int: Value of the Age header in seconds, 0 if missing or invalid.
+        """
+        try:
+            return max(0, int(headers.get("age", 0)))
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def freshness_lifetime(headers, directives):
+        """
+        Calculates how long a response stays fresh from when it was generated,
+        subtract its age for how long it stays fresh from now.
+
+        Args:
+            headers (dict): Response headers with lowercase names.
+            directives (dict): Parsed Cache-Control directives.
+
+        Returns:
+            float: Freshness lifetime in seconds, 0 if the response must be revalidated.
+        """
+        for name in ("s-maxage", "max-age"):
+            if directives.get(name):
+                try:
+                    return max(0, int(directives[name]))
+                except ValueError:
+                    return 0
+        if "expires" in headers:
+            try:
+                expires = parsedate_to_datetime(headers["expires"]).timestamp()
+                date = parsedate_to_datetime(headers["date"]).timestamp() if "date" in headers else time.time()
+                return max(0, expires - date)
+            except (TypeError, ValueError):
+                return 0
+        return 0
+
+class AssetCacheAddon:
+    """
+    mitmproxy addon that serves whitelisted static assets from an AssetCache.
+
+    Must be loaded after the whitelist addon, requests that already got a
+    response (i.e. were blocked) are left untouched.
+
+    Attributes:
+        cache (AssetCache): The backing cache, None until a cache directory is configured.
+    """
+
+    def __init__(self):
+        """
+        Initializes the addon without a cache, see configure.
+        """
+        self.cache = None
+
+    def load(self, loader):
+        """
+        Registers the options used to enable the cache.
+
+        Args:
+            loader (Loader): mitmproxy addon loader.
+        """
+        loader.add_option("asset_cache_dir", str, "", "Directory for the asset cache, empty disables caching.")
+        loader.add_option("asset_cache_size", int, AssetCache.DEFAULT_MAX_BYTES // (1024 * 1024), "Asset cache size cap in MiB.")
+
+    def configure(self, updated):
+        """
+        Creates the cache once the options are set.
+
+        Args:
+            updated (set): Names of the options that changed.
+        """
+        if "asset_cache_dir" in updated or "asset_cache_size" in updated:
+            if ctx.options.asset_cache_dir:
+                self.cache = AssetCache(ctx.options.asset_cache_dir, ctx.options.asset_cache_size * 1024 * 1024)
+            else:
+                self.cache = None
+
+    def request(self, flow):
+        """
+        Answers fresh requests from the cache and adds validators to stale ones.
+
+        Args:
+            flow (http.HTTPFlow): The intercepted flow.
+        """
+        if self.cache is None or flow.response is not None:
+            return
+        headers = self._lowercase(flow.request.headers)
+        state, data = self.cache.lookup(flow.request.method, flow.request.url, headers)
+        if state == "hit":
+            # mitmproxy runs the response hook for this response too
+            flow.metadata["asset_cache_hit"] = True
+            flow.response = self._make_response(data)
+        elif state == "revalidate" and "if-none-match" not in headers and "if-modified-since" not in headers:
+            flow.metadata["asset_cache_revalidate"] = True
+            for name, value in data.items():
+                flow.request.headers[name] = value
+
+    def response(self, flow):
+        """
+        Stores cacheable responses and resolves our own revalidations.
+
+        Args:
+            flow (http.HTTPFlow): The intercepted flow.
+        """
+        if self.cache is None or flow.request.method != "GET" or flow.metadata.get("asset_cache_hit"):
+            return
+        response = self.cache.complete(
+            flow.request.method,
+            flow.request.url,
+            self._lowercase(flow.request.headers),
+            flow.response.status_code,
+            list(flow.response.headers.items(multi=True)),
+            flow.response.raw_content,
+            revalidating=flow.metadata.get("asset_cache_revalidate", False)
+        )
+        if response is None:
+            # Our copy vanished during revalidation, have the browser repeat the request, it misses now
+            flow.response = http.Response.make(307, b"", {"Location": flow.request.url, "Cache-Control": "no-store"})
+        elif flow.metadata.get("asset_cache_revalidate") and flow.response.status_code == 304 and response[0] != 304:
+            flow.response = self._make_response(response)
+
+    def done(self):
+        """
+        Logs the cache counters when the proxy shuts down.
+        """
+        if self.cache is not None:
+            logging.info(f"Asset cache: {self.cache.stats()}")
+
+    @staticmethod
+    def _lowercase(headers):
+        """
+        Converts mitmproxy headers to a dict with lowercase names.
+
+        Args:
+            headers (Headers): mitmproxy headers.
+
+        Returns:
+            dict: Header values by lowercase name.
+        """
+        return {name.lower(): value for name, value in headers.items()}
+
+    @staticmethod
+    def _make_response(response):
+        """
+        Builds a mitmproxy response from a cached (status, headers, body) tuple.
+
+        Args:
+            response (tuple): Cached response.
+
+        Returns:
+            http.Response: Response with the raw, possibly compressed, body.
+        """
+        status, headers, body = response
+        flow_response = http.Response.make(status, b"", [(n.encode("latin-1"), v.encode("latin-1")) for n, v in headers])
+        flow_response.raw_content = body
+        return flow_response
+
+addons = [AssetCacheAddon()]
@@ -0,0 +1,173 @@
+"""
+    Tab monitoring module for LPS
+
+    Subscribes to target and navigation events on the DevTools endpoint of the
+    Chrome instance driven by Selenium, so tab and window activity is pushed to
+    the proctoring system as it happens instead of being polled.
+"""
+import json
+import threading
+import urllib.request
+from datetime import datetime
+from websocket import create_connection, WebSocketException
+
+class TabMonitor:
+    """
+    A class to stream tab and window events from Chrome over the DevTools Protocol.
+
+    Uses target discovery on the browser-level DevTools connection, which reports
+    every page target (tab or window) when it is created, navigated or destroyed.
+    The receiving thread blocks on the socket, so the monitor costs nothing while idle.
+
+    Attributes:
+        ws_url (str): Browser-level DevTools websocket URL.
+        callback (callable): Called with an event dict for every tab event.
+        _ws (WebSocket): The DevTools connection.
+        _thread (threading.Thread): Thread receiving events.
+        _urls (dict): Last known URL per target id, used to detect navigations.
+        _next_id (int): Id for the next DevTools command.
+    """
+
+    PAGE_TYPES = ("page", "tab")
+
+    def __init__(self, ws_url, callback):
+        """
+        Initializes the monitor without connecting.
+
+        Args:
+            ws_url (str): Browser-level DevTools websocket URL.
+            callback (callable): Called with an event dict for every tab event.
+        """
+        self.ws_url = ws_url
+        self.callback = callback
+        self._ws = None
+        self._thread = None
+        self._urls = {}
+        self._next_id = 0
+
+    def start(self):
+        """
+        Connects to Chrome, enables target discovery and starts receiving events.
+
+        Chrome answers target discovery with a created event for every existing
+        target, so tabs opened before the monitor started are reported as well.
+        """
+        self._ws = create_connection(self.ws_url, suppress_origin=True)
+        self._send("Target.setDiscoverTargets", {"discover": True})
+        self._thread = threading.Thread(target=self._run, name="tab-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Closes the DevTools connection, which also ends the receiving thread.
+        """
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _send(self, method, params):
+        """
+        Sends a DevTools command without waiting for its result.
+
+        Args:
+            method (str): DevTools method name.
+            params (dict): Command parameters.
+        """
+        self._next_id += 1
+        self._ws.send(json.dumps({"id": self._next_id, "method": method, "params": params}))
+
+    def _run(self):
+        """
+        Receives DevTools messages until the connection is closed.
+        """
+        while True:
+            try:
+                message = self._ws.recv()
+            except (WebSocketException, OSError):
+                break
+            if not message:
+                break
+            event = self._handle(json.loads(message))
+            if event:
+                self.callback(event)
+
+    def _handle(self, message):
+        """
+        Translates a DevTools message into a tab event.
+
+        Args:
+            message (dict): Decoded DevTools message.
+
+        Returns:
+            dict: Tab event with type, event, timestamp, target_id, kind and url,
+                or None if the message is not a tab event.
+        """
+        method = message.get("method")
+        params = message.get("params", {})
+
+        if method == "Target.targetDestroyed":
+            target_id = params.get("targetId")
+            if target_id not in self._urls:
+                return None
+            return self._event("destroyed", target_id, None, self._urls.pop(target_id))
+
+        if method not in ("Target.targetCreated", "Target.targetInfoChanged"):
+            return None
+        info = params.get("targetInfo", {})
+        if info.get("type") not in self.PAGE_TYPES:
+            return None
+
+        target_id, url = info.get("targetId"), info.get("url", "")
+        if method == "Target.targetCreated":
+            self._urls[target_id] = url
+            return self._event("created", target_id, info["type"], url)
+        if self._urls.get(target_id) != url:
+            # Info also changes on title updates, only URL changes are navigations
+            self._urls[target_id] = url
+            return self._event("navigated", target_id, info["type"], url)
+        return None
+
+    @staticmethod
+    def _event(name, target_id, kind, url):
+        """
+        Builds a tab event.
+
+        Args:
+            name (str): Event name, "created", "navigated" or "destroyed".
+            target_id (str): DevTools target id of the tab.
+            kind (str): DevTools target type, None if unknown.
+            url (str): URL of the tab.
+
+        Returns:
+            dict: The tab event.
+        """
+        return {
+            'type': 'tab',
+            'event': name,
+            'timestamp': datetime.now(),
+            'target_id': target_id,
+            'kind': kind,
+            'url': url
+        }
+
+    @staticmethod
+    def websocket_url(driver):
+        """
+        Finds the browser-level DevTools websocket URL of a Selenium session.
+
+        Args:
+            driver (webdriver.Chrome): Selenium WebDriver instance.
+
+        Returns:
+            str: DevTools websocket URL.
+        """
+        if driver.capabilities.get("se:cdp"):
+            return driver.capabilities["se:cdp"]
+        address = driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+        with opener.open(f"http://{address}/json/version", timeout=5) as response:
+            return json.load(response)["webSocketDebuggerUrl"]
@@ -0,0 +1,218 @@
+"""
+    DNS cache addon for the LPS exam proxy
+
+    Resolves upstream hosts once per TTL instead of on every new upstream
+    connection, and resolves the whitelisted hosts when the proxy starts so
+    the first page of the exam doesn't wait for DNS. Uses dnspython for the
+    record TTLs if it is installed, the system resolver with a fixed TTL
+    otherwise.
+"""
+import time
+import socket
+import asyncio
+import ipaddress
+
+class DnsCache:
+    """
+    An asyncio DNS cache respecting record TTLs.
+
+    Concurrent lookups of the same host share one resolution. The class has
+    no mitmproxy dependency.
+
+    Attributes:
+        resolve (callable): Coroutine function resolving a host to a list of
+            addresses and a TTL in seconds.
+        min_ttl (float): Lower bound for cached TTLs.
+        max_ttl (float): Upper bound for cached TTLs, 0 disables caching.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to resolve.
+        _entries (dict): Addresses and expiry as time.monotonic() by host.
+        _pending (dict): Resolutions in flight by host.
+    """
+
+    DEFAULT_TTL = 60
+    MIN_TTL = 5
+    MAX_TTL = 600
+
+    def __init__(self, resolve=None, min_ttl=MIN_TTL, max_ttl=MAX_TTL):
+        """
+        Initializes an empty cache.
+
+        Args:
+            resolve (callable): Coroutine function resolving a host to addresses
+                and a TTL, None to use dnspython or the system resolver.
+            min_ttl (float): Lower bound for cached TTLs.
+            max_ttl (float): Upper bound for cached TTLs, 0 disables caching.
+        """
+        self.resolve = resolve or self.default_resolver()
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._pending = {}
+
+    @classmethod
+    def default_resolver(cls):
+        """
+        Picks the resolver, dnspython if it is installed for the record TTLs.
+
+        Returns:
+            callable: Coroutine function resolving a host to addresses and a TTL.
+        """
+        try:
+            import dns.asyncresolver
+        except ImportError:
+            return cls.system_resolve
+
+        async def resolve(host):
+            answer = await dns.asyncresolver.resolve(host, "A")
+            return [record.address for record in answer], answer.rrset.ttl
+        return resolve
+
+    @classmethod
+    async def system_resolve(cls, host):
+        """
+        Resolves a host with the system resolver, which doesn't tell the TTL.
+
+        Args:
+            host (str): Hostname to resolve.
+
+        Returns:
+            tuple: Addresses and DEFAULT_TTL.
+        """
+        # Not loop.getaddrinfo, the addon resolves that through the cache
+        infos = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: socket.getaddrinfo(host, None, type=socket.SOCK_STREAM))
+        return list(dict.fromkeys(info[4][0] for info in infos)), cls.DEFAULT_TTL
+
+    async def lookup(self, host):
+        """
+        Returns the addresses of a host, from the cache while its TTL lasts.
+
+        Args:
+            host (str): Hostname to look up.
+
+        Returns:
+            list: Addresses of the host.
+
+        Raises:
+            OSError: If the host can't be resolved.
+        """
+        entry = self._entries.get(host)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        pending = self._pending.get(host)
+        if pending is None:
+            self.misses += 1
+            pending = self._pending[host] = asyncio.ensure_future(self._resolve(host))
+            pending.add_done_callback(lambda _: self._pending.pop(host, None))
+        else:
+            self.hits += 1
+        return await asyncio.shield(pending)
+
+    async def warm(self, hosts):
+        """
+        Resolves hosts ahead of their first use, failures are ignored.
+
+        Args:
+            hosts (list): Hostnames to resolve.
+        """
+        await asyncio.gather(*(self.lookup(host) for host in hosts), return_exceptions=True)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: Hits, misses and cached hosts.
+        """
+        return {"hits": self.hits, "misses": self.misses, "hosts": len(self._entries)}
+
+    async def _resolve(self, host):
+        """
+        Resolves a host and caches the result.
+
+        Args:
+            host (str): Hostname to resolve.
+
+        Returns:
+            list: Addresses of the host.
+        """
+        try:
+            addresses, ttl = await self.resolve(host)
+        except Exception as e:
+            raise OSError(f"Couldn't resolve {host}: {e}") from e
+        if not addresses:
+            raise OSError(f"Couldn't resolve {host}: no addresses")
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        if ttl > 0:
+            self._entries[host] = (addresses, time.monotonic() + ttl)
+        return addresses
+
+class DnsCacheAddon:
+    """
+    mitmproxy addon resolving upstream hosts through a DNS cache.
+
+    Replaces getaddrinfo of the proxy's own event loop, which mitmproxy opens
+    upstream connections with. Connections keep their hostnames, so mitmproxy
+    still reuses them by host and the TLS server name is unchanged.
+
+    Attributes:
+        cache (DnsCache): The DNS cache.
+        warm_hosts (list): Hosts resolved when the proxy starts.
+        _warming (asyncio.Task): Resolution of the warm hosts.
+    """
+
+    def __init__(self, cache=None, warm_hosts=()):
+        """
+        Initializes the addon.
+
+        Args:
+            cache (DnsCache): DNS cache to use, None for a new one.
+            warm_hosts (list): Hosts to resolve when the proxy starts.
+        """
+        self.cache = cache or DnsCache()
+        self.warm_hosts = list(warm_hosts)
+        self._warming = None
+
+    def running(self):
+        """
+        Resolves through the cache from now on and starts resolving the warm
+        hosts without delaying readiness.
+        """
+        loop = asyncio.get_running_loop()
+        system_getaddrinfo = loop.getaddrinfo
+
+        async def getaddrinfo(host, port, *, family=0, type=0, proto=0, flags=0):
+            if not isinstance(host, str) or self._is_address(host):
+                return await system_getaddrinfo(host, port, family=family, type=type, proto=proto, flags=flags)
+            infos = []
+            for address in await self.cache.lookup(host):
+                address_family = socket.AF_INET6 if ":" in address else socket.AF_INET
+                if family in (0, address_family):
+                    infos.append((address_family, type or socket.SOCK_STREAM, proto, "", (address, port)))
+            return infos
+
+        loop.getaddrinfo = getaddrinfo
+        if self.warm_hosts:
+            self._warming = asyncio.ensure_future(self.cache.warm(self.warm_hosts))
+
+    @staticmethod
+    def _is_address(host):
+        """
+        Checks if a host is an IP address, which needs no resolving.
+
+        Args:
+            host (str): Host of an upstream connection.
+
+        Returns:
+            bool: True for IPv4 and IPv6 addresses.
+        """
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return True
@@ -0,0 +1,228 @@
+"""
+    In-process exam proxy for LPS
+
+    Runs mitmproxy as an asyncio driven master on a dedicated thread inside the
+    browser process, with the whitelist addon loaded directly instead of through
+    the mitmdump CLI. Readiness and traffic statistics are available to the owner.
+    HTTPS to whitelisted hosts is relayed without interception unless the asset
+    cache is enabled, so requests inside those tunnels are not counted. Upstream
+    hosts are resolved through a DNS cache warmed with the whitelisted hosts.
+"""
+import time
+import asyncio
+import threading
+from mitmproxy import options, ctx
+from mitmproxy.tools.dump import DumpMaster
+
+from .whitelist_mitm import Whitelist, load_domains
+from .dns_mitm import DnsCacheAddon
+from .cache_mitm import AssetCacheAddon
+
+class ProxyStats:
+    """
+    mitmproxy addon collecting throughput, error and upstream latency statistics.
+
+    Attributes:
+        port (int): Port the proxy is bound to, None until running.
+        requests (int): Number of requests seen.
+        errors (int): Number of flows that ended in an error.
+        _latency_total (float): Sum of upstream latencies in seconds.
+        _latency_count (int): Number of responses the latency sum is based on.
+        _latency_max (float): Highest upstream latency in seconds.
+        _ttfb_total (float): Sum of the times from request start to the first response byte in seconds.
+        _last (tuple): Request count and time of the previous snapshot.
+        _ready (threading.Event): Set once the proxy server is listening.
+    """
+
+    def __init__(self, ready):
+        """
+        Initializes the counters.
+
+        Args:
+            ready (threading.Event): Event to set once the proxy server is listening.
+        """
+        self.port = None
+        self.requests = 0
+        self.errors = 0
+        self._latency_total = 0.0
+        self._latency_count = 0
+        self._latency_max = 0.0
+        self._ttfb_total = 0.0
+        self._last = (0, time.monotonic())
+        self._ready = ready
+
+    def running(self):
+        """
+        Records the bound port and signals readiness once the server is up.
+        """
+        addrs = ctx.master.addons.get("proxyserver").listen_addrs()
+        self.port = addrs[0][1] if addrs else None
+        self._ready.set()
+
+    def request(self, flow):
+        """
+        Counts an incoming request.
+
+        Args:
+            flow (http.HTTPFlow): The intercepted flow.
+        """
+        self.requests += 1
+
+    def response(self, flow):
+        """
+        Measures the time origin took to answer a forwarded request, and the
+        time to first byte including opening the upstream connection.
+
+        Responses made by the proxy itself, for blocked requests and cache
+        hits, never went upstream and are skipped.
+
+        Args:
+            flow (http.HTTPFlow): The intercepted flow.
+        """
+        if flow.metadata.get("blocked") or flow.metadata.get("asset_cache_hit") or not flow.server_conn.timestamp_start:
+            return
+        if not flow.request.timestamp_end or not flow.response.timestamp_start:
+            return
+        latency = flow.response.timestamp_start - flow.request.timestamp_end
+        if latency >= 0:
+            self._latency_total += latency
+            self._latency_count += 1
+            self._latency_max = max(self._latency_max, latency)
+            self._ttfb_total += flow.response.timestamp_start - flow.request.timestamp_start
+
+    def error(self, flow):
+        """
+        Counts a flow that failed, e.g. because origin could not be reached.
+
+        Args:
+            flow (http.HTTPFlow): The failed flow.
+        """
+        self.errors += 1
+
+    def snapshot(self):
+        """
+        Returns the current statistics, with the request rate since the previous snapshot.
+
+        Returns:
+            dict: Request, error and latency statistics.
+        """
+        now = time.monotonic()
+        last_requests, last_time = self._last
+        self._last = (self.requests, now)
+        return {
+            "requests": self.requests,
+            "requests_per_second": (self.requests - last_requests) / max(now - last_time, 1e-6),
+            "errors": self.errors,
+            "upstream_latency_ms": 1000 * self._latency_total / self._latency_count if self._latency_count else 0.0,
+            "upstream_latency_max_ms": 1000 * self._latency_max,
+            "ttfb_ms": 1000 * self._ttfb_total / self._latency_count if self._latency_count else 0.0
+        }
+
+class ProxyEngine:
+    """
+    Embedded mitmproxy master running on its own thread and event loop.
+
+    Attributes:
+        host (str): Address the proxy listens on.
+        port (int): Port the proxy listens on, 0 picks a free port.
+        cache_dir (str): Directory for the asset cache, None if caching is disabled.
+        whitelist (Whitelist): The whitelist addon.
+        cache (AssetCacheAddon): The asset cache addon, None if caching is disabled.
+        stats (ProxyStats): The statistics addon.
+        dns (DnsCacheAddon): The DNS cache addon, warmed with the whitelisted hosts.
+        _master (DumpMaster): The running master, None when stopped.
+        _thread (threading.Thread): Thread running the event loop.
+        _ready (threading.Event): Set once the proxy server is listening.
+        _error (Exception): Error that stopped the proxy, if any.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, cache_dir=None):
+        """
+        Initializes the engine without starting it.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 picks a free port.
+            cache_dir (str): Directory for the asset cache, None to disable caching.
+        """
+        self.host = host
+        self.port = port
+        self.cache_dir = cache_dir
+        self.whitelist = Whitelist(passthrough=cache_dir is None)
+        self.cache = AssetCacheAddon() if cache_dir else None
+        self._ready = threading.Event()
+        self.stats = ProxyStats(self._ready)
+        self.dns = DnsCacheAddon(warm_hosts=load_domains())
+        self._master = None
+        self._thread = None
+        self._error = None
+
+    def start(self, timeout=10):
+        """
+        Starts the proxy thread and waits until the server is listening.
+
+        Args:
+            timeout (float): Seconds to wait for the server to come up.
+
+        Returns:
+            int: The port the proxy is bound to.
+
+        Raises:
+            RuntimeError: If the proxy did not come up in time.
+        """
+        self._thread = threading.Thread(target=self._run, name="proxy", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout) or self.stats.port is None:
+            self.stop()
+            raise RuntimeError(f"Proxy failed to start: {self._error or 'timed out'}")
+        return self.stats.port
+
+    def stop(self, timeout=5):
+        """
+        Shuts down the proxy and waits for its thread to finish.
+
+        Args:
+            timeout (float): Seconds to wait for the thread.
+        """
+        if self._master is not None:
+            self._master.shutdown()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def snapshot(self):
+        """
+        Returns the proxy statistics including blocked requests and cache counters.
+
+        Returns:
+            dict: Proxy statistics.
+        """
+        snapshot = self.stats.snapshot()
+        snapshot["dns"] = self.dns.cache.stats()
+        snapshot["blocked"] = self.whitelist.blocked
+        snapshot["tunnelled"] = self.whitelist.tunnelled
+        if self.cache is not None and self.cache.cache is not None:
+            snapshot["cache"] = self.cache.cache.stats()
+        return snapshot
+
+    def _run(self):
+        """
+        Thread target running the proxy event loop until shutdown.
+        """
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    async def _serve(self):
+        """
+        Creates the master with the LPS addons and runs it.
+        """
+        opts = options.Options(listen_host=self.host, listen_port=self.port)
+        self._master = DumpMaster(opts, with_termlog=False, with_dumper=False)
+        self._master.addons.add(self.stats, self.whitelist, self.dns)
+        if self.cache is not None:
+            self._master.addons.add(self.cache)
+            self._master.options.update(asset_cache_dir=self.cache_dir)
+        await self._master.run()
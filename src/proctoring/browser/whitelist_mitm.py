@@ -1,22 +1,25 @@
-from mitmproxy import http, ctx
+from mitmproxy import http, tls
+import logging
 import re
 import os
 
 def format_domain_pattern(domain):
     # Escape dots and convert domain to regex pattern
     escaped = domain.replace('.', r'\.')
-    return f"(.*\.)?{escaped}$"
+    return rf"(.*\.)?{escaped}$"
+
+def load_domains():
+    pattern_file = os.path.join(os.path.dirname(__file__), "whitelist.txt")
+    with open(pattern_file, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
 
 def load_patterns():
     patterns = []
     try:
-        pattern_file = os.path.join(os.path.dirname(__file__), "whitelist.txt")
-        with open(pattern_file, 'r') as f:
-            domains = [line.strip() for line in f if line.strip()]
-            patterns = [format_domain_pattern(domain) for domain in domains]
-        ctx.log.info(f"Loaded {len(patterns)} whitelist patterns")
+        patterns = [format_domain_pattern(domain) for domain in load_domains()]
+        logging.info(f"Loaded {len(patterns)} whitelist patterns")
     except Exception as e:
-        ctx.log.error(f"Failed to load whitelist patterns: {e}")
+        logging.error(f"Failed to load whitelist patterns: {e}")
         # Fallback to empty list - block everything if file can't be read
         patterns = []
     return patterns
@@ -24,10 +27,59 @@ def load_patterns():
 def is_whitelisted(host):
     return any(re.match(pattern, host) for pattern in WHITELIST_PATTERNS)
 
-def request(flow: http.HTTPFlow) -> None:
-    if not is_whitelisted(flow.request.pretty_host):
-        flow.response = http.Response.make(
-            403, b"Blocked by whitelist proxy, press alt+leftArrow to go back", {"Content-Type": "text/plain"}
-        )
+class Whitelist:
+    """
+    mitmproxy addon blocking every request to a host outside the whitelist.
+
+    HTTPS is decided when the browser asks for a tunnel: tunnels to hosts
+    outside the whitelist are refused before any TLS handshake, and with
+    passthrough the TLS of whitelisted hosts is relayed without decrypting it.
+    Plain HTTP requests are decided one by one.
+
+    Attributes:
+        blocked (int): Number of requests and tunnels answered with a 403.
+        passthrough (bool): Whether TLS connections to whitelisted hosts are relayed
+            without interception, the asset cache needs them intercepted.
+        tunnelled (int): Number of TLS connections relayed without interception.
+    """
+
+    def __init__(self, passthrough=True):
+        self.blocked = 0
+        self.passthrough = passthrough
+        self.tunnelled = 0
+
+    def http_connect(self, flow: http.HTTPFlow) -> None:
+        """
+        Refuses tunnels to hosts outside the whitelist.
+        """
+        if not is_whitelisted(flow.request.host):
+            self.blocked += 1
+            flow.metadata["blocked"] = True
+            flow.response = http.Response.make(403, b"Blocked by whitelist proxy", {"Content-Type": "text/plain"})
+
+    def tls_clienthello(self, data: tls.ClientHelloData) -> None:
+        """
+        Relays TLS to whitelisted hosts without interception.
+
+        The SNI decides if present, so a tunnel to a whitelisted address can't
+        be used to reach another host. Intercepted connections are still
+        checked per request.
+        """
+        if not self.passthrough:
+            return
+        host = data.client_hello.sni or (data.context.server.address or ("",))[0]
+        if host and is_whitelisted(host):
+            self.tunnelled += 1
+            data.ignore_connection = True
+
+    def request(self, flow: http.HTTPFlow) -> None:
+        if not is_whitelisted(flow.request.pretty_host):
+            self.blocked += 1
+            flow.metadata["blocked"] = True
+            flow.response = http.Response.make(
+                403, b"Blocked by whitelist proxy, press alt+leftArrow to go back", {"Content-Type": "text/plain"}
+            )
+
+WHITELIST_PATTERNS = load_patterns()
 
-WHITELIST_PATTERNS = load_patterns()
\ No newline at end of file
+addons = [Whitelist()]
@@ -0,0 +1,2 @@
+from .server import Collector, StudentAggregate
+from .store import EventStore
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""
+    Entry point of the LPS collector service
+
+    Collects the sessions and reports of the LPS clients in an exam hall, run
+    the clients with --upload http://<host>:<port>.
+
+    Usage: PYTHONPATH=src python -m proctoring.collector --host 0.0.0.0 --db ./exams/collector.sqlite3
+"""
+import argparse
+
+from .server import Collector
+
+def main():
+    """
+    Parses the command line and serves until interrupted.
+
+    Command line arguments:
+        --host HOST: Address to listen on
+        --port PORT: Port to listen on
+        --db PATH: SQLite database for the uploads
+        --queue-size N: Uploads waiting for storage before clients are told to back off
+    """
+    parser = argparse.ArgumentParser(prog='LPS collector')
+    parser.add_argument('--host', help="address to listen on", default="127.0.0.1")
+    parser.add_argument('--port', help="port to listen on", type=int, default=8465)
+    parser.add_argument('--db', help="SQLite database for the uploads", default="./exams/collector.sqlite3")
+    parser.add_argument('--queue-size', help="uploads waiting for storage before clients are told to back off",
+                        type=int, default=Collector.QUEUE_SIZE)
+    args = parser.parse_args()
+
+    collector = Collector(args.db, args.host, args.port, args.queue_size)
+    print(f"Collecting on http://{args.host}:{args.port}, dashboard data at /students")
+    try:
+        # Interrupting cancels serving, queued uploads are still written
+        collector.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Collector stopped: {collector.stats()}")
+
+if __name__ == "__main__":
+    main()
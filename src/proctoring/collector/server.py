@@ -0,0 +1,434 @@
+"""
+    Collector service for LPS
+
+    Receives the event streams and reports the LPS clients of an exam hall
+    upload, see session.Uploader for the protocol. A single asyncio event loop
+    serves every client. Uploads are folded into live per-student aggregates
+    right away and queued for a writer that stores them in SQLite in batches.
+    The queue is bounded, when it is full the collector answers 503 and the
+    clients back off and spool instead of growing its memory.
+
+    Endpoints:
+        POST /events, POST /reports: Uploads of LPS clients.
+        GET /students: Aggregates of every student, for the live dashboard.
+        GET /students/<student>: Aggregates of one student.
+        GET /stats: Ingest counters of the collector.
+"""
+import gzip
+import json
+import time
+import asyncio
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from .store import EventStore
+
+class StudentAggregate:
+    """
+    Live aggregates of one student, folded like SessionAggregator.handle does.
+
+    Attributes:
+        gaze_away (float): Total time spent looking away, in seconds.
+        violations (int): Processes started during an exam that weren't running at its start.
+        tabs (int): Tab and window events of the exam browser.
+        sessions (set): Identifiers of the student's sessions.
+        ended (int): Sessions that ended.
+        last_seen (float): Unix time of the last upload.
+    """
+
+    def __init__(self):
+        self.gaze_away = 0.0
+        self.violations = 0
+        self.tabs = 0
+        self.sessions = set()
+        self.ended = 0
+        self.last_seen = 0.0
+
+    def add(self, session, initial, record):
+        """
+        Folds a journal record into the aggregates.
+
+        Args:
+            session (str): Identifier of the session the record belongs to.
+            initial (set): Lowercase names of processes running at the start of the session.
+            record (dict): Decoded journal record.
+        """
+        self.sessions.add(session)
+        kind = record.get("type")
+        if kind == "GazeAway":
+            self.gaze_away += record.get("duration", 0.0)
+        elif kind == "ProcessViolation":
+            if str(record.get("name", "")).lower() not in initial:
+                self.violations += 1
+        elif kind == "TabActivity":
+            self.tabs += 1
+        elif kind == "SessionEnded":
+            self.ended += 1
+
+    def snapshot(self):
+        """
+        Returns the aggregates for the dashboard.
+
+        Returns:
+            dict: Gaze-away minutes, violations, tab events, sessions and last upload.
+        """
+        return {"gaze_away_minutes": round(self.gaze_away / 60, 2), "violations": self.violations,
+                "tabs": self.tabs, "sessions": len(self.sessions), "active": len(self.sessions) - self.ended,
+                "last_seen": self.last_seen}
+
+class Collector:
+    """
+    An asyncio HTTP service collecting the uploads of many LPS clients.
+
+    Runs on its own thread and event loop like ProxyEngine, or on the calling
+    thread with serve_forever. Storage runs on a single writer thread, so the
+    event loop never waits for SQLite.
+
+    Attributes:
+        host (str): Address to listen on.
+        port (int): Port to listen on, 0 picks a free port. Set to the bound port once listening.
+        queue_size (int): Uploads waiting for the writer at most.
+        write_batch (int): Uploads written per transaction at most.
+        store (EventStore): Storage of all uploads.
+        students (dict): StudentAggregate by username.
+        received (int): Events accepted.
+        batches (int): Event batches accepted.
+        reports (int): Reports accepted.
+        duplicates (int): Retried batches that were already accepted.
+        rejected (int): Uploads answered with 503 because the queue was full.
+        peak_queue (int): Most uploads waiting for the writer at once.
+        _initial (dict): Lowercase names of processes running at session start, by session.
+        _seen (set): Session and batch sequence number pairs accepted.
+        _queue (asyncio.Queue): Uploads waiting for the writer, None until serving.
+        _executor (ThreadPoolExecutor): The writer thread.
+        _shutdown (asyncio.Event): Set to stop serving.
+        _loop (asyncio.AbstractEventLoop): Loop the collector runs on.
+        _thread (threading.Thread): Thread running the event loop, None with serve_forever.
+        _ready (threading.Event): Set once the collector is listening or failed to.
+        _error (Exception): Error that stopped the collector, if any.
+    """
+
+    QUEUE_SIZE = 1000
+    WRITE_BATCH = 200
+    RETRY_AFTER = 1
+    MAX_BODY = 64 * 2**20
+
+    def __init__(self, path, host="127.0.0.1", port=8465, queue_size=QUEUE_SIZE, write_batch=WRITE_BATCH):
+        """
+        Initializes the collector without starting it.
+
+        Args:
+            path (str): Path of the SQLite database.
+            host (str): Address to listen on.
+            port (int): Port to listen on, 0 picks a free port.
+            queue_size (int): Uploads waiting for the writer at most.
+            write_batch (int): Uploads written per transaction at most.
+        """
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.write_batch = write_batch
+        self.store = EventStore(path)
+        self.students = {}
+        self.received = 0
+        self.batches = 0
+        self.reports = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.peak_queue = 0
+        self._initial = {}
+        self._seen = set()
+        self._queue = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="collector-writer")
+        self._shutdown = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self, timeout=10):
+        """
+        Starts the collector thread and waits until it is listening.
+
+        Args:
+            timeout (float): Seconds to wait for the collector to come up.
+
+        Returns:
+            int: The port the collector is bound to.
+
+        Raises:
+            RuntimeError: If the collector did not come up in time.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="collector", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout) or self._error is not None:
+            self.stop()
+            raise RuntimeError(f"Collector failed to start: {self._error or 'timed out'}")
+        return self.port
+
+    def stop(self, timeout=10):
+        """
+        Stops serving, writes what is queued and waits for the thread to finish.
+
+        Args:
+            timeout (float): Seconds to wait for the thread.
+        """
+        if self._loop is not None and self._shutdown is not None:
+            self._loop.call_soon_threadsafe(self._shutdown.set)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def serve_forever(self):
+        """
+        Runs the collector on the calling thread until stopped.
+        """
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    def stats(self):
+        """
+        Returns the ingest counters.
+
+        Returns:
+            dict: Accepted, duplicate and rejected uploads, queue and storage counters.
+        """
+        return {"received": self.received, "batches": self.batches, "reports": self.reports,
+                "duplicates": self.duplicates, "rejected": self.rejected, "students": len(self.students),
+                "queued": self._queue.qsize() if self._queue else 0, "peak_queue": self.peak_queue,
+                "written": self.store.rows, "transactions": self.store.transactions}
+
+    async def _serve(self):
+        """
+        Restores the aggregates from the store, then serves until shutdown and
+        writes the remaining uploads.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._shutdown = asyncio.Event()
+        self._queue = asyncio.Queue(self.queue_size)
+        await self._loop.run_in_executor(self._executor, self._restore)
+        server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        self.port = server.sockets[0].getsockname()[1]
+        writer = asyncio.create_task(self._write())
+        self._ready.set()
+        try:
+            await self._shutdown.wait()
+        finally:
+            server.close()
+            await self._queue.put(None)
+            await writer
+            await self._loop.run_in_executor(self._executor, self.store.close)
+            self._executor.shutdown()
+            self._loop = None
+
+    def _restore(self):
+        """
+        Opens the store and rebuilds the aggregates of everything stored, on the writer thread.
+        """
+        self.store.open()
+        self._seen = self.store.batches()
+        for session, student, record in self.store.replay():
+            self._fold(session, student, record)
+
+    async def _write(self):
+        """
+        Writes queued uploads until the stop sentinel, every upload that
+        queued up during a write goes into the next transaction.
+        """
+        stopping = False
+        while not stopping:
+            uploads = [await self._queue.get()]
+            while len(uploads) < self.write_batch and not self._queue.empty():
+                uploads.append(self._queue.get_nowait())
+            if uploads[-1] is None:
+                stopping = True
+                uploads.pop()
+            if uploads:
+                await self._loop.run_in_executor(self._executor, self.store.write, uploads)
+
+    async def _handle(self, reader, writer):
+        """
+        Serves the requests of one keep-alive connection.
+
+        Args:
+            reader (asyncio.StreamReader): Reads the requests.
+            writer (asyncio.StreamWriter): Writes the responses.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > self.MAX_BODY:
+                    writer.write(self._response(413, {}, b"", False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, extra, payload = self._route(method, target, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(self._response(status, extra, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method, target, headers, body):
+        """
+        Answers a request.
+
+        Args:
+            method (str): HTTP method.
+            target (str): Request target.
+            headers (dict): Request headers with lowercase names.
+            body (bytes): Request body.
+
+        Returns:
+            tuple: Status code, extra headers and response body.
+        """
+        path = urllib.parse.urlsplit(target).path
+        if method == "POST" and path in ("/events", "/reports"):
+            session = headers.get("x-lps-session")
+            student = headers.get("x-lps-student")
+            if not session or not student:
+                return 400, {}, b""
+            if self._queue.full():
+                self.rejected += 1
+                return 503, {"Retry-After": str(self.RETRY_AFTER)}, b""
+            if path == "/events":
+                return self._ingest(session, student, headers, body)
+            self._enqueue(("report", session, student, time.time(), body))
+            self.reports += 1
+            self._student(student).last_seen = time.time()
+            return 204, {}, b""
+
+        if method == "GET" and path == "/students":
+            return self._json({student: aggregate.snapshot() for student, aggregate in self.students.items()})
+        if method == "GET" and path.startswith("/students/"):
+            aggregate = self.students.get(urllib.parse.unquote(path[len("/students/"):]))
+            return self._json(aggregate.snapshot()) if aggregate else (404, {}, b"")
+        if method == "GET" and path == "/stats":
+            return self._json(self.stats())
+        return 404, {}, b""
+
+    def _ingest(self, session, student, headers, body):
+        """
+        Accepts a batch of events, folds it into the aggregates and queues it for storage.
+
+        Args:
+            session (str): Identifier of the session.
+            student (str): Username of the student.
+            headers (dict): Request headers with lowercase names.
+            body (bytes): Batch of JSON lines, gzip compressed if the header says so.
+
+        Returns:
+            tuple: Status code, extra headers and response body.
+        """
+        try:
+            batch = int(headers.get("x-lps-batch", ""))
+            if headers.get("content-encoding") == "gzip":
+                body = gzip.decompress(body)
+            lines = [line for line in body.decode().splitlines() if line]
+            records = [json.loads(line) for line in lines]
+        except (ValueError, OSError, EOFError):
+            return 400, {}, b""
+        if (session, batch) in self._seen:
+            # The client retried a batch whose answer it didn't get
+            self.duplicates += 1
+            return 204, {}, b""
+        self._seen.add((session, batch))
+        now = time.time()
+        for record in records:
+            self._fold(session, student, record)
+        self._student(student).last_seen = now
+        self._enqueue(("events", session, student, batch, now,
+                       [(record.get("type", ""), line) for record, line in zip(records, lines)]))
+        self.received += len(records)
+        self.batches += 1
+        return 204, {}, b""
+
+    def _fold(self, session, student, record):
+        """
+        Folds a journal record into the aggregates of its student.
+
+        Args:
+            session (str): Identifier of the session.
+            student (str): Username of the student.
+            record (dict): Decoded journal record.
+        """
+        if record.get("type") == "SessionStarted":
+            self._initial[session] = {str(name).lower() for name in record.get("initial", ())}
+        self._student(student).add(session, self._initial.get(session, set()), record)
+
+    def _student(self, student):
+        """
+        Returns the aggregates of a student, created on first use.
+
+        Args:
+            student (str): Username of the student.
+
+        Returns:
+            StudentAggregate: The aggregates.
+        """
+        aggregate = self.students.get(student)
+        if aggregate is None:
+            aggregate = self.students[student] = StudentAggregate()
+        return aggregate
+
+    def _enqueue(self, upload):
+        """
+        Queues an upload for the writer, the caller checked there is room.
+
+        Args:
+            upload (tuple): Upload tuple, see EventStore.write.
+        """
+        self._queue.put_nowait(upload)
+        self.peak_queue = max(self.peak_queue, self._queue.qsize())
+
+    @staticmethod
+    def _json(value):
+        """
+        Encodes a JSON response.
+
+        Args:
+            value (object): Value to encode.
+
+        Returns:
+            tuple: Status code, extra headers and response body.
+        """
+        return 200, {"Content-Type": "application/json"}, json.dumps(value).encode()
+
+    @staticmethod
+    def _response(status, headers, body, keep_alive):
+        """
+        Serializes a response.
+
+        Args:
+            status (int): Status code.
+            headers (dict): Extra headers.
+            body (bytes): Response body.
+            keep_alive (bool): Keep the connection open for the next request.
+
+        Returns:
+            bytes: The response.
+        """
+        reasons = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+                   413: "Content Too Large", 503: "Service Unavailable"}
+        lines = [f"HTTP/1.1 {status} {reasons[status]}", f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
@@ -0,0 +1,133 @@
+"""
+    Collector store module for LPS
+
+    Keeps everything the collector received in an embedded SQLite database.
+    Writes come in batches of uploads so one transaction and one fsync cover
+    many clients.
+"""
+import os
+import json
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    session TEXT NOT NULL,
+    batch INTEGER NOT NULL,
+    student TEXT NOT NULL,
+    received REAL NOT NULL,
+    PRIMARY KEY (session, batch)
+);
+CREATE TABLE IF NOT EXISTS events (
+    session TEXT NOT NULL,
+    student TEXT NOT NULL,
+    type TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reports (
+    session TEXT PRIMARY KEY,
+    student TEXT NOT NULL,
+    received REAL NOT NULL,
+    pdf BLOB NOT NULL
+);
+"""
+
+class EventStore:
+    """
+    A class to persist uploaded event batches and reports.
+
+    Not thread safe, the collector uses it from a single writer thread.
+
+    Attributes:
+        path (str): Path of the SQLite database.
+        transactions (int): Write transactions committed.
+        rows (int): Events written.
+        _db (sqlite3.Connection): Connection to the database, None while closed.
+    """
+
+    def __init__(self, path):
+        """
+        Initializes the store without opening the database.
+
+        Args:
+            path (str): Path of the SQLite database, created if missing.
+        """
+        self.path = path
+        self.transactions = 0
+        self.rows = 0
+        self._db = None
+
+    def open(self):
+        """
+        Opens the database and creates the tables.
+        """
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        # WAL lets the dashboard read while batches are written, NORMAL syncs once per checkpoint
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def write(self, uploads):
+        """
+        Writes uploads in a single transaction.
+
+        Args:
+            uploads (list): Upload tuples, ("events", session, student, batch, received, records)
+                with records as type and journal line pairs, or ("report", session,
+                student, received, pdf).
+        """
+        batches, events, reports = [], [], []
+        for upload in uploads:
+            if upload[0] == "events":
+                _, session, student, batch, received, records = upload
+                batches.append((session, batch, student, received))
+                events.extend((session, student, kind, line) for kind, line in records)
+            else:
+                reports.append(upload[1:])
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO batches VALUES (?, ?, ?, ?)", batches)
+            self._db.executemany("INSERT INTO events VALUES (?, ?, ?, ?)", events)
+            self._db.executemany("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)", reports)
+        self.transactions += 1
+        self.rows += len(events)
+
+    def batches(self):
+        """
+        Lists the batches already stored, to recognize uploads that are retried.
+
+        Returns:
+            set: Session and batch sequence number pairs.
+        """
+        return set(self._db.execute("SELECT session, batch FROM batches"))
+
+    def replay(self):
+        """
+        Reads back all stored events, to rebuild the live aggregates after a restart.
+
+        Yields:
+            tuple: Session, student and decoded journal record, in the order they were stored.
+        """
+        for session, student, record in self._db.execute("SELECT session, student, record FROM events ORDER BY rowid"):
+            yield session, student, json.loads(record)
+
+    def report(self, session):
+        """
+        Reads the stored report of a session.
+
+        Args:
+            session (str): Identifier of the session.
+
+        Returns:
+            bytes: The report PDF, None if none was uploaded.
+        """
+        row = self._db.execute("SELECT pdf FROM reports WHERE session = ?", (session,)).fetchone()
+        return row[0] if row else None
@@ -11,9 +11,16 @@ import cv2 as cv
 import mediapipe as mp
 import numpy as np
 import time
+from datetime import datetime
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 
+from proctoring.session.events import GazeAway, ComponentStopped
+from proctoring.session.metrics import Metrics
+from proctoring.governor import Governor
+from proctoring.supervisor import Supervisor
+from proctoring.gaze.recording import GazeRecording
+
 class Gaze:
     """
     A class to handle gaze tracking using Mediapipe and OpenCV.
@@ -33,8 +40,12 @@ class Gaze:
         _frames (int): Counter for the number of processed frames.
         _track (dict): Dictionary to store tracking data for facial landmarks and vectors.
         _timer (float): Timer to measure the duration of gaze-away events.
-        _queue (multiprocessing.Queue): Queue for sending gaze-away duration to the main process.
+        _queue (multiprocessing.Queue): Queue for sending gaze-away events to the main process.
         _active (bool): Indicates whether the gaze tracking process is active.
+        _stop (multiprocessing.Event): Set by the main process to stop tracking.
+        _metrics (Metrics): Frame and gaze-away metrics of the tracker.
+        _throttle (Value): Throttle level set by the resource governor, None if not governed.
+        _recording (GazeRecording): Per-frame gaze vectors of the session, None if not recorded.
     """
 
     # Constants for facial landmark indices and threshold values
@@ -43,7 +54,7 @@ class Gaze:
     DEFAULT_Y_THRESHOLD = 0.1
     MIN_GAZE_DURATION = 0.25
 
-    def __init__(self, queue, demo=False):
+    def __init__(self, queue, demo=False, stop=None, throttle=None, record=None):
         """
         Initializes the Gaze class and starts the tracking process.
         
@@ -51,8 +62,11 @@ class Gaze:
         the continuous tracking loop.
 
         Args:
-            queue (multiprocessing.Queue): Queue for sending gaze-away duration to the main process.
+            queue (multiprocessing.Queue): Queue for sending gaze-away events to the main process.
             demo (bool): Whether to run in demo mode with visualization.
+            stop (multiprocessing.Event): Set by the main process to stop tracking.
+            throttle (Value): Throttle level set by the resource governor, None if not governed.
+            record (str): Path to record the gaze vector of every frame to, None to not record.
         """
         self._feed = cv.VideoCapture(0)
         self._frame = None
@@ -85,23 +99,45 @@ class Gaze:
         self._timer = None
         self._queue = queue
         self._active = True
+        self._stop = stop
+        self._metrics = Metrics("gaze", queue)
+        self._throttle = throttle
+        self._recording = GazeRecording(record) if record else None
 
         # Check if camera is available
         if not self._feed.isOpened():
             raise RuntimeError("Could not open videostream")
 
         # Main processing loop
-        while self._active:
+        while self._active and not (self._stop and self._stop.is_set()):
+            frame_start = time.perf_counter()
             _, self._frame = self._feed.read()
             self._frames += 1
             self._analyze()
             if self._track["g_normal"]:
+                if self._recording is not None:
+                    self._recording.add(time.time(), self._track["g_normal"])
                 self._time()
                 if demo:
                     self._visualise()
 
             cv.waitKeyEx(1)
+            self._metrics.inc("frames_total")
+            self._metrics.observe("frame_seconds", time.perf_counter() - frame_start)
+            self._metrics.tick()
+            Supervisor.beat()
+            Governor.pace(self._throttle, frame_start)
         
+        # Report a gaze-away still in progress and acknowledge the stop
+        if self._gazeaway:
+            if self._recording is not None:
+                self._recording.end(time.time())
+            self._report()
+        if self._recording is not None:
+            self._recording.save()
+        self._metrics.flush()
+        self._queue.put(ComponentStopped("gaze", datetime.now()))
+
         # Clean up resources when done
         self._feed.release()
         cv.destroyAllWindows()
@@ -126,12 +162,13 @@ class Gaze:
         Reports the duration of a gaze-away event to the main process.
         
         Calculates the time spent looking away and sends it through the queue
-        if it exceeds the minimum duration threshold.
+        together with its start time if it exceeds the minimum duration threshold.
         """
         tdiff = time.time() - self._timer
         if tdiff > self.MIN_GAZE_DURATION:
             try:
-                self._queue.put(tdiff)
+                self._queue.put(GazeAway(self._timer, tdiff))
+                self._metrics.inc("gazeaway_total")
             except Exception as e:
                 print(f"Error sending data to queue: {e}")
 
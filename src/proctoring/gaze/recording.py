@@ -0,0 +1,83 @@
+"""
+    Gaze recording module for LPS
+
+    Records the gaze vector of every analyzed frame with its time, so the
+    gaze-away thresholds can be tuned offline on real sessions instead of
+    running new ones, see rescore.
+"""
+from array import array
+
+import numpy as np
+
+class GazeRecording:
+    """
+    A class to record the per-frame input of Gaze._time.
+
+    Frames are buffered in arrays of primitive values, 16 bytes per frame,
+    and saved as a structured NumPy array when the tracker stops. A frame
+    without a gaze vector marks where tracking stopped, so a gaze-away still
+    in progress ends there like it does live.
+
+    Attributes:
+        path (str): Path of the .npy file written by save.
+        _times (array): Unix time of every frame.
+        _vectors (array): x and y of the gaze vector of every frame, as consecutive pairs.
+    """
+
+    DTYPE = np.dtype([("t", "<f8"), ("x", "<f4"), ("y", "<f4")])
+
+    def __init__(self, path):
+        """
+        Initializes an empty recording.
+
+        Args:
+            path (str): Path of the .npy file to write.
+        """
+        self.path = path
+        self._times = array("d")
+        self._vectors = array("f")
+
+    def add(self, t, vector):
+        """
+        Records a frame.
+
+        Args:
+            t (float): Unix time of the frame.
+            vector (tuple): Gaze vector of the frame, only x and y are kept.
+        """
+        self._times.append(t)
+        self._vectors.append(vector[0])
+        self._vectors.append(vector[1])
+
+    def end(self, t):
+        """
+        Records when tracking stopped, closing a gaze-away in progress.
+
+        Args:
+            t (float): Unix time tracking stopped.
+        """
+        self.add(t, (np.nan, np.nan))
+
+    def save(self):
+        """
+        Writes the recording.
+        """
+        frames = np.empty(len(self._times), dtype=self.DTYPE)
+        frames["t"] = np.frombuffer(self._times, dtype=np.float64)
+        vectors = np.frombuffer(self._vectors, dtype=np.float32).reshape(-1, 2)
+        frames["x"] = vectors[:, 0]
+        frames["y"] = vectors[:, 1]
+        np.save(self.path, frames)
+
+    @staticmethod
+    def load(path):
+        """
+        Reads a recording.
+
+        Args:
+            path (str): Path of the .npy file.
+
+        Returns:
+            np.ndarray: Frames with fields t, x and y.
+        """
+        return np.load(path)
@@ -0,0 +1,139 @@
+"""
+    Offline gaze re-scoring for LPS
+
+    Scores gaze recordings of exam sessions, see GazeRecording, for a grid of
+    gaze-away thresholds and minimum durations at once. A frame is looking away
+    like in Gaze._time, but every setting is evaluated over the whole recording
+    with array operations instead of replaying the frames one by one, and
+    recordings are scored in parallel on all cores.
+
+    A gaze-away lasts from its first frame looking away until the first frame
+    that doesn't, which is where the live tracker takes its timestamps too, so
+    the current settings reproduce the live events up to the time between
+    recording a frame and timing it. A gaze-away still in progress when the
+    recording ends is dropped, unless the tracker stopped during it.
+
+    Usage: PYTHONPATH=src python -m proctoring.gaze.rescore exams/gaze/*.npy --x 0.1 0.15 0.2 --min 0.25 1
+"""
+import argparse
+import functools
+import multiprocessing
+
+import numpy as np
+
+from .gaze import Gaze
+from .recording import GazeRecording
+
+X_THRESHOLDS = (0.1, 0.125, 0.15, 0.175, 0.2, 0.25)
+Y_THRESHOLDS = (0.05, 0.075, 0.1, 0.125, 0.15, 0.2)
+MIN_DURATIONS = (0.25, 0.5, 1.0, 2.0)
+
+def score(frames, x_thresholds, y_thresholds, min_durations):
+    """
+    Scores a recording for every combination of thresholds and minimum duration.
+
+    Args:
+        frames (np.ndarray): Recorded frames with fields t, x and y.
+        x_thresholds (sequence): Horizontal gaze thresholds.
+        y_thresholds (sequence): Vertical gaze thresholds.
+        min_durations (sequence): Minimum durations of a reported gaze-away in seconds.
+
+    Returns:
+        tuple: Reported gaze-aways and their total seconds, both arrays of shape
+            (len(x_thresholds), len(y_thresholds), len(min_durations)).
+    """
+    xs = np.asarray(x_thresholds, dtype=np.float64)
+    ys = np.asarray(y_thresholds, dtype=np.float64)
+    mins = np.asarray(min_durations, dtype=np.float64)
+    shape = (len(xs), len(ys), len(mins))
+    frames_total = len(frames)
+    if frames_total == 0:
+        return np.zeros(shape, dtype=np.int64), np.zeros(shape)
+
+    # Looking away per threshold pair and frame, frames without a gaze vector never are
+    x, y = np.abs(frames["x"]).astype(np.float64), np.abs(frames["y"]).astype(np.float64)
+    away = (x > xs[:, None])[:, None, :] | (y > ys[:, None])[None, :, :]
+    away = away.reshape(len(xs) * len(ys), frames_total)
+
+    # Runs of frames looking away start where away turns on and end at the frame turning it off
+    edges = np.zeros((away.shape[0], frames_total + 2), dtype=np.int8)
+    edges[:, 1:-1] = away
+    edges = np.diff(edges, axis=1)
+    pairs, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    closed = ends < frames_total
+    pairs, starts, ends = pairs[closed], starts[closed], ends[closed]
+    durations = frames["t"][ends] - frames["t"][starts]
+
+    # Count the runs over every minimum duration per threshold pair
+    reported = durations[:, None] > mins[None, :]
+    cells = (pairs[:, None] * len(mins) + np.arange(len(mins))[None, :])[reported]
+    seconds = np.broadcast_to(durations[:, None], reported.shape)[reported]
+    size = away.shape[0] * len(mins)
+    return (np.bincount(cells, minlength=size).reshape(shape),
+            np.bincount(cells, weights=seconds, minlength=size).reshape(shape))
+
+def _score_file(path, x_thresholds, y_thresholds, min_durations):
+    """
+    Scores a recording file, see score.
+    """
+    return score(GazeRecording.load(path), x_thresholds, y_thresholds, min_durations)
+
+def rescore(paths, x_thresholds=X_THRESHOLDS, y_thresholds=Y_THRESHOLDS, min_durations=MIN_DURATIONS, processes=None):
+    """
+    Scores recordings of many sessions in parallel.
+
+    Args:
+        paths (list): Paths of the recordings.
+        x_thresholds (sequence): Horizontal gaze thresholds.
+        y_thresholds (sequence): Vertical gaze thresholds.
+        min_durations (sequence): Minimum durations of a reported gaze-away in seconds.
+        processes (int): Processes scoring recordings, None for one per core,
+            1 to score in this process.
+
+    Returns:
+        dict: Gaze-aways and total seconds per recording like score returns them, by path.
+    """
+    scorer = functools.partial(_score_file, x_thresholds=x_thresholds, y_thresholds=y_thresholds,
+                               min_durations=min_durations)
+    if processes == 1:
+        return {path: scorer(path) for path in paths}
+    with multiprocessing.Pool(processes) as pool:
+        return dict(zip(paths, pool.map(scorer, paths)))
+
+def main():
+    """
+    Scores the recordings given on the command line and prints the mean per session of every setting.
+
+    Command line arguments:
+        RECORDING: Gaze recordings to score
+        --x X [X ...]: Horizontal gaze thresholds
+        --y Y [Y ...]: Vertical gaze thresholds
+        --min SECONDS [SECONDS ...]: Minimum durations of a reported gaze-away
+        --processes N: Processes scoring recordings, one per core by default
+    """
+    parser = argparse.ArgumentParser(prog='LPS gaze rescore')
+    parser.add_argument('recordings', nargs="+", metavar="RECORDING", help="gaze recordings to score")
+    parser.add_argument('--x', nargs="+", type=float, default=X_THRESHOLDS, help="horizontal gaze thresholds")
+    parser.add_argument('--y', nargs="+", type=float, default=Y_THRESHOLDS, help="vertical gaze thresholds")
+    parser.add_argument('--min', nargs="+", type=float, default=MIN_DURATIONS, metavar="SECONDS",
+                        help="minimum durations of a reported gaze-away")
+    parser.add_argument('--processes', type=int, help="processes scoring recordings, one per core by default")
+    args = parser.parse_args()
+
+    results = rescore(args.recordings, args.x, args.y, args.min, args.processes)
+    counts = np.mean([count for count, _ in results.values()], axis=0)
+    seconds = np.mean([total for _, total in results.values()], axis=0)
+
+    # The live settings are marked with an asterisk
+    live = (Gaze.DEFAULT_X_THRESHOLD, Gaze.DEFAULT_Y_THRESHOLD, Gaze.MIN_GAZE_DURATION)
+    print(f"{len(results)} sessions, mean per session")
+    print(f"  {'x':>6}{'y':>7}{'min s':>7}{'gaze-aways':>12}{'minutes':>10}")
+    for i, x in enumerate(args.x):
+        for j, y in enumerate(args.y):
+            for k, minimum in enumerate(args.min):
+                mark = "*" if (x, y, minimum) == live else " "
+                print(f"{mark} {x:>6.3f}{y:>7.3f}{minimum:>7.2f}{counts[i, j, k]:>12.1f}{seconds[i, j, k] / 60:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+    Resource governor module for LPS
+
+    Keeps the monitoring components from competing with the exam browser on
+    small machines. Workers run at a lower priority, on the last CPU and with
+    single-threaded math libraries. In adaptive mode the gaze tracker and the
+    process scanner slow down while Chrome is waiting for CPU time.
+"""
+import os
+import sys
+import glob
+import time
+import threading
+
+class Governor:
+    """
+    A class to limit the CPU use of the monitoring components.
+
+    Static limits are applied by each worker to itself when it starts. The
+    adaptive throttle runs on a thread in the main process and shares a
+    throttle level with the workers, 0 means full speed.
+
+    Attributes:
+        throttle (Value): Current throttle level, read by the workers without locking.
+        interval (float): Seconds between two starvation measurements.
+        high (float): Starvation above which the throttle level is raised.
+        low (float): Starvation below which the throttle level is lowered.
+        max_level (int): Highest throttle level reached.
+        throttled_seconds (float): Time spent at a throttle level above 0.
+        _metrics (Registry): Registry the throttle level and starvation are reported to.
+        _browser_pid (int): Process ID of the browser worker, Chrome runs below it.
+        _stop (threading.Event): Set to stop the adaptive throttle.
+        _thread (threading.Thread): Thread running the adaptive throttle.
+    """
+
+    # Static limits per component, browser is not limited as Chrome inherits them
+    POLICY = {
+        "gaze": {"nice": 10, "background_cpu": True},
+        "process_monitor": {"nice": 15, "background_cpu": True}
+    }
+    THREAD_LIMIT = 1
+    THREAD_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+    # Limits per throttle level
+    GAZE_MAX_FPS = [None, 15, 8, 4]
+    SCAN_INTERVAL = [1, 2, 4, 8]
+
+    def __init__(self, context, interval=2.0, high=0.25, low=0.05):
+        """
+        Initializes the governor without starting the adaptive throttle.
+
+        Args:
+            context (multiprocessing.context.BaseContext): Context the workers are started from.
+            interval (float): Seconds between two starvation measurements.
+            high (float): Fraction of time Chrome waits for a CPU above which workers are slowed down.
+            low (float): Fraction of time Chrome waits for a CPU below which workers speed up again.
+        """
+        self.throttle = context.Value("i", 0, lock=False)
+        self.interval = interval
+        self.high = high
+        self.low = low
+        self.max_level = 0
+        self.throttled_seconds = 0.0
+        self._metrics = None
+        self._browser_pid = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def limit_threads(cls):
+        """
+        Limits the thread pools of the math libraries of processes started from now on.
+
+        The pools are sized when the libraries are imported, so this must be
+        called before the worker zygote is started.
+        """
+        for variable in cls.THREAD_VARIABLES:
+            os.environ.setdefault(variable, str(cls.THREAD_LIMIT))
+
+    @classmethod
+    def apply(cls, component):
+        """
+        Applies the static limits of a component to the calling process.
+
+        Limits the platform doesn't support are skipped.
+
+        Args:
+            component (str): Name of the component, e.g. "gaze".
+        """
+        import psutil
+        policy = cls.POLICY.get(component)
+        if policy is None:
+            return
+        process = psutil.Process()
+        try:
+            process.nice(max(process.nice(), policy["nice"]))
+        except (psutil.AccessDenied, ValueError, TypeError):
+            pass
+
+        # Keep the first CPUs free for the browser
+        if policy["background_cpu"] and hasattr(process, "cpu_affinity"):
+            cpus = process.cpu_affinity()
+            if len(cpus) > 1:
+                process.cpu_affinity(cpus[-1:])
+
+        if "cv2" in sys.modules:
+            sys.modules["cv2"].setNumThreads(cls.THREAD_LIMIT)
+
+    @classmethod
+    def pace(cls, throttle, frame_start):
+        """
+        Limits the frame rate of the gaze tracker while it is throttled.
+
+        Args:
+            throttle (Value): Throttle level of the governor, None if not governed.
+            frame_start (float): time.perf_counter() when the frame was read.
+        """
+        if not throttle or not throttle.value:
+            return
+        remaining = 1 / cls.GAZE_MAX_FPS[throttle.value] - (time.perf_counter() - frame_start)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def start(self, browser_pid, metrics=None):
+        """
+        Starts the adaptive throttle.
+
+        Args:
+            browser_pid (int): Process ID of the browser worker.
+            metrics (Registry): Registry to report the throttle level and starvation to.
+        """
+        self._browser_pid = browser_pid
+        self._metrics = metrics
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="governor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the adaptive throttle and lets the workers run at full speed.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.throttle.value = 0
+
+    def _run(self):
+        """
+        Measures Chrome starvation once per interval and adjusts the throttle level.
+        """
+        previous = self._chrome_schedstat()
+        while not self._stop.wait(self.interval):
+            current = self._chrome_schedstat()
+            starvation = self._starvation(previous, current)
+            previous = current
+
+            level = self.throttle.value
+            if starvation > self.high:
+                level = min(level + 1, len(self.GAZE_MAX_FPS) - 1)
+            elif starvation < self.low:
+                level = max(level - 1, 0)
+            self.throttle.value = level
+            self.max_level = max(self.max_level, level)
+            if level:
+                self.throttled_seconds += self.interval
+
+            if self._metrics is not None:
+                self._metrics.set("governor", "throttle_level", level)
+                self._metrics.set("governor", "chrome_starvation", starvation)
+                self._metrics.set("governor", "throttled_seconds", self.throttled_seconds)
+
+    def _chrome_schedstat(self):
+        """
+        Reads the scheduler statistics of every thread of the browser worker and
+        everything below it.
+
+        Returns:
+            dict: Nanoseconds spent running and waiting for a CPU per process and
+                thread ID, None if the platform has no scheduler statistics.
+        """
+        import psutil
+        if not os.path.exists("/proc/self/schedstat"):
+            return None
+        try:
+            browser = psutil.Process(self._browser_pid)
+            pids = [browser.pid] + [child.pid for child in browser.children(recursive=True)]
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return {}
+        stats = {}
+        for pid in pids:
+            for path in glob.glob(f"/proc/{pid}/task/*/schedstat"):
+                try:
+                    with open(path) as file:
+                        run, wait, _ = file.read().split()
+                except (OSError, ValueError):
+                    continue
+                stats[(pid, int(path.split("/")[4]))] = (int(run), int(wait))
+        return stats
+
+    def _starvation(self, previous, current):
+        """
+        Computes how starved Chrome was between two measurements.
+
+        Only threads present in both measurements are compared, so threads
+        that exited or were started in between, e.g. renderers of closed and
+        opened tabs, don't count their whole lifetime.
+
+        Args:
+            previous (dict): Earlier result of _chrome_schedstat.
+            current (dict): Later result of _chrome_schedstat.
+
+        Returns:
+            float: Fraction of the time Chrome wanted to run that it waited for a
+                CPU, between 0 and 1. Without scheduler statistics, the system
+                CPU load is used.
+        """
+        import psutil
+        if previous is None or current is None:
+            return psutil.cpu_percent() / 100
+        running = waiting = 0
+        for thread in previous.keys() & current.keys():
+            running += current[thread][0] - previous[thread][0]
+            waiting += current[thread][1] - previous[thread][1]
+        # Chrome was mostly idle, nothing to protect
+        if running + waiting < 0.05 * self.interval * 1e9:
+            return 0.0
+        return min(1.0, max(0.0, waiting / (running + waiting)))
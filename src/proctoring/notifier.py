@@ -0,0 +1,179 @@
+"""
+    Notification dispatch module for LPS
+
+    Sends desktop notifications from a thread of its own, so a slow
+    notification backend never stalls event handling, and merges bursts of
+    notifications of the same type into one.
+"""
+import queue
+import threading
+import time
+
+class Notifier:
+    """
+    A class to coalesce and rate-limit desktop notifications.
+
+    Notifications are queued without blocking and grouped by title. A group is
+    sent once its coalescing window has passed and at most once per interval
+    per title. Groups with more than one notification are sent as a summary.
+
+    Attributes:
+        send (callable): Called with a title and message to show a notification.
+        window (float): Seconds to wait for more notifications of the same title.
+        interval (float): Minimum seconds between two notifications with the same title.
+        sent (int): Notifications shown.
+        merged (int): Notifications folded into another one.
+        dropped (int): Notifications discarded because the queue was full or
+            still pending when stopped without flushing.
+        _queue (queue.Queue): Bounded queue of pending notifications.
+        _last_sent (dict): Monotonic time of the last notification per title.
+        _thread (threading.Thread): Thread sending notifications.
+        _flush (bool): Whether pending notifications are sent when stopping.
+    """
+
+    MAX_ITEMS = 5
+
+    def __init__(self, send, window=2.0, interval=10.0, maxsize=100):
+        """
+        Initializes the notifier without starting it.
+
+        Args:
+            send (callable): Called with a title and message to show a notification.
+            window (float): Seconds to wait for more notifications of the same title.
+            interval (float): Minimum seconds between two notifications with the same title.
+            maxsize (int): Maximum number of queued notifications.
+        """
+        self.send = send
+        self.window = window
+        self.interval = interval
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._last_sent = {}
+        self._thread = None
+        self._flush = True
+
+    def start(self):
+        """
+        Starts sending notifications.
+        """
+        self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None, flush=True):
+        """
+        Stops sending notifications.
+
+        Args:
+            timeout (float): Seconds to wait for the sender thread, None waits forever.
+            flush (bool): Send all pending notifications immediately if True,
+                drop them if False, e.g. once the exam is over.
+        """
+        if self._thread is not None:
+            self._flush = flush
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def notify(self, title, message, item=None, summary=None):
+        """
+        Queues a notification, never blocks.
+
+        Args:
+            title (str): Title of the notification, notifications are merged by title.
+            message (str): Body text when the notification is sent on its own.
+            item (str): What the notification is about, listed in the summary.
+            summary (str): Body text when notifications are merged, formatted
+                with count and items. The latest message is used if None.
+        """
+        try:
+            self._queue.put_nowait((title, message, item, summary))
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self):
+        """
+        Returns the notification counters.
+
+        Returns:
+            dict: Sent, merged and dropped notifications.
+        """
+        return {"sent": self.sent, "merged": self.merged, "dropped": self.dropped}
+
+    def _run(self):
+        """
+        Collects notifications into groups and sends each group when it is due.
+        """
+        pending = {}
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0, min(group["due"] for group in pending.values()) - time.monotonic())
+            try:
+                notification = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                notification = ()
+
+            if notification is None:
+                for title, group in pending.items():
+                    if self._flush:
+                        self._send(title, group)
+                    else:
+                        self.dropped += group["count"]
+                return
+            if notification:
+                self._add(pending, *notification)
+
+            now = time.monotonic()
+            for title in [title for title, group in pending.items() if group["due"] <= now]:
+                self._send(title, pending.pop(title))
+
+    def _add(self, pending, title, message, item, summary):
+        """
+        Adds a notification to the pending group of its title.
+
+        Args:
+            pending (dict): Pending groups by title.
+            title (str): Title of the notification.
+            message (str): Body text of the notification.
+            item (str): What the notification is about.
+            summary (str): Body text format for merged notifications.
+        """
+        group = pending.get(title)
+        if group is None:
+            # Due after the window, but not before the rate limit allows
+            due = time.monotonic() + self.window
+            if title in self._last_sent:
+                due = max(due, self._last_sent[title] + self.interval)
+            pending[title] = {"due": due, "count": 1, "message": message, "items": [item], "summary": summary}
+            return
+        self.merged += 1
+        group["count"] += 1
+        group["message"] = message
+        group["items"].append(item)
+
+    def _send(self, title, group):
+        """
+        Shows the notification for a group.
+
+        Args:
+            title (str): Title of the notification.
+            group (dict): Pending group of notifications with this title.
+        """
+        message = group["message"]
+        if group["count"] > 1 and group["summary"]:
+            items = [item for item in group["items"] if item is not None]
+            listed = ", ".join(items[:self.MAX_ITEMS])
+            if len(items) > self.MAX_ITEMS:
+                listed += f" and {len(items) - self.MAX_ITEMS} more"
+            message = group["summary"].format(count=group["count"], items=listed)
+
+        self._last_sent[title] = time.monotonic()
+        try:
+            self.send(title, message)
+            self.sent += 1
+        except Exception as e:
+            print(f"Couldn't send notification: {e}")
@@ -0,0 +1,274 @@
+"""
+    Exec permission gate for LPS
+
+    Lets the kernel ask before a program runs instead of detecting it once it
+    is running. Uses fanotify with FAN_OPEN_EXEC_PERM, which is Linux only and
+    needs CAP_SYS_ADMIN, so the gate is optional and the process monitor keeps
+    detecting and killing processes without it.
+"""
+import os
+import re
+import ctypes
+import select
+import struct
+import threading
+
+class ExecGate:
+    """
+    A class to allow or deny every exec on the machine before it happens.
+
+    Execs of whitelisted programs, of other users and of descendants of the
+    proctoring system are allowed, every other exec of the exam user is
+    denied. Whether a program is whitelisted is cached by path and inode, so
+    allowed execs cost a dictionary lookup.
+
+    Attributes:
+        uid (int): User ID of the exam user, only their execs are checked.
+        safe_roots (set): Process IDs whose descendants are part of the proctoring system.
+        on_deny (callable): Called with the process ID and program name of a denied exec.
+        allowed (int): Execs allowed.
+        denied (int): Execs denied.
+        cache_hits (int): Execs decided from the verdict cache.
+        _whitelist (re.Pattern): Matches program names containing a whitelisted name.
+        _verdicts (dict): Whether a program is whitelisted, by path and inode.
+        _fd (int): fanotify file descriptor, None while stopped.
+        _stop (threading.Event): Set to stop answering.
+        _thread (threading.Thread): Thread answering permission events.
+    """
+
+    FAN_CLOEXEC = 0x1
+    FAN_CLASS_CONTENT = 0x4
+    FAN_MARK_ADD = 0x1
+    FAN_MARK_MOUNT = 0x10
+    FAN_OPEN_EXEC_PERM = 0x40000
+    FAN_ALLOW = 0x1
+    FAN_DENY = 0x2
+    METADATA_VERSION = 3
+    AT_FDCWD = -100
+    # struct fanotify_event_metadata and struct fanotify_response
+    EVENT = struct.Struct("=IBBHQii")
+    RESPONSE = struct.Struct("=iI")
+    # Filesystems nothing is executed from
+    PSEUDO_FILESYSTEMS = {"proc", "sysfs", "cgroup", "cgroup2", "devpts", "mqueue", "securityfs",
+                          "debugfs", "tracefs", "pstore", "bpf", "configfs", "fusectl", "binfmt_misc",
+                          "autofs", "hugetlbfs", "rpc_pipefs", "efivarfs"}
+    # The kernel opens the ELF interpreter of every dynamically linked program for exec too
+    LOADER = re.compile(r"ld(-linux[\w.-]*)?\.so")
+    MAX_VERDICTS = 4096
+    POLL_SECONDS = 0.5
+
+    def __init__(self, uid, safe_processes, safe_roots, on_deny):
+        """
+        Initializes the gate without starting it.
+
+        Args:
+            uid (int): User ID of the exam user.
+            safe_processes (list): Whitelisted program names, matched as substrings like
+                ProcessMonitor does.
+            safe_roots (set): Process IDs whose descendants are never denied, shared
+                with the caller so it can add more while the gate runs.
+            on_deny (callable): Called with the process ID and program name of a
+                denied exec, from the gate thread.
+        """
+        self.uid = uid
+        self.safe_roots = safe_roots
+        self.on_deny = on_deny
+        self.allowed = 0
+        self.denied = 0
+        self.cache_hits = 0
+        self._whitelist = re.compile("|".join(re.escape(name) for name in safe_processes if name))
+        self._verdicts = {}
+        self._fd = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def supported(cls):
+        """
+        Checks if the platform has fanotify.
+
+        Returns:
+            bool: True on Linux with a C library exposing fanotify.
+        """
+        if not os.path.exists("/proc/self/mounts"):
+            return False
+        return hasattr(ctypes.CDLL(None), "fanotify_init")
+
+    def start(self):
+        """
+        Starts answering exec permission events for all mounted filesystems.
+
+        Raises:
+            OSError: If fanotify is unavailable or not permitted, e.g. without CAP_SYS_ADMIN.
+        """
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.fanotify_mark.argtypes = [ctypes.c_int, ctypes.c_uint, ctypes.c_uint64, ctypes.c_int, ctypes.c_char_p]
+        fd = libc.fanotify_init(self.FAN_CLOEXEC | self.FAN_CLASS_CONTENT, os.O_RDONLY | os.O_LARGEFILE | os.O_CLOEXEC)
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"fanotify_init: {os.strerror(error)}")
+
+        marked = 0
+        for mount in self._mounts():
+            if libc.fanotify_mark(fd, self.FAN_MARK_ADD | self.FAN_MARK_MOUNT, self.FAN_OPEN_EXEC_PERM,
+                                  self.AT_FDCWD, os.fsencode(mount)) == 0:
+                marked += 1
+        if not marked:
+            error = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(error, f"fanotify_mark: {os.strerror(error)}")
+
+        self._fd = fd
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="exec-gate", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the gate, the kernel allows every exec again once the descriptor is closed.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        """
+        Returns the gate counters.
+
+        Returns:
+            dict: Allowed and denied execs and verdict cache hits.
+        """
+        return {"allowed": self.allowed, "denied": self.denied, "cache_hits": self.cache_hits}
+
+    def decide(self, pid, path, inode):
+        """
+        Decides if a process may execute a program.
+
+        Args:
+            pid (int): Process ID of the process calling exec.
+            path (str): Path of the program.
+            inode (int): Inode of the program.
+
+        Returns:
+            bool: True to allow the exec.
+        """
+        key = (path, inode)
+        whitelisted = self._verdicts.get(key)
+        if whitelisted is not None:
+            self.cache_hits += 1
+        else:
+            name = os.path.basename(path)
+            whitelisted = self.LOADER.match(name) is not None or (
+                bool(self._whitelist.pattern) and self._whitelist.search(name) is not None)
+            if len(self._verdicts) >= self.MAX_VERDICTS:
+                self._verdicts.clear()
+            self._verdicts[key] = whitelisted
+        if whitelisted:
+            return True
+
+        try:
+            if os.stat(f"/proc/{pid}").st_uid != self.uid:
+                return True
+        except OSError:
+            # Gone already, nothing left to protect against
+            return True
+        return self._descends_from_safe_root(pid)
+
+    def _descends_from_safe_root(self, pid):
+        """
+        Checks if a process is a safe root or one of its descendants.
+
+        Args:
+            pid (int): Process ID to check.
+
+        Returns:
+            bool: True if the process or an ancestor is a safe root.
+        """
+        while pid > 1:
+            if pid in self.safe_roots:
+                return True
+            try:
+                with open(f"/proc/{pid}/stat", "rb") as file:
+                    # The name may contain spaces and parentheses, the fields after it don't
+                    pid = int(file.read().rsplit(b")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                return False
+        return False
+
+    def _mounts(self):
+        """
+        Lists the mount points programs can be executed from.
+
+        Returns:
+            list: Mount point paths.
+        """
+        mounts = []
+        with open("/proc/self/mounts") as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) >= 3 and fields[2] not in self.PSEUDO_FILESYSTEMS:
+                    # Spaces and tabs in mount points are octal escaped
+                    mounts.append(re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), fields[1]))
+        return mounts
+
+    def _run(self):
+        """
+        Answers permission events until stopped.
+
+        Every event is answered, also when deciding fails, as an unanswered
+        event blocks the exec until the descriptor is closed. The thread runs
+        at normal priority on all CPUs, execs wait for it even when the
+        governor slows down the rest of the process monitor.
+        """
+        thread = threading.get_native_id()
+        try:
+            os.setpriority(os.PRIO_PROCESS, thread, 0)
+            os.sched_setaffinity(thread, range(os.cpu_count()))
+        except OSError:
+            pass
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select([self._fd], [], [], self.POLL_SECONDS)
+                if not readable:
+                    continue
+                buffer = os.read(self._fd, 64 * self.EVENT.size)
+                offset = 0
+                while offset + self.EVENT.size <= len(buffer):
+                    length, version, _, _, mask, fd, pid = self.EVENT.unpack_from(buffer, offset)
+                    offset += length
+                    if version != self.METADATA_VERSION or length < self.EVENT.size or fd < 0:
+                        if fd >= 0:
+                            os.close(fd)
+                        if length < self.EVENT.size:
+                            break
+                        continue
+                    self._answer(fd, pid)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _answer(self, fd, pid):
+        """
+        Decides a single exec and writes the verdict.
+
+        Args:
+            fd (int): Descriptor of the program, closed afterwards.
+            pid (int): Process ID of the process calling exec.
+        """
+        allow = True
+        path = None
+        try:
+            path = os.readlink(f"/proc/self/fd/{fd}")
+            allow = self.decide(pid, path, os.fstat(fd).st_ino)
+        except OSError:
+            pass
+        finally:
+            os.write(self._fd, self.RESPONSE.pack(fd, self.FAN_ALLOW if allow else self.FAN_DENY))
+            os.close(fd)
+
+        if allow:
+            self.allowed += 1
+        else:
+            self.denied += 1
+            self.on_deny(pid, os.path.basename(path))
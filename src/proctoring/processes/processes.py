@@ -4,10 +4,16 @@
 import os
 import pwd
 import time
+import threading
 import psutil
-from multiprocessing import Process
 from datetime import datetime
 
+from proctoring.session.events import ProcessViolation, ComponentStopped
+from proctoring.session.metrics import Metrics
+from proctoring.governor import Governor
+from proctoring.supervisor import Supervisor
+from proctoring.snapshot import ProcessSnapshot
+
 class ProcessMonitor:
     """
     A class to monitor and control system processes during exam sessions.
@@ -22,36 +28,56 @@ class ProcessMonitor:
         pid_queue (Queue): Queue for receiving internal PIDs to exclude from monitoring.
         safe_pid (set): Set of process IDs that are part of the proctoring system.
         known_pids (set): Set of process IDs already reported.
+        stop (multiprocessing.Event): Set by the main process to stop monitoring.
+        metrics (Metrics): Scan and violation metrics of the monitor.
+        throttle (Value): Throttle level set by the resource governor, None if not governed.
+        enforce (bool): Whether execs are denied before they run, see ExecGate.
+        gate (ExecGate): Running exec permission gate, None if not enforcing.
     """
     
-    def __init__(self, queue, pid_queue):
+    def __init__(self, queue, pid_queue, stop=None, throttle=None, enforce=False):
         """
         Initializes the ProcessMonitor with communication queues and loads whitelist.
         
         Args:
             queue (Queue): Queue for sending process events to the main process.
             pid_queue (Queue): Queue for receiving internal PIDs to exclude from monitoring.
+            stop (multiprocessing.Event): Set by the main process to stop monitoring.
+            throttle (Value): Throttle level set by the resource governor, None if not governed.
+            enforce (bool): Deny unauthorized execs before they run if the platform allows it.
         """
         self.queue = queue
         self.username = pwd.getpwuid(os.getuid())[0]
         self.safe_processes = open(os.path.join(os.path.dirname(__file__), "whitelist.txt")).read().splitlines()
         self.pid_queue = pid_queue
         self.safe_pid = set()
+        self.stop = stop if stop is not None else threading.Event()
+        self.metrics = Metrics("process_monitor", queue)
+        self.throttle = throttle
+        self.enforce = enforce
+        self.gate = None
         
     def run(self):
         """
         Main monitoring loop that continuously checks for new processes.
         
         Detects new processes, terminates unauthorized ones, and reports them
-        through the queue to the main proctoring system.
+        through the queue to the main proctoring system. Runs until the stop
+        event is set and acknowledges the stop through the queue.
         """
         print("Process monitoring started\n")
         previous_processes = self._get_user_processes()
         self.known_pids = set()  # Track PIDs we've already reported
+        if self.enforce:
+            self._start_gate()
+        Supervisor.beat()
         
-        while True:
-            time.sleep(1)  # Check processes every second
+        # Check processes every second, less often when throttled, wake up immediately when stopped
+        while not self.stop.wait(Governor.SCAN_INTERVAL[self.throttle.value if self.throttle else 0]):
+            scan_start = time.perf_counter()
             current_processes = self._get_user_processes()
+            self.metrics.observe("scan_seconds", time.perf_counter() - scan_start)
+            self.metrics.set("user_processes", sum(len(pids) for pids in current_processes.values()))
             
             # Compare with previous snapshot to detect changes
             started, stopped = self._compare_processes(previous_processes, current_processes)
@@ -69,20 +95,61 @@ class ProcessMonitor:
                             # Skip if process is part of the proctoring system or already known
                             if pid['pid'] in self.safe_pid or pid['pid'] in self.known_pids:
                                 continue
+                            # Children of proctoring processes (e.g. new browser renderers) are safe too
+                            if self._has_safe_parent(pid['pid']):
+                                self.safe_pid.add(pid['pid'])
+                                continue
                             # Terminate unauthorized process
                             self._kill_process(pid['pid'])
                             self.known_pids.add(pid['pid'])
                             # Report the violation
-                            self.queue.put({
-                                'type': 'new_process',
-                                'timestamp': datetime.now(),
-                                'pid': pid['pid'],
-                                'name': name
-                            })
+                            self.queue.put(ProcessViolation(datetime.now(), pid['pid'], name))
+                            self.metrics.inc("violations_total")
                 
             # Update previous state for next comparison
             previous_processes = current_processes
+            if self.gate:
+                for name, value in self.gate.stats().items():
+                    self.metrics.set(f"exec_{name}", value)
+            self.metrics.tick()
+            Supervisor.beat()
+
+        if self.gate:
+            self.gate.stop()
+        self.metrics.flush()
+        self.queue.put(ComponentStopped("process_monitor", datetime.now()))
             
+    def _start_gate(self):
+        """
+        Starts denying unauthorized execs before they run.
+
+        The worker zygote is the safe root, every monitoring component and the
+        browser they start descend from it. Without fanotify or the permission
+        to use it, processes are only detected and killed once running.
+        """
+        from proctoring.processes.execgate import ExecGate
+        if not ExecGate.supported():
+            print("Exec gate not supported on this platform, detecting processes only")
+            return
+        gate = ExecGate(pwd.getpwnam(self.username).pw_uid, self.safe_processes, {os.getppid()}, self._denied)
+        try:
+            gate.start()
+        except OSError as e:
+            print(f"Couldn't start exec gate, detecting processes only: {e}")
+            return
+        self.gate = gate
+
+    def _denied(self, pid, name):
+        """
+        Reports an exec denied by the gate as a violation.
+
+        Args:
+            pid (int): Process ID of the process that tried to exec.
+            name (str): Name of the denied program.
+        """
+        self.known_pids.add(pid)
+        self.queue.put(ProcessViolation(datetime.now(), pid, name))
+
     def _get_user_processes(self):
         """
         Gets all processes belonging to the current user.
@@ -90,22 +157,7 @@ class ProcessMonitor:
         Returns:
             dict: Dictionary of processes grouped by name, with process details.
         """
-        processes_dict = {}
-        for process in psutil.process_iter(['pid', 'name', 'username']):
-            try:
-                if process.info['username'] == self.username:
-                    proc_name = process.info['name']
-                    proc_info = {
-                        "pid": process.info['pid'],
-                        "username": process.info['username']
-                    }
-                    # Group processes by name
-                    if proc_name not in processes_dict:
-                        processes_dict[proc_name] = []
-                    processes_dict[proc_name].append(proc_info)
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        return processes_dict
+        return ProcessSnapshot.take().user_processes(self.username)
 
     def _compare_processes(self, old, new):
         """
@@ -141,6 +193,21 @@ class ProcessMonitor:
 
         return started, stopped
     
+    def _has_safe_parent(self, pid):
+        """
+        Checks if a process descends from a process of the proctoring system.
+        
+        Args:
+            pid (int): Process ID to check.
+            
+        Returns:
+            bool: True if any ancestor of the process is a safe PID.
+        """
+        try:
+            return any(parent.pid in self.safe_pid for parent in psutil.Process(pid).parents())
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return False
+
     def _kill_process(self, pid):
         """
         Terminates a process and all its children recursively.
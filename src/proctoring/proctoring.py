@@ -1,22 +1,27 @@
+import os
 import time
-import math
+import getpass
 from datetime import datetime
-from multiprocessing import Process, Queue, Value, Manager
-
-import psutil
-from plyer import notification
+from multiprocessing.connection import wait
 
 import tkinter as tk
 from tkinter import messagebox
 
 """
     Proctoring software class
+
+    Monitoring components, psutil, plyer and reportlab are imported where they
+    are used. Importing this module must stay cheap so the GUI shows immediately.
+    Monitoring components run in workers forked from a preloaded zygote.
 """
 
-from proctoring.gaze import Gaze
-from proctoring.processes import ProcessMonitor
-from proctoring.browser import Browser
-from proctoring.report import Report
+from proctoring.session import SessionAggregator, Journal, Uploader
+from proctoring.session.metrics import MetricsServer
+from proctoring.workers import WorkerFactory
+from proctoring.notifier import Notifier
+from proctoring.governor import Governor
+from proctoring.supervisor import Supervisor
+from proctoring.snapshot import SnapshotService
 
 class Proctoring:
     """
@@ -28,62 +33,117 @@ class Proctoring:
 
     Attributes:
         _demo (bool): Whether the program is running in demo mode.
-        _manager (Manager): Multiprocessing manager for shared objects.
-        _process_entries (dict): Dictionary to track initial and new processes.
+        _cache (bool): Whether the exam proxy caches static assets.
+        _enforce (bool): Whether unauthorized programs are denied before they run.
+        _upload (str): URL of the collector sessions are uploaded to, None to not upload.
+        _uploader (Uploader): Uploads the events and report of the running exam, None if not uploading.
+        _profile (str): Profiling mode of the monitoring processes, "cprofile" or "sample", None to not profile.
+        _record_gaze (bool): Whether gaze tracking records the gaze vector of every frame.
         _queues (dict): Dictionary of queues for handling process messaging.
         _processes (dict): Dictionary of monitoring process objects.
-        _time (dict): Dictionary to track timing information.
+        _stop (Event): Broadcast to all monitoring processes to stop.
+        _session (SessionAggregator): Owner of the state of the running exam session.
+        _workers (WorkerFactory): Starts the monitoring processes from a preloaded zygote.
+        _notifier (Notifier): Sends coalesced desktop notifications for the running exam.
+        _metrics_server (MetricsServer): Serves the metrics of the running exam on localhost.
+        _governor (Governor): Limits the CPU use of the monitoring processes, None if disabled.
+        _supervisor (Supervisor): Restarts gaze tracking and process monitoring if they die or stall.
+        snapshots (SnapshotService): Shares one process snapshot between the startup
+            checks and the initial process list.
         running (bool): Indicates whether an exam is currently running.
     """
 
     APP_NAME = "Proctoring system"
     INVALID_AT_STARTUP = ["chrome"]
+    SHUTDOWN_TIMEOUT = 5.0
+    JOURNAL_FOLDER = "./exams/journal/"
+    JOURNAL_SYNC_INTERVAL = 1.0
+    SPOOL_FOLDER = "./exams/spool/"
+    PROFILE_FOLDER = "./exams/profile/"
+    GAZE_FOLDER = "./exams/gaze/"
+    UPLOAD_TIMEOUT = 5.0
+    SESSION_CLASS = SessionAggregator
+    METRICS_PORT = 9464
+    PRELOAD_MODULES = [
+        "__main__",
+        "psutil",
+        "proctoring.proctoring",
+        "proctoring.processes.processes",
+        "proctoring.browser.browser",
+        "proctoring.gaze.gaze"
+    ]
 
-    def __init__(self, demo: bool = False):
+    def __init__(self, demo: bool = False, cache: bool = False, governor: bool = True, enforce: bool = False,
+                 upload: str = None, profile: str = None, record_gaze: bool = False):
         """
         Initialize the Proctoring system.
 
         Args:
             demo (bool): Run in demo mode if True.
+            cache (bool): Cache static assets of whitelisted hosts in the exam proxy if True.
+            governor (bool): Limit the CPU use of the monitoring processes if True.
+            enforce (bool): Deny unauthorized programs before they run if True, needs
+                Linux and CAP_SYS_ADMIN, otherwise they are killed once detected.
+            upload (str): URL of the collector to upload sessions to, None to only keep them locally.
+            profile (str): Profile every monitoring process with "cprofile" or "sample", None to not profile.
+            record_gaze (bool): Record the gaze vector of every frame for re-scoring with other thresholds if True.
         """
         self._demo = demo 
+        self._cache = cache
+        self._enforce = enforce
+        self._upload = upload
+        self._profile = profile
+        self._record_gaze = record_gaze
 
-        # Set up multiprocessing manager and shared data structures
-        self._manager = Manager()
-        self._process_entries = self._manager.dict({
-            'initial': set(),
-            'new': self._manager.list()
-        })
+        self._workers = WorkerFactory(self.PRELOAD_MODULES)
+        context = self._workers.context
 
-        # Create communication queues for the monitoring processes
+        # Create communication queues for the monitoring processes,
+        # all session data arrives on the single events queue
         self._queues = {
-            "gaze": Queue(),
-            "process": Queue(),
-            "to_browser": Queue(),
-            "from_browser": Queue(),
-            "internal_pid": Queue()
+            "events": context.Queue(),
+            "from_browser": context.Queue(),
+            "internal_pid": context.Queue()
         }
 
         # Dictionary to store process objects for different monitoring components
         self._processes = {
             "gaze": None,
-            "gaze_recieve": None,
             "process_monitor": None,
-            "process_monitor_recieve": None,
             "browser": None
         }
 
-        # Dictionary to track timing information for the exam session
-        self._time = {
-            "time": Value('d', 0.0),  # Shared value for gaze-away time
-            "start": None,            # Exam start timestamp
-            "end": None,              # Exam end timestamp
-            "total_gazeaway": 0.0,    # Total gaze-away time
-            "reported_time": 0        # Last reported gaze-away time in minutes
-        }
-
+        self._stop = context.Event()
+        self._session = None
+        self._notifier = None
+        self._metrics_server = None
+        self._report = None
+        self._uploader = None
+        self._governor = Governor(context) if governor else None
+        self._supervisor = None
+        self.snapshots = SnapshotService()
         self.running = False
 
+    def preload(self):
+        """
+        Starts the worker zygote in the background.
+        
+        Meant to be called once the GUI is up, so the heavy imports of the
+        monitoring components overlap with the user reading the window instead
+        of delaying it or the start of the exam. Also takes the process snapshot
+        for the startup checks.
+        """
+        self.snapshots.refresh()
+        self._warm_workers()
+
+    def _warm_workers(self):
+        """
+        Starts the worker zygote, with limited math library threads if governed.
+        """
+        if self._governor:
+            Governor.limit_threads()
+        self._workers.warm()
+
     def start_exam(self):
         """
         Starts an exam session by initializing and launching all monitoring processes.
@@ -92,163 +152,296 @@ class Proctoring:
         for gaze tracking, process monitoring, and browser lockdown.
         """
         if self.running == True: return
-        self._time['start'] = datetime.now()
+        from proctoring.report import Report
+        self._warm_workers()
         
-        # Store just process names initially to detect new processes later
-        self._process_entries['initial'] = {
-            p.info['name'].lower() for p in psutil.process_iter(['name'])
-        }
+        # Store just process names initially to detect new processes later,
+        # from the snapshot the startup checks used
+        initial = self.snapshots.get().names()
+        self._notifier = Notifier(self._notify)
+        self._notifier.start()
+        journal = Journal(time.strftime(f"{self.JOURNAL_FOLDER}session-%Y%m%d-%H%M%S.jsonl"), self.JOURNAL_SYNC_INTERVAL)
+        session_id = os.path.splitext(os.path.basename(journal.path))[0]
+        # Workers profile themselves into a folder per session, named like its journal
+        self._workers.profile = (self._profile, os.path.join(self.PROFILE_FOLDER, session_id)) if self._profile else None
+        # Stream the session to the collector
+        self._uploader = None
+        if self._upload:
+            self._uploader = Uploader(self._upload, session_id, getpass.getuser(), self.SPOOL_FOLDER)
+            self._uploader.start()
+        # Render the report while the exam runs, so ending it only adds the summary
+        self._report = Report.writer(datetime.now(), "exam_report")
+        self._report.start()
+        self._session = self.SESSION_CLASS(self._queues["events"], self._notifier.notify, journal, self._report, self._uploader)
+        self._session.start(initial)
+        self._stop.clear()
+        self._start_metrics_server()
         
-        # Initialize and start all monitoring processes
-        self._processes["browser"] = Process(target=self._run_browser, args=(self._queues["to_browser"], self._queues["from_browser"], self._queues["internal_pid"],))
-        self._processes["gaze"] = Process(target=self._run_gaze, args=(self._queues["gaze"],))
-        self._processes["gaze_recieve"] = Process(target=self._listen_for_gaze)
-        self._processes["process_monitor"] = Process(target=self._run_process_monitor, args=(self._queues["process"],self._queues["internal_pid"]))
-        self._processes["process_monitor_recieve"] = Process(target=self._listen_for_processes)
-
         # Start browser process and setup loop for awaiting initial load
-        self._processes["browser"].start()
+        self._processes["browser"] = self._workers.start("browser", self._run_browser, (self._stop, self._queues["from_browser"], self._queues["internal_pid"], self._queues["events"], self._cache), self._queues["events"])
         timeout_counter = 0
         while True:
             if timeout_counter > 20:
-                self._show_error("Start Error", 
-                    "Exam couldn't start because of a problem with the browser environment or network.")
+                self._stop.set()
+                self._abort_start("Exam couldn't start because of a problem with the browser environment or network.")
                 return
             timeout_counter += 1
             try:
                 browser_message = self._queues["from_browser"].get_nowait()
                 if browser_message == "navigated": break
+                if isinstance(browser_message, dict) and browser_message.get('type') == 'error':
+                    # Browser or proxy failed to come up, no need to wait for the timeout
+                    self._processes["browser"].join(timeout=1)
+                    self._processes["browser"] = None
+                    self._abort_start(f"Exam couldn't start because of a problem with the browser environment: {browser_message['message']}")
+                    return
             except:
                 time.sleep(1)
         
         # Start all other test processes
-        for name, process in self._processes.items():
-            if name == "browser": continue
-            process.start()
+        throttle = self._governor.throttle if self._governor else None
+        record = None
+        if self._record_gaze:
+            os.makedirs(self.GAZE_FOLDER, exist_ok=True)
+            record = os.path.join(self.GAZE_FOLDER, f"{session_id}.npy")
+        self._supervisor = Supervisor(self._workers, self._queues["events"], self._restarted)
+        self._processes["gaze"] = self._supervisor.supervise("gaze", self._run_gaze, (self._queues["events"], self._demo, self._stop, throttle, record))
+        self._processes["process_monitor"] = self._supervisor.supervise("process_monitor", self._run_process_monitor, (self._queues["events"], self._queues["internal_pid"], self._stop, throttle, self._enforce))
+        self._supervisor.start()
+
+        # Slow down the monitoring processes whenever the browser is starved of CPU
+        if self._governor:
+            self._governor.start(self._processes["browser"].pid, self._session.metrics)
 
         self.running = True
 
+    def _abort_start(self, message):
+        """
+        Closes the session of an exam that failed to start, without a report, and shows why.
+
+        Args:
+            message (str): Error message for the user.
+        """
+        self._session.stop()
+        self._notifier.stop()
+        self._metrics_server.stop()
+        self._report.abort()
+        if self._uploader:
+            self._uploader.close(self.UPLOAD_TIMEOUT)
+        self._show_error("Start Error", message)
+
     def end_exam(self, force=False):
         """
         Ends an exam session by stopping all monitoring processes.
         
-        Records the end time, stops all monitoring processes, and generates
-        a report of the exam session.
+        Records the end time and broadcasts the stop to all monitoring processes,
+        which flush their events and acknowledge. The processes are awaited in
+        parallel under a single deadline and only stragglers are killed. The
+        session handles the queued events and the notifier stops for what is
+        left of the deadline, then the report, rendered during the exam, is
+        finished with the summary of everything received.
         """
         if not self.running and not force: return
+
+        stop_start = time.monotonic()
+        deadline = stop_start + self.SHUTDOWN_TIMEOUT
+
+        # Measure memory and worker metrics while all workers are still up
+        self._collect_metrics()
+        memory = self._workers.memory()
+        self._queues["events"].put(memory)
+        print(f"Proctoring memory: {memory.rss / 2**20:.0f} MB RSS, {memory.pss / 2**20:.0f} MB PSS "
+              f"over {memory.processes} processes ({(memory.rss - memory.pss) / 2**20:.0f} MB shared copy-on-write)")
         
-        self._time["end"] = datetime.now()
-        
-        # Send stop signal to browser process
-        self._queues["to_browser"].put("STOP")
-        time.sleep(1)
+        if self._governor:
+            self._governor.stop()
+        # Workers exit on the stop broadcast from here on, which is no reason to restart them
+        if self._supervisor:
+            self._supervisor.stop()
+
+        self._session.end()
+        killed = self._stop_processes(deadline)
+
+        # Handle the queued events and close the session, pending notifications are moot now
+        self._session.stop(max(0, deadline - time.monotonic()))
+        self._notifier.stop(max(0, deadline - time.monotonic()), flush=False)
+        self._metrics_server.stop()
+        stop_latency = time.monotonic() - stop_start
+        unacknowledged = [name for name in self._processes if name not in self._session.stopped]
+        print(f"Exam stopped in {stop_latency * 1000:.0f} ms "
+              f"(killed: {killed or 'none'}, unacknowledged: {unacknowledged or 'none'})")
+        if self._supervisor:
+            print(f"Supervisor: {self._supervisor.stats()}")
+
+        session = self._session.snapshot()
+        session["notifications"] = self._notifier.stats()
+        if self._workers.profile:
+            from proctoring.profiling import summarize
+            session["profile"] = summarize(self._workers.profile[1])
+            print(f"Worker profiles written to {self._workers.profile[1]}")
+        report_start = time.monotonic()
+        self._report.finish(session)
+        print(f"Report finished in {(time.monotonic() - report_start) * 1000:.0f} ms "
+              f"({self._report.rows} rows rendered during the exam)")
+
+        # Whatever doesn't reach the collector in time is spooled for the next exam
+        if self._uploader:
+            self._uploader.upload_report(self._report.path)
+            self._uploader.close(self.UPLOAD_TIMEOUT)
+            print(f"Session upload: {self._uploader.stats()}")
+        self.running = False
+
+    def _stop_processes(self, deadline):
+        """
+        Broadcasts the stop and waits for all monitoring processes in parallel.
 
-        # Terminate all monitoring processes
+        Processes still running at the deadline are killed together with their
+        children, e.g. the browser and its proxy, so none is left orphaned.
+
+        Args:
+            deadline (float): time.monotonic() by which the processes must have exited.
+
+        Returns:
+            list: Names of the processes that were killed.
+        """
+        self._stop.set()
+
+        pending = {process.sentinel: name for name, process in self._processes.items() if process}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            for sentinel in wait(list(pending), timeout=remaining):
+                del pending[sentinel]
+
+        # Escalate to SIGKILL for stragglers only
+        killed = list(pending.values())
+        for name in killed:
+            Supervisor.kill(self._processes[name])
         for name, process in self._processes.items():
             if process:
-                process.terminate()
-                process.join(timeout=1)
+                process.join()
                 self._processes[name] = None
+        return killed
 
-        # Generate exam report with collected data
-        Report.generate_report(self._time, list(self._process_entries['new']), "exam_report")
-        self.running = False
+    def _restarted(self, component, process):
+        """
+        Replaces the worker of a component restarted by the supervisor.
 
-    def _drain_queues(self):
+        Workers started after the first scan of the process monitor look like
+        violations to it, so the monitor is sent the process IDs of all workers
+        again. A restarted monitor needs all of them, the browser worker also
+        covers Chrome below it.
+
+        Args:
+            component (str): Name of the component.
+            process (Process): The new worker.
         """
-        Processes any remaining data in monitoring queues.
+        self._processes[component] = process
+        for worker in self._processes.values():
+            if worker is not None and worker.pid is not None:
+                self._queues["internal_pid"].put(worker.pid)
+
+    def _start_metrics_server(self):
+        """
+        Starts serving the metrics of the session on localhost.
         
-        Ensures all monitoring data is properly processed before shutting down,
-        including remaining gaze and process data.
+        The exam runs without the endpoint if the port is taken.
         """
-        # Process any remaining gaze data
-        while not self._queues["gaze"].empty():
-            try:
-                msg = self._queues["gaze"].get_nowait()
-                with self._time["time"].get_lock():
-                    self._time["time"].value += msg
-            except:
-                break
+        self._metrics_server = MetricsServer(self._session.metrics, self._collect_metrics, port=self.METRICS_PORT)
+        try:
+            port = self._metrics_server.start()
+            print(f"Metrics available at http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            print(f"Couldn't start metrics endpoint: {e}")
 
-        # Process any remaining process data
-        while not self._queues["process"].empty():
+    def _collect_metrics(self):
+        """
+        Updates the metrics only the main process can measure.
+        
+        Sets the backlog of every queue and the CPU time and memory of every
+        running monitoring process.
+        """
+        import psutil
+        metrics = self._session.metrics
+        for name, queue in self._queues.items():
             try:
-                msg = self._queues["process"].get_nowait()
-                if isinstance(msg, dict) and msg.get('type') == 'new_process':
-                    entry = (msg['timestamp'], msg['pid'], msg['name'])
-                    if msg['name'].lower() not in self._process_entries['initial']:
-                        self._process_entries['new'].append(entry)
-            except:
-                break
+                metrics.set(name, "queue_depth", queue.qsize())
+            except NotImplementedError:
+                # Not available on macOS
+                pass
+        for name, process in self._processes.items():
+            if process is None or process.pid is None:
+                continue
+            try:
+                worker = psutil.Process(process.pid)
+                with worker.oneshot():
+                    cpu = worker.cpu_times()
+                    metrics.set(name, "cpu_seconds", cpu.user + cpu.system)
+                    metrics.set(name, "rss_bytes", worker.memory_info().rss)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
 
-    def _run_gaze(self, queue):
+    @staticmethod
+    def recover(path):
         """
-        Starts the gaze tracking component.
+        Generates the report of an exam that didn't end cleanly from its journal.
         
         Args:
-            queue (Queue): Queue for receiving gaze tracking data.
+            path (str): Path of the session journal.
         """
-        Gaze(queue, self._demo)
+        from proctoring.report import Report
+        session = SessionAggregator.recover(path)
+        Report.generate_report(session.snapshot(), "exam_report")
 
-    def _run_browser(self, to_queue, from_queue, pid_queue):
+    @staticmethod
+    def _run_gaze(queue, demo, stop, throttle, record):
         """
-        Starts the browser monitoring component.
+        Starts the gaze tracking component.
         
         Args:
-            queue (Queue): Queue for sending commands to the browser monitor.
-            pid_queue (Queue): Queue for sharing internal process IDs.
+            queue (Queue): Queue for sending gaze-away events.
+            demo (bool): Whether to show the camera feed.
+            stop (Event): Set to stop gaze tracking.
+            throttle (Value): Throttle level of the resource governor, None if not governed.
+            record (str): Path to record the gaze vectors of the session to, None to not record.
         """
-        Browser(to_queue, from_queue, pid_queue).run()
+        from proctoring.gaze import Gaze
+        if throttle is not None:
+            Governor.apply("gaze")
+        Gaze(queue, demo, stop, throttle, record)
 
-    def _run_process_monitor(self, queue, pid_queue):
+    @staticmethod
+    def _run_browser(stop, from_queue, pid_queue, event_queue, cache):
         """
-        Starts the process monitoring component.
+        Starts the browser monitoring component.
         
         Args:
-            queue (Queue): Queue for receiving process monitoring data.
+            stop (Event): Set to end the browser session.
+            from_queue (Queue): Queue for receiving browser status.
             pid_queue (Queue): Queue for sharing internal process IDs.
+            event_queue (Queue): Queue for sending tab and proxy events.
+            cache (bool): Whether the exam proxy caches static assets.
         """
-        ProcessMonitor(queue, pid_queue).run()
+        from proctoring.browser import Browser
+        cache_dir = Browser.DEFAULT_CACHE_DIR if cache else None
+        Browser(stop, from_queue, pid_queue, event_queue, cache_dir).run()
 
-    def _listen_for_gaze(self):
-        """
-        Continuous loop to process gaze tracking data from the queue.
-        
-        Monitors time spent looking away from the screen and sends notifications
-        when significant time is accumulated.
-        """
-        while True:
-            if not self._queues["gaze"].empty():
-                # Update the time value with new gaze-away duration
-                with self._time["time"].get_lock():
-                    self._time["time"].value += self._queues["gaze"].get()
-                total_minutes = math.floor(self._time["time"].value / 60)
-                
-                # Send notification when a new minute threshold is crossed
-                if total_minutes > self._time['reported_time']:
-                    self._time['reported_time'] = total_minutes
-                    title = "Gazeaway"
-                    message=f"Warning: Time spent not looking at screen has been logged, total time logged: {total_minutes:.2f} minutes"
-                    self._notify(title, message)
-        
-    def _listen_for_processes(self):
+    @staticmethod
+    def _run_process_monitor(queue, pid_queue, stop, throttle, enforce):
         """
-        Continuous loop to process monitoring data from the process queue.
+        Starts the process monitoring component.
         
-        Detects new processes that were not running at exam start and logs them
-        as potential violations.
+        Args:
+            queue (Queue): Queue for sending process violation events.
+            pid_queue (Queue): Queue for sharing internal process IDs.
+            stop (Event): Set to stop process monitoring.
+            throttle (Value): Throttle level of the resource governor, None if not governed.
+            enforce (bool): Whether unauthorized programs are denied before they run.
         """
-        while True:
-            if not self._queues["process"].empty():
-                msg = self._queues["process"].get()
-                if isinstance(msg, dict) and msg.get('type') == 'new_process':
-                    # Check if this process is new (wasn't running at start)
-                    if msg['name'].lower() not in self._process_entries['initial']:
-                        self._process_entries['new'].append((msg['timestamp'], msg['pid'], msg['name']))
-                        title = "Process identified"
-                        message = f"Warning: Process not allowed during exam identified: {msg['name']}"
-                        self._notify(title, message)
-            time.sleep(0.1)
+        from proctoring.processes import ProcessMonitor
+        if throttle is not None:
+            Governor.apply("process_monitor")
+        ProcessMonitor(queue, pid_queue, stop, throttle, enforce).run()
 
     def _notify(self, title, message):
         """
@@ -258,6 +451,7 @@ class Proctoring:
             title (str): Title of the notification.
             message (str): Body text of the notification.
         """
+        from plyer import notification
         notification.notify(
             app_name = self.APP_NAME,
             app_icon = '',
@@ -272,32 +466,16 @@ class Proctoring:
         Checks if the system is in a valid state to start an exam.
         
         Verifies that none of the prohibited applications are running
-        before allowing the exam to start.
+        before allowing the exam to start. Uses the latest process snapshot,
+        call snapshots.refresh() and poll snapshots.ready() from the GUI first
+        so it is taken off the GUI thread.
         
         Returns:
             tuple: (is_valid, list_of_prohibited_running_processes)
         """
-        running = [name for name in self.INVALID_AT_STARTUP if self._check_running_process(name)]
+        snapshot = self.snapshots.get()
+        running = [name for name in self.INVALID_AT_STARTUP if snapshot.running(name)]
         return len(running) < 1, running
-        
- 
-    def _check_running_process(self, name):
-        """
-        Checks if a process with the given name is currently running.
-        
-        Args:
-            name (str): Name of the process to check.
-            
-        Returns:
-            bool: True if the process is running, False otherwise.
-        """
-        for process in psutil.process_iter():
-            try:
-                if name == process.name().lower() and process.is_running:
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        return False
     
     def _show_error(self, title, message):
         """
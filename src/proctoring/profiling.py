@@ -0,0 +1,172 @@
+"""
+    Worker profiling module for LPS
+
+    Profiles the monitoring components of an exam when the proctoring system
+    runs with --profile. Every worker profiles itself from its bootstrap and
+    dumps its profile to the profile folder of the session when it stops, and
+    the profiles of all workers are merged into a summary for the report.
+    Without --profile nothing here is imported and workers run unprofiled.
+
+    Two modes:
+        cprofile: Deterministic profile of the worker's main thread with
+            cProfile, exact call counts at a few times the cost of every call.
+        sample: Samples the stacks of all threads of the worker at a fixed
+            interval, a few percent of overhead and no call counts. Samples
+            are wall clock time, time spent waiting counts too.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+
+MODES = ("cprofile", "sample")
+PROFILE_SUFFIX = ".prof"
+SAMPLES_SUFFIX = ".samples"
+
+class Sampler:
+    """
+    A class to sample the Python stacks of all threads of a process.
+
+    Attributes:
+        interval (float): Seconds between samples.
+        samples (int): Samples taken.
+        stacks (Counter): Samples per stack, as frames from outermost to
+            innermost joined with semicolons like collapsed flame graph input.
+        _stop (threading.Event): Set to stop sampling.
+        _thread (threading.Thread): Thread taking the samples.
+    """
+
+    INTERVAL = 0.005
+
+    def __init__(self, interval=INTERVAL):
+        """
+        Initializes the sampler without starting it.
+
+        Args:
+            interval (float): Seconds between samples.
+        """
+        self.interval = interval
+        self.samples = 0
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts sampling on a daemon thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def dump(self, path):
+        """
+        Writes the samples in collapsed stack format, one stack and count per line.
+
+        Args:
+            path (str): Path of the samples file.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+    def _run(self):
+        """
+        Takes a sample of every other thread once per interval until stopped.
+        """
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+def run_profiled(component, mode, folder, target, args):
+    """
+    Runs a component under a profiler and dumps the profile when it returns.
+
+    A worker killed for not stopping in time leaves no profile.
+
+    Args:
+        component (str): Name of the component, part of the profile file name.
+        mode (str): "cprofile" or "sample".
+        folder (str): Profile folder of the session.
+        target (callable): Function running the component.
+        args (tuple): Arguments for the target.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{component}-{os.getpid()}")
+    if mode == "sample":
+        sampler = Sampler()
+        sampler.start()
+        try:
+            target(*args)
+        finally:
+            sampler.stop()
+            sampler.dump(path + SAMPLES_SUFFIX)
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            target(*args)
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path + PROFILE_SUFFIX)
+
+def summarize(folder, top=15):
+    """
+    Merges the profiles of all workers of a session into their hottest functions.
+
+    Args:
+        folder (str): Profile folder of the session.
+        top (int): Functions to list.
+
+    Returns:
+        list: (component, function, calls, seconds) tuples for cProfile profiles,
+            ordered by own time, calls is None for sampled profiles and seconds
+            are estimated from the samples. Empty if there are no profiles.
+    """
+    if not os.path.isdir(folder):
+        return []
+    rows = []
+    names = sorted(os.listdir(folder))
+
+    # A component started more than once dumps one profile per worker, merged per component
+    profiles, samples = {}, {}
+    for name in names:
+        if name.endswith(PROFILE_SUFFIX):
+            profiles.setdefault(name.rsplit("-", 1)[0], []).append(os.path.join(folder, name))
+        elif name.endswith(SAMPLES_SUFFIX):
+            samples.setdefault(name.rsplit("-", 1)[0], []).append(os.path.join(folder, name))
+
+    if profiles:
+        import pstats
+        for component, paths in profiles.items():
+            for (filename, line, function), (_, calls, own, _, _) in pstats.Stats(*paths).stats.items():
+                rows.append((component, f"{function} ({os.path.basename(filename)}:{line})", calls, own))
+
+    for component, paths in samples.items():
+        own = Counter()
+        for path in paths:
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    own[stack.rsplit(";", 1)[-1]] += int(count)
+        rows.extend((component, function, None, count * Sampler.INTERVAL) for function, count in own.items())
+
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows[:top]
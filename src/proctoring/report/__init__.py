@@ -1 +1,2 @@
-from .report import Report
\ No newline at end of file
+from .report import Report, ReportWriter
+from .export import Export
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+    Session export module for LPS
+
+    Writes the data of a session in a columnar format next to its report, so
+    sessions can be analysed together without parsing PDFs.
+"""
+import json
+
+class Export:
+    """
+    A class to export sessions as columns with a stable schema.
+
+    Parquet is written if pyarrow is installed, NPZ otherwise. Both hold the
+    same columns and read gives them back the same way, times are Unix
+    timestamps in seconds.
+
+    NPZ arrays:
+        schema_version, start, end, gazeaway: Scalars, gazeaway is the total in seconds.
+        gaze_start, gaze_duration: One entry per gaze-away interval.
+        violation_time, violation_pid, violation_name: One entry per process violation.
+
+    Parquet holds one row per gaze-away interval or violation, with a record
+    column telling them apart, and the scalars as JSON in the "lps" schema
+    metadata.
+    """
+
+    SCHEMA_VERSION = 1
+    METADATA_KEY = b"lps"
+
+    @staticmethod
+    def columns(session):
+        """
+        Converts a session snapshot into columns.
+
+        Args:
+            session (dict): Session snapshot, see Report.generate_report.
+
+        Returns:
+            dict: NumPy arrays by column name.
+        """
+        import numpy as np
+        intervals = np.frombuffer(session.get("gaze_intervals", b""), dtype=np.float64).reshape(-1, 2)
+        violations = session["violations"]
+        return {
+            "schema_version": np.int64(Export.SCHEMA_VERSION),
+            "start": np.float64(session["start"].timestamp()),
+            "end": np.float64(session["end"].timestamp()),
+            "gazeaway": np.float64(session["gazeaway"]),
+            "gaze_start": intervals[:, 0].copy(),
+            "gaze_duration": intervals[:, 1].copy(),
+            "violation_time": np.array([v.timestamp.timestamp() for v in violations], dtype=np.float64),
+            "violation_pid": np.array([v.pid for v in violations], dtype=np.int64),
+            "violation_name": np.array([v.name for v in violations], dtype=np.str_)
+        }
+
+    @staticmethod
+    def write(session, path):
+        """
+        Exports a session with a single write.
+
+        Args:
+            session (dict): Session snapshot, see Report.generate_report.
+            path (str): Path of the export without extension.
+
+        Returns:
+            str: Path of the written file.
+        """
+        columns = Export.columns(session)
+        try:
+            import pyarrow
+        except ImportError:
+            return Export.write_npz(columns, path + ".npz")
+        return Export.write_parquet(columns, path + ".parquet")
+
+    @staticmethod
+    def write_npz(columns, path):
+        """
+        Writes columns as a compressed NPZ file.
+
+        Args:
+            columns (dict): Columns returned by columns.
+            path (str): Path of the file.
+
+        Returns:
+            str: Path of the written file.
+        """
+        import numpy as np
+        with open(path, "wb") as file:
+            np.savez_compressed(file, **columns)
+        return path
+
+    @staticmethod
+    def write_parquet(columns, path):
+        """
+        Writes columns as a Parquet file.
+
+        Args:
+            columns (dict): Columns returned by columns.
+            path (str): Path of the file.
+
+        Returns:
+            str: Path of the written file.
+        """
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        gaze = len(columns["gaze_start"])
+        violations = len(columns["violation_time"])
+        is_gaze = np.arange(gaze + violations) < gaze
+        table = pa.table({
+            "record": pa.array(np.where(is_gaze, "gaze", "violation"), type=pa.string()),
+            "time": pa.array(np.concatenate((columns["gaze_start"], columns["violation_time"])), type=pa.float64()),
+            "duration": pa.array(np.concatenate((columns["gaze_duration"], np.zeros(violations))), mask=~is_gaze, type=pa.float64()),
+            "pid": pa.array(np.concatenate((np.zeros(gaze, dtype=np.int64), columns["violation_pid"])), mask=is_gaze, type=pa.int64()),
+            "name": pa.array(np.concatenate((np.full(gaze, ""), columns["violation_name"])), mask=is_gaze, type=pa.string())
+        })
+        metadata = {name: columns[name].item() for name in ("schema_version", "start", "end", "gazeaway")}
+        table = table.replace_schema_metadata({Export.METADATA_KEY: json.dumps(metadata).encode()})
+        pq.write_table(table, path)
+        return path
+
+    @staticmethod
+    def read(path):
+        """
+        Reads an export back into columns.
+
+        Args:
+            path (str): Path of an NPZ or Parquet export.
+
+        Returns:
+            dict: NumPy arrays by column name, as returned by columns.
+        """
+        import numpy as np
+        if str(path).endswith(".npz"):
+            with np.load(path) as data:
+                return {name: data[name] for name in data.files}
+
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        metadata = json.loads(table.schema.metadata[Export.METADATA_KEY])
+        gaze = table.filter(pc.equal(table["record"], "gaze"))
+        violations = table.filter(pc.equal(table["record"], "violation"))
+        return {
+            "schema_version": np.int64(metadata["schema_version"]),
+            "start": np.float64(metadata["start"]),
+            "end": np.float64(metadata["end"]),
+            "gazeaway": np.float64(metadata["gazeaway"]),
+            "gaze_start": gaze["time"].to_numpy(),
+            "gaze_duration": gaze["duration"].to_numpy(),
+            "violation_time": violations["time"].to_numpy(),
+            "violation_pid": violations["pid"].to_numpy(),
+            "violation_name": np.array(violations["name"].to_pylist(), dtype=np.str_)
+        }
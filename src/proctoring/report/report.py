@@ -5,6 +5,13 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 import os
+import math
+import queue
+import threading
+from datetime import datetime
+
+from proctoring.session.events import ProcessViolation, TabActivity
+from .export import Export
 
 class Report:
     """
@@ -13,69 +20,339 @@ class Report:
     Provides functionality to create reports containing exam statistics.
     """
 
+    EXAM_FOLDER = "./exams/"
+
+    # Lower edges of the gaze-away duration histogram in seconds, the last bin is open
+    GAZE_DURATION_BINS = [0, 0.5, 1, 2, 5, 10, 30, 60]
+
     @staticmethod
-    def generate_report(time_data, process_entries, filename="exam_report"):
+    def generate_report(session, filename="exam_report"):
         """
-        Generate a PDF report with exam monitoring results.
+        Generate a PDF report with exam monitoring results in one go.
+        
+        Used when the report couldn't be rendered during the exam, e.g. when it
+        is recovered from a journal.
         
         Args:
-            time_data (dict): Dictionary containing exam timing information.
-            process_entries (list): List of tuples containing process information.
+            session (dict): Session snapshot with start and end time, gaze-away total
+                and intervals, process violations, tab activity, proxy statistics, worker spawn
+                latencies, coverage gaps, memory usage, notification counters and metrics.
             filename (str): Name of the output PDF file.
         """
-        EXAM_FOLDER = "./exams/"
+        writer = Report.writer(session["start"], filename)
+        for event in sorted(session["violations"] + session.get("tabs", []), key=lambda event: event.timestamp):
+            writer.draw(event)
+        writer.finish(session)
 
+    @staticmethod
+    def writer(start, filename="exam_report"):
+        """
+        Creates a writer for the report of an exam.
+        
+        Args:
+            start (datetime): Exam start time, part of the file name.
+            filename (str): Name of the output PDF file.
+            
+        Returns:
+            ReportWriter: Writer for a new report file in the exam folder.
+        """
         # Create folder for reports
-        if not os.path.exists(EXAM_FOLDER):
-            os.makedirs(EXAM_FOLDER)
+        if not os.path.exists(Report.EXAM_FOLDER):
+            os.makedirs(Report.EXAM_FOLDER)
+        return ReportWriter(Report.file_name(Report.EXAM_FOLDER, filename, {"start": start}))
+
+    @staticmethod
+    def summary(session):
+        """
+        Builds the summary lines of the report.
         
-        processed_filename = Report.file_name(EXAM_FOLDER, filename, time_data)
+        Args:
+            session (dict): Session snapshot.
+            
+        Returns:
+            list: Lines of text for the top of the first page.
+        """
+        lines = [f"Exam Start Time: {session['start']}, End Time: {session['end']}"]
+        minutes = session["gazeaway"] / 60
+        lines.append(f"Total Time Gazing Away: {minutes:.1f} minutes ({session['gazeaway']:.1f} seconds)")
+        gaps = session.get("gaps")
+        if gaps:
+            down = {}
+            for gap in gaps:
+                down[gap.component] = down.get(gap.component, 0.0) + gap.duration
+            lines.append(f"Not Monitored: {', '.join(f'{name} {seconds:.1f} s' for name, seconds in down.items())} "
+                         f"in {len(gaps)} coverage gaps")
+        proxy_stats = session.get("proxy")
+        if proxy_stats:
+            lines.append(f"Proxy Requests: {proxy_stats['requests']}, Tunnels: {proxy_stats.get('tunnelled', 0)}, "
+                         f"Blocked: {proxy_stats['blocked']}, Avg Upstream Latency: {proxy_stats['upstream_latency_ms']:.0f} ms")
+        workers = session.get("workers")
+        if workers:
+            spawn = ", ".join(f"{name} {latency * 1000:.0f} ms" for name, latency in workers.items())
+            lines.append(f"Worker Spawn Latency: {spawn}")
+        notifications = session.get("notifications")
+        if notifications:
+            lines.append(f"Notifications Sent: {notifications['sent']}, Merged: {notifications['merged']}, "
+                         f"Dropped: {notifications['dropped']}")
+        memory = session.get("memory")
+        if memory:
+            lines.append(f"Memory: {memory.rss / 2**20:.0f} MB RSS over {memory.processes} processes, "
+                         f"{(memory.rss - memory.pss) / 2**20:.0f} MB shared copy-on-write")
+        lines.append(f"Process Violations: {len(session['violations'])}, Tab Events: {len(session.get('tabs', []))}")
+        return lines
 
-        # Initialize the PDF canvas with letter size
-        c = canvas.Canvas(processed_filename, pagesize=letter)
-        width, height = letter
-        y = height - inch
-        page = 1
+    @staticmethod
+    def gaze_timeline(intervals, start, end):
+        """
+        Bins gaze-away intervals into the seconds spent looking away in each minute of the exam.
+        
+        Intervals crossing a minute boundary are split between the minutes. The
+        time looked away before a point in time is computed from the sorted
+        interval starts and ends, so binning is O(n log n) in the number of
+        intervals however many minutes the exam had.
+        
+        Args:
+            intervals (numpy.ndarray): Gaze-away start and duration in seconds, one row per interval.
+            start (float): Exam start as a Unix timestamp.
+            end (float): Exam end as a Unix timestamp.
+            
+        Returns:
+            numpy.ndarray: Seconds looked away per minute of the exam.
+        """
+        import numpy as np
+        minutes = max(1, math.ceil((end - start) / 60))
+        edges = 60.0 * np.arange(minutes + 1)
+
+        # Relative to the exam start to keep the cumulative sums precise
+        starts = np.sort(intervals[:, 0] - start)
+        ends = np.sort(intervals[:, 0] + intervals[:, 1] - start)
+        started = np.searchsorted(starts, edges)
+        ended = np.searchsorted(ends, edges)
+        start_sums = np.concatenate(([0.0], np.cumsum(starts)))
+        end_sums = np.concatenate(([0.0], np.cumsum(ends)))
+
+        # Intervals started before an edge count up to it, minus what is left after the ended ones
+        away = edges * (started - ended) - (start_sums[started] - end_sums[ended])
+        return np.diff(away)
+
+    @staticmethod
+    def gaze_histogram(intervals):
+        """
+        Counts gaze-away intervals per duration bin.
+        
+        Args:
+            intervals (numpy.ndarray): Gaze-away start and duration in seconds, one row per interval.
+            
+        Returns:
+            numpy.ndarray: Number of intervals per bin of GAZE_DURATION_BINS.
+        """
+        import numpy as np
+        bins = np.searchsorted(Report.GAZE_DURATION_BINS, intervals[:, 1], side="right") - 1
+        return np.bincount(bins, minlength=len(Report.GAZE_DURATION_BINS))
 
-        # Create the first page with header
-        c, y, width, height, page = Report.new_page(c, y, width, height, page)
+    @staticmethod
+    def gaze_section(c, y, width, height, page, timeline, histogram):
+        """
+        Draws the gaze-away timeline and duration histogram as bar charts.
         
-        # Exam details section
-        c.setFont("Helvetica", 12)
-        c.drawString(inch, y, f"Exam Start Time: {time_data['start']}, End Time: {time_data['end']}")
+        Args:
+            c (Canvas): The ReportLab canvas object.
+            y (float): Current vertical position on the page.
+            width (float): Page width.
+            height (float): Page height.
+            page (int): Current page number.
+            timeline (numpy.ndarray): Seconds looked away per minute, see gaze_timeline.
+            histogram (numpy.ndarray): Intervals per duration bin, see gaze_histogram.
+            
+        Returns:
+            tuple: Updated canvas, y-position and page number.
+        """
+        chart_width = width - 2*inch
+        chart_height = 1.2*inch
         y -= 0.3*inch
-        minutes = time_data["time"].value / 60
-        c.drawString(inch, y, f"Total Time Gazing Away: {minutes:.1f} minutes ({time_data['time'].value:.1f} seconds)")
+        if y < 2*chart_height + 2*inch:
+            page += 1
+            c, y, width, height, page = Report.new_page(c, y, width, height, page)
+
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(inch, y, "Gaze Away:")
+        y -= 0.3*inch
+
+        # Timeline, one bar per minute scaled to the full minute
+        c.setFont("Helvetica", 10)
+        c.drawString(inch, y, "Seconds looked away per minute")
+        y -= 0.15*inch + chart_height
+        c.line(inch, y, inch + chart_width, y)
+        bar = chart_width / len(timeline)
+        c.setFillGray(0.3)
+        for minute, seconds in enumerate(timeline):
+            if seconds > 0:
+                c.rect(inch + minute*bar, y, bar, chart_height * min(seconds, 60) / 60, stroke=0, fill=1)
+        c.setFillGray(0)
+        c.setFont("Helvetica", 8)
+        c.drawString(inch, y - 0.15*inch, "0")
+        c.drawRightString(inch + chart_width, y - 0.15*inch, f"{len(timeline)} min")
+        c.drawRightString(inch - 0.05*inch, y + chart_height - 0.1*inch, "60 s")
         y -= 0.5*inch
+
+        # Histogram of durations, scaled to the largest bin
+        c.setFont("Helvetica", 10)
+        c.drawString(inch, y, "Gaze-away durations")
+        y -= 0.15*inch + chart_height
+        c.line(inch, y, inch + chart_width, y)
+        bar = chart_width / len(histogram)
+        highest = max(int(histogram.max()), 1)
+        edges = Report.GAZE_DURATION_BINS
+        labels = [f"{low:g}-{high:g} s" for low, high in zip(edges, edges[1:])] + [f"{edges[-1]:g} s+"]
+        c.setFont("Helvetica", 8)
+        for i, (count, label) in enumerate(zip(histogram, labels)):
+            bar_height = (chart_height - 0.15*inch) * int(count) / highest
+            c.setFillGray(0.3)
+            c.rect(inch + i*bar + 0.1*bar, y, 0.8*bar, bar_height, stroke=0, fill=1)
+            c.setFillGray(0)
+            c.drawCentredString(inch + (i + 0.5)*bar, y + bar_height + 0.05*inch, str(int(count)))
+            c.drawCentredString(inch + (i + 0.5)*bar, y - 0.15*inch, label)
+        y -= 0.3*inch
+
+        return c, y, page
+
+    @staticmethod
+    def gaps_section(c, y, width, height, page, gaps):
+        """
+        Draws the periods in which a monitoring component wasn't running.
         
-        # Process list section title
+        Args:
+            c (Canvas): The ReportLab canvas object.
+            y (float): Current vertical position on the page.
+            width (float): Page width.
+            height (float): Page height.
+            page (int): Current page number.
+            gaps (list): CoverageGap events.
+            
+        Returns:
+            tuple: Updated canvas, y-position and page number.
+        """
+        y -= 0.3*inch
+        if y < 2*inch:
+            page += 1
+            c, y, width, height, page = Report.new_page(c, y, width, height, page)
+
         c.setFont("Helvetica-Bold", 14)
-        c.drawString(inch, y, "New Processes During Exam:")
+        c.drawString(inch, y, "Coverage Gaps:")
         y -= 0.4*inch
-        
-        # Column headers for process table
+
         c.setFont("Helvetica-Bold", 10)
-        c.drawString(inch, y, "Time")
-        c.drawString(3*inch, y, "PID")
-        c.drawString(4*inch, y, "Process Name")
+        c.drawString(inch, y, "Start")
+        c.drawString(2*inch, y, "Component")
+        c.drawString(3.3*inch, y, "Duration")
+        c.drawString(4.2*inch, y, "Reason")
+        c.drawString(5.9*inch, y, "Detected")
+        c.drawString(6.7*inch, y, "Restart")
         y -= 0.3*inch
 
-        # List each process entry
         c.setFont("Helvetica", 10)
-        for timestamp, pid, name in process_entries:
-            # Check if a new page is needed
+        for gap in gaps:
             if y < inch:
                 page += 1
                 c, y, width, height, page = Report.new_page(c, y, width, height, page)
+            c.drawString(inch, y, datetime.fromtimestamp(gap.start).strftime("%H:%M:%S"))
+            c.drawString(2*inch, y, gap.component)
+            c.drawString(3.3*inch, y, f"{gap.duration:.1f} s")
+            c.drawString(4.2*inch, y, gap.reason)
+            c.drawString(5.9*inch, y, f"{gap.detection:.2f} s")
+            c.drawString(6.7*inch, y, "never" if gap.restart is None else f"{gap.restart:.2f} s")
+            y -= 0.25*inch
+
+        return c, y, page
+
+    @staticmethod
+    def metrics_section(c, y, width, height, page, metrics):
+        """
+        Draws the metrics of all components at the end of the exam.
+        
+        Args:
+            c (Canvas): The ReportLab canvas object.
+            y (float): Current vertical position on the page.
+            width (float): Page width.
+            height (float): Page height.
+            page (int): Current page number.
+            metrics (list): List of (name, component, value) tuples.
             
-            # Draw the process entry details
-            c.drawString(inch, y, timestamp.strftime("%H:%M:%S"))
-            c.drawString(3*inch, y, str(pid))
-            c.drawString(4*inch, y, name)
+        Returns:
+            tuple: Updated canvas, y-position and page number.
+        """
+        y -= 0.3*inch
+        if y < 2*inch:
+            page += 1
+            c, y, width, height, page = Report.new_page(c, y, width, height, page)
+
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(inch, y, "Metrics:")
+        y -= 0.4*inch
+
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(inch, y, "Component")
+        c.drawString(2.5*inch, y, "Metric")
+        c.drawString(5*inch, y, "Value")
+        y -= 0.3*inch
+
+        c.setFont("Helvetica", 10)
+        for name, component, value in metrics:
+            if y < inch:
+                page += 1
+                c, y, width, height, page = Report.new_page(c, y, width, height, page)
+            c.drawString(inch, y, component)
+            c.drawString(2.5*inch, y, name)
+            c.drawString(5*inch, y, f"{value:.3f}" if isinstance(value, float) else str(value))
             y -= 0.25*inch
+
+        return c, y, page
+
+    @staticmethod
+    def profile_section(c, y, width, height, page, profile):
+        """
+        Draws the hottest functions of the monitoring processes of a profiled exam.
         
-        # Save the completed PDF document
-        c.save()
+        Args:
+            c (Canvas): The ReportLab canvas object.
+            y (float): Current vertical position on the page.
+            width (float): Page width.
+            height (float): Page height.
+            page (int): Current page number.
+            profile (list): List of (component, function, calls, seconds) tuples, see profiling.summarize.
+            
+        Returns:
+            tuple: Updated canvas, y-position and page number.
+        """
+        y -= 0.3*inch
+        if y < 2*inch:
+            page += 1
+            c, y, width, height, page = Report.new_page(c, y, width, height, page)
+
+        c.setFont("Helvetica-Bold", 14)
+        c.drawString(inch, y, "Profile:")
+        y -= 0.4*inch
+
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(inch, y, "Component")
+        c.drawString(2.3*inch, y, "Function")
+        c.drawString(5.9*inch, y, "Calls")
+        c.drawString(6.7*inch, y, "Seconds")
+        y -= 0.3*inch
+
+        for component, function, calls, seconds in profile:
+            if y < inch:
+                page += 1
+                c, y, width, height, page = Report.new_page(c, y, width, height, page)
+            c.setFont("Helvetica", 10)
+            c.drawString(inch, y, component)
+            c.drawString(5.9*inch, y, "-" if calls is None else str(calls))
+            c.drawString(6.7*inch, y, f"{seconds:.3f}")
+            c.setFont("Helvetica", 8)
+            c.drawString(2.3*inch, y, function[:70])
+            y -= 0.25*inch
+
+        return c, y, page
 
     @staticmethod
     def new_page(c, y, width, height, page):
@@ -112,8 +389,8 @@ class Report:
         return c, y, width, height, page
     
     @staticmethod
-    def file_name(path, filename, time_data):
-        timestamped = f"{filename}-{time_data['start'].strftime('%Y%m%d-%H%M%S')}"
+    def file_name(path, filename, session):
+        timestamped = f"{filename}-{session['start'].strftime('%Y%m%d-%H%M%S')}"
         duplicates = 0
         extension = ".pdf"
         fullpath = f"{path}{timestamped}{extension}"
@@ -123,4 +400,176 @@ class Report:
             else:
                 duplicates += 1
                 fullpath = f"{path}{timestamped}({duplicates}){extension}"
-        return fullpath
\ No newline at end of file
+        return fullpath
+
+class ReportWriter:
+    """
+    A class to render the report of an exam while it runs.
+    
+    Process violations and tab activity are drawn in one chronological table on
+    a background thread as they arrive. The summary is only known when the exam
+    ends, so page one holds a placeholder form for it that finish fills in,
+    together with the metrics. Finishing takes the same time however long the
+    exam was.
+    
+    Attributes:
+        path (str): Path of the report file, written when the report is finished.
+        rows (int): Number of table rows drawn.
+        _canvas (Canvas): The ReportLab canvas object.
+        _y (float): Current vertical position on the page.
+        _width (float): Page width.
+        _height (float): Page height.
+        _page (int): Current page number.
+        _summary_y (float): Vertical position of the first summary line.
+        _queue (queue.Queue): Events waiting to be drawn.
+        _thread (threading.Thread): Thread drawing the events.
+    """
+
+    SUMMARY_FORM = "summary"
+    SUMMARY_LINES = 8
+
+    def __init__(self, path):
+        """
+        Starts the report with the page header, the summary placeholder and the table header.
+        
+        Args:
+            path (str): Path of the report file.
+        """
+        self.path = path
+        self.rows = 0
+        self._canvas = canvas.Canvas(path, pagesize=letter)
+        self._width, self._height = letter
+        self._page = 1
+        self._canvas, self._y, self._width, self._height, self._page = Report.new_page(
+            self._canvas, self._height - inch, self._width, self._height, self._page)
+
+        # Reserve room for the summary, it is drawn into the form when the exam ends
+        self._summary_y = self._y
+        self._canvas.doForm(self.SUMMARY_FORM)
+        self._y -= self.SUMMARY_LINES * 0.3*inch + 0.2*inch
+
+        # Activity table title and column headers
+        self._canvas.setFont("Helvetica-Bold", 14)
+        self._canvas.drawString(inch, self._y, "Exam Activity:")
+        self._y -= 0.4*inch
+        self._canvas.setFont("Helvetica-Bold", 10)
+        self._canvas.drawString(inch, self._y, "Time")
+        self._canvas.drawString(2*inch, self._y, "Event")
+        self._canvas.drawString(3.2*inch, self._y, "Details")
+        self._y -= 0.3*inch
+        self._canvas.setFont("Helvetica", 10)
+
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts drawing added events in the background.
+        """
+        self._thread = threading.Thread(target=self._run, name="report", daemon=True)
+        self._thread.start()
+
+    def add(self, event):
+        """
+        Queues an event to be drawn, never blocks.
+        
+        Args:
+            event (tuple): ProcessViolation or TabActivity event.
+        """
+        self._queue.put(event)
+
+    def draw(self, event):
+        """
+        Draws an event as a row of the activity table.
+        
+        Args:
+            event (tuple): ProcessViolation or TabActivity event.
+        """
+        if self._y < inch:
+            self._page += 1
+            self._canvas, self._y, self._width, self._height, self._page = Report.new_page(
+                self._canvas, self._y, self._width, self._height, self._page)
+            self._canvas.setFont("Helvetica", 10)
+
+        if isinstance(event, ProcessViolation):
+            self._canvas.drawString(inch, self._y, event.timestamp.strftime("%H:%M:%S"))
+            self._canvas.drawString(2*inch, self._y, "Process")
+            self._canvas.drawString(3.2*inch, self._y, f"{event.name} (PID {event.pid})")
+        elif isinstance(event, TabActivity):
+            url = event.url or ""
+            self._canvas.drawString(inch, self._y, event.timestamp.strftime("%H:%M:%S.%f")[:-3])
+            self._canvas.drawString(2*inch, self._y, f"Tab {event.event}")
+            self._canvas.drawString(3.2*inch, self._y, url if len(url) <= 70 else url[:67] + "...")
+        else:
+            return
+        self._y -= 0.25*inch
+        self.rows += 1
+
+    def finish(self, session):
+        """
+        Draws the remaining events, the summary, the gaze-away charts, the
+        coverage gaps and the metrics and writes the file. The gaze-away intervals are saved next to
+        the report as a NumPy array, and the session as a columnar export.
+        
+        Args:
+            session (dict): Session snapshot, see Report.generate_report.
+        """
+        self._join()
+
+        # Fill in the summary placeholder on page one
+        self._canvas.beginForm(self.SUMMARY_FORM)
+        self._canvas.setFont("Helvetica", 12)
+        y = self._summary_y
+        for line in Report.summary(session)[:self.SUMMARY_LINES]:
+            self._canvas.drawString(inch, y, line)
+            y -= 0.3*inch
+        self._canvas.endForm()
+
+        intervals = session.get("gaze_intervals")
+        if intervals is not None:
+            import numpy as np
+            intervals = np.frombuffer(intervals, dtype=np.float64).reshape(-1, 2)
+            np.save(os.path.splitext(self.path)[0] + "-gaze.npy", intervals)
+            timeline = Report.gaze_timeline(intervals, session["start"].timestamp(), session["end"].timestamp())
+            self._canvas, self._y, self._page = Report.gaze_section(
+                self._canvas, self._y, self._width, self._height, self._page, timeline, Report.gaze_histogram(intervals))
+
+        if session.get("gaps"):
+            self._canvas, self._y, self._page = Report.gaps_section(
+                self._canvas, self._y, self._width, self._height, self._page, session["gaps"])
+
+        if session.get("metrics"):
+            self._canvas, self._y, self._page = Report.metrics_section(
+                self._canvas, self._y, self._width, self._height, self._page, session["metrics"])
+
+        if session.get("profile"):
+            self._canvas, self._y, self._page = Report.profile_section(
+                self._canvas, self._y, self._width, self._height, self._page, session["profile"])
+
+        self._canvas.save()
+        Export.write(session, os.path.splitext(self.path)[0])
+
+    def abort(self):
+        """
+        Stops drawing without writing the report.
+        """
+        self._join()
+
+    def _join(self):
+        """
+        Waits until every queued event is drawn and stops the drawing thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """
+        Draws queued events until the stop sentinel arrives.
+        """
+        while True:
+            event = self._queue.get()
+            if event is None:
+                break
+            self.draw(event)
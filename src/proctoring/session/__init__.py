@@ -0,0 +1,4 @@
+from .session import SessionAggregator
+from .events import GazeAway, ProcessViolation, TabActivity, ProxyStatus, ComponentStopped, WorkerStarted, MemoryUsage, SessionStarted, SessionEnded, MetricsUpdate, CoverageGap
+from .journal import Journal
+from .upload import Uploader
\ No newline at end of file
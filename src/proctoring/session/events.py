@@ -0,0 +1,153 @@
+"""
+    Session event types for LPS
+
+    Typed events sent by the monitoring components to the session aggregator
+    over the shared event queue.
+"""
+from datetime import datetime
+from typing import NamedTuple
+
+class GazeAway(NamedTuple):
+    """
+    A period in which the user did not look at the screen.
+
+    Attributes:
+        start (float): Start of the period as a unix timestamp.
+        duration (float): Length of the period in seconds.
+    """
+    start: float
+    duration: float
+
+class ProcessViolation(NamedTuple):
+    """
+    A process that was started during the exam and is not allowed.
+
+    Attributes:
+        timestamp (datetime): When the process was detected.
+        pid (int): Process ID.
+        name (str): Process name.
+    """
+    timestamp: datetime
+    pid: int
+    name: str
+
+class TabActivity(NamedTuple):
+    """
+    A tab or window event in the exam browser.
+
+    Attributes:
+        timestamp (datetime): When the event happened.
+        event (str): "created", "navigated" or "destroyed".
+        url (str): URL of the tab.
+    """
+    timestamp: datetime
+    event: str
+    url: str
+
+class ProxyStatus(NamedTuple):
+    """
+    Statistics reported by the exam proxy.
+
+    Attributes:
+        stats (dict): Request, blocked, error and latency statistics.
+    """
+    stats: dict
+
+class ComponentStopped(NamedTuple):
+    """
+    Acknowledgement that a component flushed its events and is shutting down.
+
+    Always the last event a component sends.
+
+    Attributes:
+        component (str): Name of the component, e.g. "gaze".
+        timestamp (datetime): When the component finished flushing.
+    """
+    component: str
+    timestamp: datetime
+
+class WorkerStarted(NamedTuple):
+    """
+    A monitoring component worker that is up and about to run.
+
+    Attributes:
+        component (str): Name of the component, e.g. "gaze".
+        latency (float): Seconds from requesting the worker until it runs.
+    """
+    component: str
+    latency: float
+
+class MemoryUsage(NamedTuple):
+    """
+    Memory of all processes of the proctoring system.
+
+    Pages shared copy-on-write with the process they were forked from are
+    counted in every RSS but split between the processes in PSS, so the
+    difference of the totals is the memory saved by sharing.
+
+    Attributes:
+        processes (int): Number of processes measured.
+        rss (int): Total resident set size in bytes.
+        pss (int): Total proportional set size in bytes.
+        uss (int): Total unique set size in bytes.
+    """
+    processes: int
+    rss: int
+    pss: int
+    uss: int
+
+class SessionStarted(NamedTuple):
+    """
+    The start of an exam session, always the first event of a journal.
+
+    Attributes:
+        timestamp (datetime): Exam start time.
+        initial (set): Lowercase names of processes running at exam start.
+    """
+    timestamp: datetime
+    initial: set
+
+class SessionEnded(NamedTuple):
+    """
+    The end of an exam session, events can still follow until the components stopped.
+
+    Attributes:
+        timestamp (datetime): Exam end time.
+    """
+    timestamp: datetime
+
+class MetricsUpdate(NamedTuple):
+    """
+    Metrics a component collected since its last update.
+
+    Attributes:
+        component (str): Name of the component, e.g. "gaze".
+        counters (dict): Increase of each counter.
+        gauges (dict): Latest value of each gauge.
+        summaries (dict): Number and sum of the observations of each summary, as a pair.
+    """
+    component: str
+    counters: dict
+    gauges: dict
+    summaries: dict
+
+class CoverageGap(NamedTuple):
+    """
+    A period in which a monitoring component wasn't running, because its worker
+    died or stalled, until the supervisor's restart of it was running again.
+
+    Attributes:
+        component (str): Name of the component, e.g. "gaze".
+        start (float): Last heartbeat before the gap as a unix timestamp.
+        duration (float): Length of the gap in seconds.
+        reason (str): Why the worker was restarted, e.g. "stalled" or "exited with code 1".
+        detection (float): Seconds from the last heartbeat until the supervisor noticed.
+        restart (float): Seconds from the last restart until the component was running
+            again, None if it wasn't running again by the end of the exam.
+    """
+    component: str
+    start: float
+    duration: float
+    reason: str
+    detection: float
+    restart: float
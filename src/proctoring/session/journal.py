@@ -0,0 +1,196 @@
+"""
+    Session journal module for LPS
+
+    Appends every session event to a JSONL file so the exam record survives a
+    crash of the proctoring system or a power loss, and reads it back to
+    rebuild the session.
+"""
+import os
+import json
+import threading
+from datetime import datetime
+
+from . import events
+
+# Event types by name, used to decode journal records
+EVENT_TYPES = {
+    name: cls for name, cls in vars(events).items()
+    if isinstance(cls, type) and issubclass(cls, tuple) and hasattr(cls, "_fields")
+}
+
+class Journal:
+    """
+    A class to append session events to a file with group-commit fsync.
+
+    Appending only writes to the file buffer. A background thread flushes and
+    fsyncs all events appended since the last commit once per sync interval,
+    so the cost of fsync is shared by every event in the interval and at most
+    one interval of events is lost on power loss.
+
+    Attributes:
+        path (str): Path of the journal file.
+        sync_interval (float): Seconds between commits, 0 commits on every append.
+        appended (int): Events appended.
+        commits (int): Number of fsyncs.
+        _file (file): The journal file, opened for appending.
+        _lock (threading.Lock): Serializes writes and flushes.
+        _closed (threading.Event): Set when the journal is closed.
+        _thread (threading.Thread): Thread committing the journal.
+    """
+
+    def __init__(self, path, sync_interval=1.0):
+        """
+        Opens the journal for appending.
+
+        Args:
+            path (str): Path of the journal file, created if missing.
+            sync_interval (float): Seconds between commits, 0 commits on every append.
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.appended = 0
+        self.commits = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+        if sync_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+            self._thread.start()
+
+    def append(self, event):
+        """
+        Appends an event to the journal.
+
+        Args:
+            event (tuple): One of the session event types.
+        """
+        line = self.dumps(event)
+        with self._lock:
+            self._file.write(line + "\n")
+            self.appended += 1
+        if self.sync_interval <= 0:
+            self.commit()
+
+    def commit(self):
+        """
+        Makes all appended events durable.
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            fd = self._file.fileno()
+            self.commits += 1
+        # fsync outside the lock so appends don't wait for the disk
+        os.fsync(fd)
+
+    def close(self):
+        """
+        Commits the remaining events and closes the journal.
+        """
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.commit()
+        with self._lock:
+            self._file.close()
+
+    def _run(self):
+        """
+        Commits the journal once per sync interval until it is closed.
+        """
+        while not self._closed.wait(self.sync_interval):
+            self.commit()
+
+    @staticmethod
+    def encode(event):
+        """
+        Converts an event into a journal record.
+
+        Args:
+            event (tuple): One of the session event types.
+
+        Returns:
+            dict: Record with the event type name and its fields.
+        """
+        return {"type": type(event).__name__, **event._asdict()}
+
+    @staticmethod
+    def dumps(event):
+        """
+        Converts an event into a journal line.
+
+        Args:
+            event (tuple): One of the session event types.
+
+        Returns:
+            str: The journal record as compact JSON, without newline.
+        """
+        return json.dumps(Journal.encode(event), default=Journal._default, separators=(",", ":"))
+
+    @staticmethod
+    def decode(record):
+        """
+        Converts a journal record back into an event.
+
+        Args:
+            record (dict): Record written by encode.
+
+        Returns:
+            tuple: The event, or None if the type is unknown.
+        """
+        cls = EVENT_TYPES.get(record.pop("type", None))
+        if cls is None:
+            return None
+        for field, kind in cls.__annotations__.items():
+            value = record.get(field)
+            if value is None:
+                continue
+            if kind is datetime:
+                record[field] = datetime.fromisoformat(value)
+            elif kind is set:
+                record[field] = set(value)
+        return cls(**record)
+
+    @staticmethod
+    def read(path):
+        """
+        Reads all events from a journal.
+
+        A record cut off by a crash can only be the last one and is skipped.
+
+        Args:
+            path (str): Path of the journal file.
+
+        Returns:
+            list: The journaled events in order.
+        """
+        events = []
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    event = Journal.decode(json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+                if event is not None:
+                    events.append(event)
+        return events
+
+    @staticmethod
+    def _default(value):
+        """
+        Encodes values JSON doesn't support.
+
+        Args:
+            value: Datetime or set from an event field.
+
+        Returns:
+            str or list: ISO 8601 string for datetimes, sorted list for sets.
+        """
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (set, frozenset)):
+            return sorted(value)
+        raise TypeError(f"Can't journal {type(value).__name__}")
@@ -0,0 +1,274 @@
+"""
+    Metrics module for LPS
+
+    Components count into a buffer local to their process and send it to the
+    session as a single event once per interval, so updating a metric on a hot
+    path is a dictionary update. The session folds the updates into a registry
+    that is served in the Prometheus text format and included in the report.
+"""
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .events import MetricsUpdate
+
+class Metrics:
+    """
+    A class to buffer the metrics of one component.
+
+    Not thread safe, every thread updating metrics needs its own buffer.
+
+    Attributes:
+        component (str): Name of the component, e.g. "gaze".
+        interval (float): Minimum seconds between two updates sent to the session.
+        _queue (Queue): Session event queue.
+        _counters (dict): Counter increases since the last update.
+        _gauges (dict): Gauge values since the last update.
+        _summaries (dict): Observation count and sum per summary since the last update.
+        _flushed (float): time.monotonic() of the last update.
+    """
+
+    def __init__(self, component, queue, interval=1.0):
+        """
+        Initializes an empty buffer.
+
+        Args:
+            component (str): Name of the component.
+            queue (Queue): Session event queue.
+            interval (float): Minimum seconds between two updates sent to the session.
+        """
+        self.component = component
+        self.interval = interval
+        self._queue = queue
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}
+        self._flushed = time.monotonic()
+
+    def inc(self, name, value=1):
+        """
+        Increases a counter.
+
+        Args:
+            name (str): Metric name, e.g. "frames_total".
+            value (float): Amount to increase by.
+        """
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def set(self, name, value):
+        """
+        Sets a gauge.
+
+        Args:
+            name (str): Metric name.
+            value (float): Current value.
+        """
+        self._gauges[name] = value
+
+    def observe(self, name, value):
+        """
+        Adds an observation to a summary.
+
+        Args:
+            name (str): Metric name, e.g. "scan_seconds".
+            value (float): Observed value.
+        """
+        summary = self._summaries.get(name)
+        if summary is None:
+            self._summaries[name] = [1, value]
+        else:
+            summary[0] += 1
+            summary[1] += value
+
+    def tick(self):
+        """
+        Sends the buffered metrics if the interval has passed, call it from the component loop.
+        """
+        if time.monotonic() - self._flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Sends the buffered metrics to the session.
+        """
+        if self._counters or self._gauges or self._summaries:
+            summaries = {name: tuple(summary) for name, summary in self._summaries.items()}
+            self._queue.put(MetricsUpdate(self.component, self._counters, self._gauges, summaries))
+            self._counters, self._gauges, self._summaries = {}, {}, {}
+        self._flushed = time.monotonic()
+
+class Registry:
+    """
+    A class holding the aggregated metrics of all components.
+
+    Updated by the session and the main process, read by the metrics server.
+
+    Attributes:
+        _lock (threading.Lock): Guards the metrics against concurrent reads.
+        _metrics (dict): Value per (kind, name, component), summaries as [count, sum].
+    """
+
+    PREFIX = "lps_"
+
+    def __init__(self):
+        """
+        Initializes an empty registry.
+        """
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def update(self, event):
+        """
+        Folds the metrics update of a component into the registry.
+
+        Args:
+            event (MetricsUpdate): Buffered metrics of a component.
+        """
+        with self._lock:
+            for name, value in event.counters.items():
+                key = ("counter", name, event.component)
+                self._metrics[key] = self._metrics.get(key, 0) + value
+            for name, value in event.gauges.items():
+                self._metrics[("gauge", name, event.component)] = value
+            for name, (count, total) in event.summaries.items():
+                summary = self._metrics.setdefault(("summary", name, event.component), [0, 0.0])
+                summary[0] += count
+                summary[1] += total
+
+    def inc(self, component, name, value=1):
+        """
+        Increases a counter directly.
+
+        Args:
+            component (str): Name of the component.
+            name (str): Metric name.
+            value (float): Amount to increase by.
+        """
+        with self._lock:
+            key = ("counter", name, component)
+            self._metrics[key] = self._metrics.get(key, 0) + value
+
+    def set(self, component, name, value):
+        """
+        Sets a gauge directly.
+
+        Args:
+            component (str): Name of the component.
+            name (str): Metric name.
+            value (float): Current value.
+        """
+        with self._lock:
+            self._metrics[("gauge", name, component)] = value
+
+    def snapshot(self):
+        """
+        Returns all metrics for the report.
+
+        Returns:
+            list: (name, component, value) tuples sorted by name, summaries
+                as their count and sum.
+        """
+        rows = []
+        with self._lock:
+            for (kind, name, component), value in sorted(self._metrics.items(), key=lambda item: item[0][1:]):
+                if kind == "summary":
+                    rows.append((f"{name}_count", component, value[0]))
+                    rows.append((f"{name}_sum", component, value[1]))
+                else:
+                    rows.append((name, component, value))
+        return rows
+
+    def render(self):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, one TYPE line per metric name.
+        """
+        lines = []
+        with self._lock:
+            kinds = {}
+            for (kind, name, component), value in self._metrics.items():
+                kinds.setdefault((name, kind), []).append((component, value))
+            for (name, kind), samples in sorted(kinds.items()):
+                metric = self.PREFIX + name
+                lines.append(f"# TYPE {metric} {kind}")
+                for component, value in sorted(samples, key=lambda sample: sample[0]):
+                    label = f'{{component="{component}"}}'
+                    if kind == "summary":
+                        lines.append(f"{metric}_count{label} {value[0]}")
+                        lines.append(f"{metric}_sum{label} {value[1]}")
+                    else:
+                        lines.append(f"{metric}{label} {value}")
+        return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """
+    A class to serve a metrics registry over HTTP on localhost.
+
+    Attributes:
+        registry (Registry): Metrics to serve.
+        collect (callable): Called before every scrape to update gauges, may be None.
+        host (str): Address the server listens on.
+        port (int): Port the server listens on, set once started.
+        _server (ThreadingHTTPServer): The HTTP server.
+        _thread (threading.Thread): Thread running the server.
+    """
+
+    def __init__(self, registry, collect=None, host="127.0.0.1", port=9464):
+        """
+        Initializes the server without starting it.
+
+        Args:
+            registry (Registry): Metrics to serve.
+            collect (callable): Called before every scrape to update gauges.
+            host (str): Address to listen on, keep it local.
+            port (int): Port to listen on, 0 for any free port.
+        """
+        self.registry = registry
+        self.collect = collect
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        Starts serving /metrics.
+
+        Returns:
+            int: The port the server listens on.
+        """
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                if server.collect:
+                    server.collect()
+                body = server.registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        """
+        Stops the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
@@ -0,0 +1,255 @@
+"""
+    Session state module for LPS
+
+    Owns all state of an exam session. Monitoring components send typed events
+    over a single queue and the aggregator folds them into the session, which is
+    handed to the report as a snapshot when the exam ends. Every event is also
+    written to a journal, from which the session can be recovered after a crash.
+"""
+import os
+import math
+import threading
+from array import array
+from datetime import datetime
+
+from .events import GazeAway, ProcessViolation, TabActivity, ProxyStatus, ComponentStopped, WorkerStarted, MemoryUsage, SessionStarted, SessionEnded, MetricsUpdate, CoverageGap
+from .journal import Journal
+from .metrics import Registry
+
+class SessionAggregator:
+    """
+    A class that consumes session events and owns the resulting session state.
+
+    Runs a single consumer thread in the main process, so state is only ever
+    touched by one owner and no shared-memory or manager round trips are needed.
+
+    Attributes:
+        start_time (datetime): Exam start timestamp.
+        end_time (datetime): Exam end timestamp.
+        initial (set): Lowercase names of processes running at exam start.
+        gazeaway (float): Total time spent looking away, in seconds.
+        gaze_intervals (array): Start and duration in seconds of every gaze-away, as
+            consecutive pairs of doubles.
+        violations (list): ProcessViolation events for processes not running at start.
+        tabs (list): TabActivity events of the exam browser.
+        proxy (dict): Latest statistics reported by the exam proxy.
+        stopped (dict): Components that acknowledged stopping, with the time they did.
+        workers (dict): Spawn latency in seconds per component.
+        gaps (list): CoverageGap events of components that weren't running for a while.
+        memory (MemoryUsage): Latest memory measurement of the proctoring processes.
+        metrics (Registry): Metrics of all components.
+        _queue (Queue): Queue the components send events on.
+        _notify (callable): Called with a title, message, item and summary to warn the user.
+        _journal (Journal): Journal every event is appended to, None to not journal.
+        _report (ReportWriter): Renders violations and tab activity during the exam, None to not render.
+        _upload (Uploader): Streams every event to the collector, None to not upload.
+        _reported_minutes (int): Last gaze-away minute the user was warned about.
+        _thread (threading.Thread): Thread consuming the event queue.
+    """
+
+    def __init__(self, queue, notify=None, journal=None, report=None, upload=None):
+        """
+        Initializes an empty session.
+
+        Args:
+            queue (Queue): Queue the components send events on.
+            notify (callable): Called with a title, message, item and summary to
+                warn the user. Must not block, see Notifier.notify.
+            journal (Journal): Journal every event is appended to, None to not journal.
+            report (ReportWriter): Receives violations and tab activity to render
+                while the exam runs. Must not block, see ReportWriter.add.
+            upload (Uploader): Streams every event to the collector, None to not upload.
+        """
+        self.start_time = None
+        self.end_time = None
+        self.initial = set()
+        self.gazeaway = 0.0
+        self.gaze_intervals = array("d")
+        self.violations = []
+        self.tabs = []
+        self.proxy = {}
+        self.stopped = {}
+        self.workers = {}
+        self.gaps = []
+        self.memory = None
+        self.metrics = Registry()
+        self._queue = queue
+        self._notify = notify
+        self._journal = journal
+        self._report = report
+        self._upload = upload
+        self._reported_minutes = 0
+        self._thread = None
+
+    def start(self, initial):
+        """
+        Starts the session and begins consuming events.
+
+        Args:
+            initial (set): Lowercase names of processes running at exam start.
+        """
+        self._record(SessionStarted(datetime.now(), initial))
+        self._thread = threading.Thread(target=self._run, name="session", daemon=True)
+        self._thread.start()
+
+    def end(self):
+        """
+        Records the end of the exam, events keep being handled until stop.
+        """
+        self._record(SessionEnded(datetime.now()))
+
+    def stop(self, timeout=None):
+        """
+        Ends the session after all events queued so far have been handled and
+        closes the journal.
+
+        Args:
+            timeout (float): Seconds to wait for the consumer to finish, None waits forever.
+        """
+        if self.end_time is None:
+            self.end()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._journal and not (self._thread and self._thread.is_alive()):
+            self._journal.close()
+
+    @classmethod
+    def recover(cls, path):
+        """
+        Rebuilds a session from its journal.
+
+        Args:
+            path (str): Path of the journal file.
+
+        Returns:
+            SessionAggregator: The session as it was at the last journaled event.
+        """
+        session = cls(None)
+        for event in Journal.read(path):
+            session.handle(event)
+        if session.end_time is None:
+            # The exam didn't end cleanly, the last write to the journal is the best estimate
+            session.end_time = datetime.fromtimestamp(os.path.getmtime(path))
+        return session
+
+    def snapshot(self):
+        """
+        Returns the session data for the report.
+
+        Returns:
+            dict: Start and end time, gaze-away total and intervals, violations,
+                tab activity, proxy statistics, worker spawn latencies, coverage gaps,
+                memory usage and metrics.
+        """
+        return {
+            "start": self.start_time,
+            "end": self.end_time,
+            "gazeaway": self.gazeaway,
+            "gaze_intervals": array("d", self.gaze_intervals),
+            "violations": list(self.violations),
+            "tabs": list(self.tabs),
+            "proxy": dict(self.proxy),
+            "workers": dict(self.workers),
+            "gaps": list(self.gaps),
+            "memory": self.memory,
+            "metrics": self.metrics.snapshot()
+        }
+
+    def handle(self, event):
+        """
+        Folds a single event into the session.
+
+        Args:
+            event (tuple): One of the session event types.
+        """
+        self.metrics.inc("session", "events_total")
+        if isinstance(event, SessionStarted):
+            self.start_time = event.timestamp
+            self.initial = event.initial
+
+        elif isinstance(event, SessionEnded):
+            self.end_time = event.timestamp
+
+        elif isinstance(event, GazeAway):
+            self.gaze_intervals.extend((event.start, event.duration))
+            self.gazeaway += event.duration
+            total_minutes = math.floor(self.gazeaway / 60)
+
+            # Send notification when a new minute threshold is crossed
+            if total_minutes > self._reported_minutes:
+                self._reported_minutes = total_minutes
+                self._warn("Gazeaway", f"Warning: Time spent not looking at screen has been logged, total time logged: {total_minutes:.2f} minutes")
+
+        elif isinstance(event, ProcessViolation):
+            # Only processes that weren't running at start are violations
+            if event.name.lower() not in self.initial:
+                self.violations.append(event)
+                if self._report:
+                    self._report.add(event)
+                self._warn("Process identified", f"Warning: Process not allowed during exam identified: {event.name}",
+                           item=event.name, summary="Warning: {count} processes not allowed during exam identified: {items}")
+
+        elif isinstance(event, TabActivity):
+            self.tabs.append(event)
+            if self._report:
+                self._report.add(event)
+
+        elif isinstance(event, ProxyStatus):
+            self.proxy = event.stats
+
+        elif isinstance(event, ComponentStopped):
+            self.stopped[event.component] = event.timestamp
+
+        elif isinstance(event, WorkerStarted):
+            self.workers[event.component] = event.latency
+
+        elif isinstance(event, CoverageGap):
+            self.gaps.append(event)
+            self.metrics.inc(event.component, "coverage_gaps_total")
+            self.metrics.inc(event.component, "coverage_gap_seconds", event.duration)
+
+        elif isinstance(event, MemoryUsage):
+            self.memory = event
+
+        elif isinstance(event, MetricsUpdate):
+            self.metrics.update(event)
+
+    def _run(self):
+        """
+        Consumes events until the stop sentinel arrives.
+        """
+        while True:
+            event = self._queue.get()
+            if event is None:
+                break
+            self._record(event)
+
+    def _record(self, event):
+        """
+        Journals and uploads an event and folds it into the session.
+
+        Args:
+            event (tuple): One of the session event types.
+        """
+        if self._journal:
+            self._journal.append(event)
+        if self._upload:
+            self._upload.add(event)
+        self.handle(event)
+
+    def _warn(self, title, message, item=None, summary=None):
+        """
+        Warns the user if a notification callback is set.
+
+        Args:
+            title (str): Title of the notification.
+            message (str): Body text of the notification.
+            item (str): What the notification is about.
+            summary (str): Body text format if notifications with this title are merged.
+        """
+        if self._notify:
+            try:
+                self._notify(title, message, item=item, summary=summary)
+            except Exception as e:
+                print(f"Couldn't send notification: {e}")
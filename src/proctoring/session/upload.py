@@ -0,0 +1,415 @@
+"""
+    Session upload module for LPS
+
+    Streams the events of a session and its final report to a collector over
+    HTTP, so reports don't have to be collected from every laptop by hand.
+    Events are batched and gzip compressed on a thread of their own. Batches
+    the collector can't take are spooled to disk and sent once it is
+    reachable again, also by the next session if this one ends first.
+"""
+import os
+import gzip
+import time
+import random
+import threading
+
+from .journal import Journal
+
+class Uploader:
+    """
+    A class to upload session events and reports to a collector.
+
+    Adding an event never blocks on the network. Events wait in memory for
+    the next batch, at most max_buffered of them, more are spooled to disk.
+    The collector answers 429 or 503 with an optional Retry-After to slow
+    clients down, failed uploads are retried with exponential backoff.
+
+    Collector protocol, every request carries X-LPS-Session and X-LPS-Student:
+        POST <url>/events: gzip compressed JSON lines in the journal format,
+            with the batch sequence number in X-LPS-Batch.
+        POST <url>/reports: The report PDF.
+
+    Attributes:
+        url (str): Base URL of the collector.
+        session_id (str): Identifier of the session, unique per student.
+        student (str): Username of the student.
+        spool_dir (str): Folder holding the spool of every session.
+        batch_size (int): Events per batch.
+        flush_interval (float): Seconds an event waits at most before its batch is sent.
+        max_buffered (int): Events kept in memory before they are spooled.
+        timeout (float): Seconds to wait for the collector per request.
+        events (int): Events added.
+        batches (int): Batches accepted by the collector.
+        uploaded (int): Events accepted by the collector.
+        raw_bytes (int): Size of the accepted batches before compression.
+        sent_bytes (int): Size of the accepted batches as sent.
+        spooled (int): Batches written to the spool.
+        retries (int): Failed upload attempts.
+        _buffer (list): Encoded events waiting for the next batch.
+        _sequence (int): Sequence number of the next batch.
+        _lock (threading.Lock): Guards the buffer and the sequence number.
+        _wake (threading.Event): Set when a batch is full or the uploader closes.
+        _closing (threading.Event): Set when the uploader closes.
+        _failures (int): Consecutive failed attempts, for the backoff.
+        _retry_at (float): time.monotonic() before which the collector isn't contacted.
+        _thread (threading.Thread): Thread uploading batches.
+    """
+
+    BATCH_SIZE = 500
+    FLUSH_INTERVAL = 1.0
+    MAX_BUFFERED = 5000
+    TIMEOUT = 10.0
+    MAX_BACKOFF = 30.0
+    STUDENT_FILE = "student"
+    REPORT_FILE = "report"
+
+    def __init__(self, url, session_id, student, spool_dir, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, max_buffered=MAX_BUFFERED, timeout=TIMEOUT):
+        """
+        Initializes the uploader without starting it.
+
+        Args:
+            url (str): Base URL of the collector.
+            session_id (str): Identifier of the session, used as folder name in the spool.
+            student (str): Username of the student.
+            spool_dir (str): Folder holding the spool of every session.
+            batch_size (int): Events per batch.
+            flush_interval (float): Seconds an event waits at most before its batch is sent.
+            max_buffered (int): Events kept in memory before they are spooled.
+            timeout (float): Seconds to wait for the collector per request.
+        """
+        self.url = url.rstrip("/")
+        self.session_id = session_id
+        self.student = student
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.timeout = timeout
+        self.events = 0
+        self.batches = 0
+        self.uploaded = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.spooled = 0
+        self.retries = 0
+        self._buffer = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = threading.Event()
+        self._failures = 0
+        self._retry_at = 0.0
+        self._thread = None
+
+    def start(self):
+        """
+        Creates the spool of the session and starts uploading.
+        """
+        folder = self._folder(self.session_id)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, self.STUDENT_FILE), "w", encoding="utf-8") as file:
+            file.write(self.student)
+        self._sequence = max((self._batch_number(name) for name in os.listdir(folder)), default=-1) + 1
+        self._thread = threading.Thread(target=self._run, name="upload", daemon=True)
+        self._thread.start()
+
+    def add(self, event):
+        """
+        Queues an event for upload, never waits for the network.
+
+        Args:
+            event (tuple): One of the session event types.
+        """
+        line = Journal.dumps(event)
+        with self._lock:
+            self._buffer.append(line)
+            self.events += 1
+            buffered = len(self._buffer)
+            overflow = None
+            if buffered > self.max_buffered:
+                # The collector is slow or gone, keep memory bounded
+                overflow, self._buffer = self._buffer, []
+                sequence = self._next_sequence()
+        if overflow is not None:
+            self._spool(self.session_id, sequence, self._compress(overflow))
+        elif buffered >= self.batch_size:
+            self._wake.set()
+
+    def upload_report(self, path):
+        """
+        Queues the report of the session for upload after the remaining events.
+
+        Args:
+            path (str): Path of the report PDF.
+        """
+        with open(os.path.join(self._folder(self.session_id), self.REPORT_FILE), "w", encoding="utf-8") as file:
+            file.write(os.path.abspath(path))
+        self._wake.set()
+
+    def close(self, timeout=None):
+        """
+        Uploads what is left until the timeout, everything else stays spooled.
+
+        Args:
+            timeout (float): Seconds to wait for the uploads, None waits until done.
+        """
+        self._closing.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Whatever the thread didn't get to is picked up by the next session
+        with self._lock:
+            remaining, self._buffer = self._buffer, []
+            sequence = self._next_sequence()
+        if remaining:
+            self._spool(self.session_id, sequence, self._compress(remaining))
+
+    def stats(self):
+        """
+        Returns the upload counters.
+
+        Returns:
+            dict: Events, batches, bytes, spooled batches and retries.
+        """
+        return {"events": self.events, "uploaded": self.uploaded, "batches": self.batches,
+                "raw_bytes": self.raw_bytes, "sent_bytes": self.sent_bytes,
+                "spooled": self.spooled, "retries": self.retries}
+
+    def _run(self):
+        """
+        Works through the spool while the collector takes it, then sends the
+        next batch once it is full or has waited flush_interval. While backing
+        off, events stay in memory up to max_buffered. Ends once closed and
+        everything is uploaded, or the collector stops taking uploads.
+        """
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            closing = self._closing.is_set()
+            delivered = self._drain_spool()
+            if delivered or closing:
+                with self._lock:
+                    batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+                    sequence = self._next_sequence() if batch else None
+                    if len(self._buffer) >= self.batch_size:
+                        self._wake.set()
+                if batch:
+                    body = self._compress(batch)
+                    if not delivered or not self._send_events(self.session_id, self.student, sequence, body):
+                        delivered = False
+                        self._spool(self.session_id, sequence, body)
+            if closing:
+                if not delivered:
+                    # The collector is unreachable, the rest stays spooled for the next session
+                    return
+                with self._lock:
+                    buffered = bool(self._buffer)
+                if not buffered and not self._spool_pending():
+                    return
+                self._wake.set()
+
+    def _drain_spool(self):
+        """
+        Uploads spooled batches and reports, oldest session first.
+
+        Returns:
+            bool: False if the collector didn't take one.
+        """
+        if not os.path.isdir(self.spool_dir):
+            return True
+        for session_id in sorted(os.listdir(self.spool_dir)):
+            folder = self._folder(session_id)
+            try:
+                names = sorted(os.listdir(folder))
+                with open(os.path.join(folder, self.STUDENT_FILE), encoding="utf-8") as file:
+                    student = file.read()
+            except OSError:
+                continue
+            for name in names:
+                sequence = self._batch_number(name)
+                if sequence < 0:
+                    continue
+                path = os.path.join(folder, name)
+                with open(path, "rb") as file:
+                    body = file.read()
+                if not self._send_events(session_id, student, sequence, body):
+                    return False
+                os.remove(path)
+            report = os.path.join(folder, self.REPORT_FILE)
+            if session_id == self.session_id:
+                with self._lock:
+                    buffered = bool(self._buffer)
+                if buffered:
+                    # The report goes out after the last events of the session
+                    continue
+            if os.path.exists(report) and not self._send_report(session_id, student, report):
+                return False
+            # Spools of ended sessions are done, this session's keeps its student
+            if session_id != self.session_id:
+                for name in os.listdir(folder):
+                    os.remove(os.path.join(folder, name))
+                os.rmdir(folder)
+        return True
+
+    def _spool_pending(self):
+        """
+        Checks if anything waits in the spool of this session.
+
+        Returns:
+            bool: True if batches or the report are spooled.
+        """
+        folder = self._folder(self.session_id)
+        return any(self._batch_number(name) >= 0 or name == self.REPORT_FILE for name in os.listdir(folder))
+
+    def _send_events(self, session_id, student, sequence, body):
+        """
+        Uploads one compressed batch.
+
+        Args:
+            session_id (str): Session of the batch.
+            student (str): Student of the session.
+            sequence (int): Sequence number of the batch.
+            body (bytes): Gzip compressed JSON lines.
+
+        Returns:
+            bool: True if the collector accepted the batch.
+        """
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip", "X-LPS-Batch": str(sequence)}
+        if not self._post("/events", session_id, student, body, headers):
+            return False
+        raw = gzip.decompress(body)
+        self.batches += 1
+        self.uploaded += raw.count(b"\n")
+        self.raw_bytes += len(raw)
+        self.sent_bytes += len(body)
+        return True
+
+    def _send_report(self, session_id, student, marker):
+        """
+        Uploads the report named in a spooled report marker and removes the marker.
+
+        Args:
+            session_id (str): Session of the report.
+            student (str): Student of the session.
+            marker (str): Path of the marker file holding the report path.
+
+        Returns:
+            bool: False if the collector didn't take the report.
+        """
+        with open(marker, encoding="utf-8") as file:
+            path = file.read()
+        try:
+            with open(path, "rb") as file:
+                body = file.read()
+        except OSError:
+            # Moved or deleted since, nothing left to upload
+            os.remove(marker)
+            return True
+        if not self._post("/reports", session_id, student, body, {"Content-Type": "application/pdf"}):
+            return False
+        os.remove(marker)
+        return True
+
+    def _post(self, path, session_id, student, body, headers):
+        """
+        Sends a request to the collector unless backing off.
+
+        Args:
+            path (str): Path below the collector URL.
+            session_id (str): Session the data belongs to.
+            student (str): Student of the session.
+            body (bytes): Request body.
+            headers (dict): Additional headers.
+
+        Returns:
+            bool: True on a 2xx answer.
+        """
+        if time.monotonic() < self._retry_at:
+            return False
+        # Imported on the upload thread, it would slow down importing the proctoring core
+        import urllib.error
+        import urllib.request
+        request = urllib.request.Request(self.url + path, data=body, method="POST", headers={
+            **headers, "X-LPS-Session": session_id, "X-LPS-Student": student})
+        retry_after = None
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            self._failures = 0
+            return True
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get("Retry-After")
+        except (OSError, ValueError):
+            pass
+        self.retries += 1
+        self._failures += 1
+        delay = min(self.MAX_BACKOFF, 0.5 * 2 ** (self._failures - 1)) * random.uniform(0.5, 1.0)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.MAX_BACKOFF))
+        self._retry_at = time.monotonic() + delay
+        return False
+
+    def _spool(self, session_id, sequence, body):
+        """
+        Writes a compressed batch to the spool.
+
+        Args:
+            session_id (str): Session of the batch.
+            sequence (int): Sequence number of the batch.
+            body (bytes): Gzip compressed JSON lines.
+        """
+        path = os.path.join(self._folder(session_id), f"{sequence:08d}.ndjson.gz")
+        with open(path + ".tmp", "wb") as file:
+            file.write(body)
+        os.replace(path + ".tmp", path)
+        self.spooled += 1
+
+    def _compress(self, lines):
+        """
+        Compresses encoded events into a batch body.
+
+        Args:
+            lines (list): Events encoded with Journal.dumps.
+
+        Returns:
+            bytes: Gzip compressed JSON lines.
+        """
+        return gzip.compress(("\n".join(lines) + "\n").encode(), compresslevel=6)
+
+    def _next_sequence(self):
+        """
+        Returns the next batch sequence number, called with the lock held.
+
+        Returns:
+            int: Sequence number.
+        """
+        sequence = self._sequence
+        self._sequence += 1
+        return sequence
+
+    def _folder(self, session_id):
+        """
+        Returns the spool folder of a session.
+
+        Args:
+            session_id (str): Identifier of the session.
+
+        Returns:
+            str: Path of the folder.
+        """
+        return os.path.join(self.spool_dir, session_id)
+
+    @staticmethod
+    def _batch_number(name):
+        """
+        Parses the sequence number of a spooled batch from its file name.
+
+        Args:
+            name (str): File name in a spool folder.
+
+        Returns:
+            int: Sequence number, -1 if the file isn't a batch.
+        """
+        stem, _, extension = name.partition(".")
+        return int(stem) if extension == "ndjson.gz" and stem.isdigit() else -1
@@ -0,0 +1,320 @@
+"""
+    Headless session simulator for LPS
+
+    Runs the real orchestration of the proctoring system, its worker factory,
+    queues, session aggregator, journal, notifier, shutdown and report, with
+    synthetic monitoring components in place of the webcam, Chrome and process
+    scanning. Many simulated exams can run at once to measure what one machine
+    can handle.
+
+    Usage: PYTHONPATH=src python benchmarks/bench_sessions.py --sessions 8 --duration 30
+"""
+import os
+import time
+import json
+import random
+import argparse
+import functools
+import statistics
+import multiprocessing
+from datetime import datetime
+
+from proctoring.proctoring import Proctoring
+from proctoring.supervisor import Supervisor
+from proctoring.session import SessionAggregator, GazeAway, ProcessViolation, TabActivity, ProxyStatus, ComponentStopped
+
+# Range of simulated gaze-away durations in seconds, shorter ones are never reported
+GAZE_DURATION = (0.25, 3.0)
+
+# Seconds between proxy statistics, as sent by the real browser
+STATS_INTERVAL = 5
+
+# Longest wait of a synthetic component between two heartbeats, well below the stall timeout
+HEARTBEAT_INTERVAL = 1.0
+
+class SimulatedSession(SessionAggregator):
+    """
+    A session aggregator that also measures end-to-end event latency.
+
+    Attributes:
+        latencies (dict): Seconds from an event happening until it was handled, by event type.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = {"GazeAway": [], "ProcessViolation": [], "TabActivity": []}
+
+    def handle(self, event):
+        """
+        Records the latency of the event and folds it into the session.
+
+        Args:
+            event (tuple): One of the session event types.
+        """
+        if isinstance(event, GazeAway):
+            self.latencies["GazeAway"].append(time.time() - event.start - event.duration)
+        elif isinstance(event, (ProcessViolation, TabActivity)):
+            self.latencies[type(event).__name__].append((datetime.now() - event.timestamp).total_seconds())
+        super().handle(event)
+
+class HeadlessProctoring(Proctoring):
+    """
+    The proctoring system with synthetic monitoring components and no GUI.
+
+    Attributes:
+        notifications (int): Notifications that would have been shown.
+    """
+
+    SESSION_CLASS = SimulatedSession
+    PRELOAD_MODULES = ["psutil", "proctoring.simulator"]
+    METRICS_PORT = 0
+
+    def __init__(self, gaze_rate=1.0, process_rate=0.1, tab_rate=0.1):
+        """
+        Initializes the simulated proctoring system.
+
+        Args:
+            gaze_rate (float): Gaze-away events per second.
+            process_rate (float): Process violations per second.
+            tab_rate (float): Tab events per second.
+        """
+        super().__init__()
+        self.notifications = 0
+        self._run_gaze = functools.partial(simulate_gaze, rate=gaze_rate)
+        self._run_process_monitor = functools.partial(simulate_process_monitor, rate=process_rate)
+        self._run_browser = functools.partial(simulate_browser, rate=tab_rate)
+
+    def usage(self):
+        """
+        Measures CPU time and memory of the orchestrator and every component.
+
+        Returns:
+            dict: CPU seconds and RSS in bytes by component. The session entry is
+                the aggregator thread and shares the orchestrator's memory.
+        """
+        import psutil
+        main = psutil.Process()
+        usage = {"orchestrator": {"cpu": sum(main.cpu_times()[:2]), "rss": main.memory_info().rss}}
+        for thread in main.threads():
+            if thread.id == self._session._thread.native_id:
+                usage["session"] = {"cpu": thread.user_time + thread.system_time, "rss": None}
+        for name, process in self._processes.items():
+            try:
+                worker = psutil.Process(process.pid)
+                usage[name] = {"cpu": sum(worker.cpu_times()[:2]), "rss": worker.memory_info().rss}
+            except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
+                pass
+        return usage
+
+    def _notify(self, title, message):
+        """
+        Counts a notification instead of showing it.
+        """
+        self.notifications += 1
+
+    def _show_error(self, title, message):
+        """
+        Raises the error instead of showing a dialog.
+        """
+        raise RuntimeError(message)
+
+def _emit(stop, rate, send):
+    """
+    Calls send at random intervals averaging rate per second until stopped,
+    beating the heartbeat of the worker meanwhile like a component's main loop.
+
+    Args:
+        stop (Event): Set to stop emitting.
+        rate (float): Average calls per second, 0 to only wait for the stop.
+        send (callable): Called with the running count of calls.
+    """
+    if rate <= 0:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            Supervisor.beat()
+        return
+    count = 0
+    due = time.monotonic()
+    while True:
+        Supervisor.beat()
+        due += random.expovariate(rate)
+        # Wait at most a heartbeat interval at a time, behind schedule at high rates send without waiting
+        while (delay := due - time.monotonic()) > 0:
+            if stop.wait(min(delay, HEARTBEAT_INTERVAL)):
+                return
+            Supervisor.beat()
+        if stop.is_set():
+            return
+        count += 1
+        send(count)
+
+def simulate_gaze(queue, demo, stop, throttle, record, rate):
+    """
+    Synthetic gaze tracking component sending gaze-away events.
+    """
+    def send(count):
+        duration = random.uniform(*GAZE_DURATION)
+        queue.put(GazeAway(time.time() - duration, duration))
+    _emit(stop, rate, send)
+    queue.put(ComponentStopped("gaze", datetime.now()))
+
+def simulate_process_monitor(queue, pid_queue, stop, throttle, enforce, rate):
+    """
+    Synthetic process monitor sending violations of processes never seen before.
+    """
+    _emit(stop, rate, lambda count: queue.put(ProcessViolation(datetime.now(), 100000 + count, f"simulated-{count}")))
+    queue.put(ComponentStopped("process_monitor", datetime.now()))
+
+def simulate_browser(stop, from_queue, pid_queue, event_queue, cache, rate):
+    """
+    Synthetic browser reporting readiness, tab activity and proxy statistics.
+    """
+    from_queue.put({"type": "proxy_ready", "port": 0})
+    from_queue.put("navigated")
+    start = time.monotonic()
+    last_stats = start
+
+    def send(count):
+        nonlocal last_stats
+        event_queue.put(TabActivity(datetime.now(), "navigated", f"https://canvas.kth.se/courses/{count}"))
+        if time.monotonic() - last_stats >= STATS_INTERVAL:
+            last_stats = time.monotonic()
+            event_queue.put(ProxyStatus({"requests": count, "requests_per_second": count / (last_stats - start),
+                                         "errors": 0, "blocked": 0, "tunnelled": 0, "upstream_latency_ms": 0.0, "upstream_latency_max_ms": 0.0,
+                                         "ttfb_ms": 0.0}))
+    _emit(stop, rate, send)
+    event_queue.put(ComponentStopped("browser", datetime.now()))
+
+def run_session(index, folder, duration, rates, results):
+    """
+    Runs one simulated exam in its own folder and reports its measurements.
+
+    Args:
+        index (int): Number of the simulated session.
+        folder (str): Folder the journal and report of the session are written to.
+        duration (float): Seconds the exam runs.
+        rates (dict): Events per second for gaze, process and tab events.
+        results (Queue): Queue the measurements are sent on.
+    """
+    os.makedirs(folder, exist_ok=True)
+    os.chdir(folder)
+    try:
+        exam = HeadlessProctoring(rates["gaze"], rates["process"], rates["tab"])
+        exam.preload()
+        started = time.monotonic()
+        exam.start_exam()
+        start_seconds = time.monotonic() - started
+
+        time.sleep(duration)
+        usage = exam.usage()
+        handled = sum(len(latencies) for latencies in exam._session.latencies.values())
+        elapsed = time.monotonic() - started - start_seconds
+
+        stopping = time.monotonic()
+        exam.end_exam()
+        results.put({
+            "index": index,
+            "start_seconds": start_seconds,
+            "end_seconds": time.monotonic() - stopping,
+            "events_per_second": handled / elapsed,
+            "latencies": exam._session.latencies,
+            "usage": {name: {"cpu_percent": 100 * u["cpu"] / elapsed, "rss": u["rss"]} for name, u in usage.items()},
+            "notifications": exam.notifications
+        })
+    except Exception as e:
+        results.put({"index": index, "error": str(e)})
+
+def simulate(sessions, duration, rates, folder):
+    """
+    Runs simulated exams concurrently, each in its own process.
+
+    Each session process gets its own worker zygote, like one student's machine would.
+
+    Args:
+        sessions (int): Number of concurrent exams.
+        duration (float): Seconds each exam runs.
+        rates (dict): Events per second for gaze, process and tab events.
+        folder (str): Folder for the journals and reports of all sessions.
+
+    Returns:
+        list: Measurements of every session.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=run_session, args=(i, os.path.join(os.path.abspath(folder), f"session-{i}"), duration, rates, results))
+        for i in range(sessions)
+    ]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return sorted(measurements, key=lambda m: m["index"])
+
+def summarize(measurements):
+    """
+    Combines the measurements of all sessions.
+
+    Args:
+        measurements (list): Measurements returned by simulate.
+
+    Returns:
+        dict: Total throughput, latency percentiles in milliseconds, mean CPU and
+            RSS per component, and start and end times.
+    """
+    done = [m for m in measurements if "error" not in m]
+    latencies = sorted(l for m in done for values in m["latencies"].values() for l in values)
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    components = {}
+    for m in done:
+        for name, u in m["usage"].items():
+            components.setdefault(name, []).append(u)
+    return {
+        "sessions": len(measurements),
+        "errors": [m["error"] for m in measurements if "error" in m],
+        "events_per_second": sum(m["events_per_second"] for m in done),
+        "latency_ms": {"p50": percentile(0.5), "p99": percentile(0.99), "max": latencies[-1] * 1000 if latencies else 0.0},
+        "components": {
+            name: {
+                "cpu_percent": statistics.fmean(u["cpu_percent"] for u in usage),
+                "rss_mb": statistics.fmean(u["rss"] for u in usage) / 2**20 if usage[0]["rss"] is not None else None
+            } for name, usage in components.items()
+        },
+        "start_seconds": max((m["start_seconds"] for m in done), default=0.0),
+        "end_seconds": max((m["end_seconds"] for m in done), default=0.0),
+        "notifications": sum(m["notifications"] for m in done)
+    }
+
+def main():
+    """
+    Runs the simulator from the command line and prints a summary.
+    """
+    parser = argparse.ArgumentParser(prog="lps-simulator", description="Load test the proctoring system headlessly")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1], help="concurrent simulated exams, one run per count")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds each exam runs")
+    parser.add_argument("--gaze-rate", type=float, default=1.0, help="gaze-away events per second per exam")
+    parser.add_argument("--process-rate", type=float, default=0.1, help="process violations per second per exam")
+    parser.add_argument("--tab-rate", type=float, default=0.1, help="tab events per second per exam")
+    parser.add_argument("--output", default="./simulation", help="folder for journals and reports")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    rates = {"gaze": args.gaze_rate, "process": args.process_rate, "tab": args.tab_rate}
+    for sessions in args.sessions:
+        summary = summarize(simulate(sessions, args.duration, rates, args.output))
+        if args.json:
+            print(json.dumps(summary, indent=2))
+            continue
+
+        print(f"Sessions: {summary['sessions']}, errors: {len(summary['errors'])}")
+        for error in summary["errors"]:
+            print(f"  {error}")
+        print(f"Throughput: {summary['events_per_second']:.0f} events/s")
+        latency = summary["latency_ms"]
+        print(f"End-to-end latency: p50 {latency['p50']:.2f} ms, p99 {latency['p99']:.2f} ms, max {latency['max']:.2f} ms")
+        print(f"Start: {summary['start_seconds']:.2f} s, stop and report: {summary['end_seconds']:.2f} s, notifications: {summary['notifications']}")
+        print(f"{'component':<18}{'CPU':>8}{'RSS':>10}")
+        for name, usage in summary["components"].items():
+            rss = f"{usage['rss_mb']:.0f} MB" if usage["rss_mb"] is not None else "-"
+            print(f"{name:<18}{usage['cpu_percent']:>7.1f}%{rss:>10}")
+        print()
@@ -0,0 +1,166 @@
+"""
+    Process snapshot module for LPS
+
+    Walks the process table once and indexes it by name and by owner. The
+    startup checks and the initial process list of the exam share one pass
+    instead of walking it once per prohibited name and again at start, and
+    the process monitor scans with the same single pass. Taken on a
+    background thread, so the GUI stays responsive while it runs.
+"""
+import time
+import threading
+from concurrent.futures import Future
+
+class ProcessSnapshot:
+    """
+    A class holding the processes running at one point in time.
+
+    Attributes:
+        taken (float): time.monotonic() when the snapshot was taken.
+        by_name (dict): Process IDs per lowercase process name.
+        by_owner (dict): Processes per username, grouped by name as dicts with
+            pid and username like ProcessMonitor expects them.
+    """
+
+    def __init__(self, by_name, by_owner, taken):
+        """
+        Initializes a snapshot from its indexes, see take.
+
+        Args:
+            by_name (dict): Process IDs per lowercase process name.
+            by_owner (dict): Processes per username, grouped by name.
+            taken (float): time.monotonic() when the snapshot was taken.
+        """
+        self.by_name = by_name
+        self.by_owner = by_owner
+        self.taken = taken
+
+    @classmethod
+    def take(cls):
+        """
+        Walks all processes once and builds the indexes.
+
+        Returns:
+            ProcessSnapshot: The processes running now.
+        """
+        import psutil
+        by_name = {}
+        by_owner = {}
+        for process in psutil.process_iter(['pid', 'name', 'username']):
+            name = process.info['name']
+            if name is None:
+                continue
+            by_name.setdefault(name.lower(), set()).add(process.info['pid'])
+            username = process.info['username']
+            by_owner.setdefault(username, {}).setdefault(name, []).append(
+                {"pid": process.info['pid'], "username": username})
+        return cls(by_name, by_owner, time.monotonic())
+
+    def running(self, name):
+        """
+        Checks if a process with the given name was running.
+
+        Args:
+            name (str): Lowercase process name.
+
+        Returns:
+            bool: True if at least one process had the name.
+        """
+        return name in self.by_name
+
+    def names(self):
+        """
+        Returns the names of all processes.
+
+        Returns:
+            set: Lowercase process names.
+        """
+        return set(self.by_name)
+
+    def user_processes(self, username):
+        """
+        Returns the processes of one user.
+
+        Args:
+            username (str): Owner of the processes.
+
+        Returns:
+            dict: Processes grouped by name, see ProcessMonitor._get_user_processes.
+        """
+        return {name: list(processes) for name, processes in self.by_owner.get(username, {}).items()}
+
+class SnapshotService:
+    """
+    A class to take process snapshots on a background thread and share the latest one.
+
+    Attributes:
+        _lock (threading.Lock): Guards the latest refresh.
+        _future (Future): Result of the latest refresh, None before the first one.
+    """
+
+    def __init__(self):
+        """
+        Initializes the service without taking a snapshot.
+        """
+        self._lock = threading.Lock()
+        self._future = None
+
+    def refresh(self):
+        """
+        Starts taking a new snapshot in the background.
+
+        Returns:
+            Future: Resolves to the new snapshot, or to the error taking it raised.
+        """
+        future = Future()
+        with self._lock:
+            self._future = future
+        threading.Thread(target=self._run, args=(future,), name="process-snapshot", daemon=True).start()
+        return future
+
+    def ready(self):
+        """
+        Checks if get returns without waiting.
+
+        Meant to be polled from the GUI thread, e.g. with Tk's after.
+
+        Returns:
+            bool: True if the latest refresh is done.
+        """
+        with self._lock:
+            future = self._future
+        return future is not None and future.done()
+
+    def get(self, timeout=None):
+        """
+        Returns the snapshot of the latest refresh, waiting for it if needed.
+
+        Starts a refresh if there was none yet.
+
+        Args:
+            timeout (float): Seconds to wait at most, None to wait until it is taken.
+
+        Returns:
+            ProcessSnapshot: The latest snapshot.
+
+        Raises:
+            Exception: The error taking the snapshot raised.
+        """
+        with self._lock:
+            future = self._future
+        if future is None:
+            future = self.refresh()
+        return future.result(timeout)
+
+    @staticmethod
+    def _run(future):
+        """
+        Takes a snapshot and resolves the future of its refresh with it.
+
+        Args:
+            future (Future): Future of the refresh.
+        """
+        try:
+            future.set_result(ProcessSnapshot.take())
+        except Exception as e:
+            future.set_exception(e)
@@ -0,0 +1,314 @@
+"""
+    Worker supervisor module for LPS
+
+    Keeps the monitoring components running for the whole exam. Every
+    supervised worker writes a heartbeat to shared memory from its main loop,
+    and a thread in the main process restarts workers that died or whose
+    heartbeat stopped. Restarts are forked from the preloaded zygote, so a
+    component is usually back within a fraction of a second. The time a
+    component wasn't running is sent to the session as a CoverageGap, so the
+    report says when the exam wasn't monitored instead of silently missing it.
+"""
+import os
+import time
+import threading
+from multiprocessing.connection import wait
+
+from proctoring.session.events import CoverageGap
+
+class Supervised:
+    """
+    A supervised component and the state of its current worker.
+
+    Attributes:
+        component (str): Name of the component, e.g. "gaze".
+        target (callable): Picklable function running the component.
+        args (tuple): Arguments for the target.
+        heartbeat (Value): time.monotonic() of the last heartbeat of the current worker, 0 before the first.
+        process (Process): Current worker, None once the supervisor gave up on the component.
+        started (float): time.monotonic() when the current worker was started.
+        last_beat (float): Last heartbeat seen of the current worker, 0 before the first.
+        restarts (int): Workers started after the first.
+        failures (int): Restarts in a row that didn't get the component running again.
+        gap (dict): Start, detection latency and reason of the gap in progress, None while running.
+    """
+
+    def __init__(self, component, target, args, heartbeat):
+        """
+        Initializes the component without starting a worker.
+
+        Args:
+            component (str): Name of the component.
+            target (callable): Picklable function running the component.
+            args (tuple): Arguments for the target.
+            heartbeat (Value): Shared heartbeat of the component's workers.
+        """
+        self.component = component
+        self.target = target
+        self.args = args
+        self.heartbeat = heartbeat
+        self.process = None
+        self.started = 0.0
+        self.last_beat = 0.0
+        self.restarts = 0
+        self.failures = 0
+        self.gap = None
+
+class Supervisor:
+    """
+    A class to restart monitoring components whose worker died or stalled.
+
+    A worker that exits is noticed at once, a worker whose heartbeat is older
+    than the stall timeout within one interval after that. Stalled workers are
+    killed together with their children before the restart. After max_restarts
+    restarts in a row that didn't get a component running again, it is left
+    down and its gap lasts until the end of the exam.
+
+    Attributes:
+        interval (float): Seconds between two heartbeat checks.
+        stall_timeout (float): Seconds without a heartbeat after which a running worker counts as stalled.
+        startup_timeout (float): Seconds a new worker may take until its first heartbeat.
+        max_restarts (int): Restarts in a row without the component running again before giving up.
+        gaps (list): CoverageGap events sent so far.
+        _workers (WorkerFactory): Starts the workers.
+        _events (Queue): Session event queue for spawn latencies and coverage gaps.
+        _on_restart (callable): Called with the component and its new worker after every restart.
+        _supervised (dict): Supervised components by name.
+        _stop (threading.Event): Set to stop supervising.
+        _wakeup (tuple): Read and write end of a pipe waking the supervisor thread to stop.
+        _thread (threading.Thread): Thread checking the workers.
+    """
+
+    INTERVAL = 0.5
+    # Checks while a restarted worker hasn't run yet, the heartbeat only keeps the latest beat
+    RECOVERY_INTERVAL = 0.01
+    STALL_TIMEOUT = 10.0
+    STARTUP_TIMEOUT = 30.0
+    MAX_RESTARTS = 5
+
+    # Heartbeat of the component running in this process, set by the worker bootstrap
+    _heartbeat = None
+
+    def __init__(self, workers, events, on_restart=None, interval=INTERVAL, stall_timeout=STALL_TIMEOUT,
+                 startup_timeout=STARTUP_TIMEOUT, max_restarts=MAX_RESTARTS):
+        """
+        Initializes the supervisor without supervising anything.
+
+        Args:
+            workers (WorkerFactory): Starts the workers.
+            events (Queue): Session event queue for spawn latencies and coverage gaps.
+            on_restart (callable): Called with the component and its new worker after every restart.
+            interval (float): Seconds between two heartbeat checks.
+            stall_timeout (float): Seconds without a heartbeat after which a running worker counts as
+                stalled, must be longer than the longest pause of a component's main loop.
+            startup_timeout (float): Seconds a new worker may take until its first heartbeat.
+            max_restarts (int): Restarts in a row without the component running again before giving up.
+        """
+        self.interval = interval
+        self.stall_timeout = stall_timeout
+        self.startup_timeout = startup_timeout
+        self.max_restarts = max_restarts
+        self.gaps = []
+        self._workers = workers
+        self._events = events
+        self._on_restart = on_restart
+        self._supervised = {}
+        self._stop = threading.Event()
+        self._wakeup = None
+        self._thread = None
+
+    @classmethod
+    def install(cls, heartbeat):
+        """
+        Sets the heartbeat beat writes to, called in the worker before the component runs.
+
+        Args:
+            heartbeat (Value): Shared heartbeat of the worker, None if not supervised.
+        """
+        cls._heartbeat = heartbeat
+
+    @classmethod
+    def beat(cls):
+        """
+        Signals that the component running in this process is making progress.
+
+        Called once per iteration of the main loop of a component. A single store
+        to shared memory, and nothing if the worker isn't supervised.
+        """
+        if cls._heartbeat is not None:
+            cls._heartbeat.value = time.monotonic()
+
+    def supervise(self, component, target, args):
+        """
+        Starts a worker for a component and restarts it whenever it dies or stalls.
+
+        Args:
+            component (str): Name of the component, e.g. "gaze".
+            target (callable): Picklable function running the component, must call beat.
+            args (tuple): Arguments for the target.
+
+        Returns:
+            Process: The started worker.
+        """
+        supervised = Supervised(component, target, args, self._workers.context.Value("d", 0.0, lock=False))
+        self._supervised[component] = supervised
+        self._spawn(supervised)
+        return supervised.process
+
+    def start(self):
+        """
+        Starts checking the supervised workers.
+        """
+        self._stop.clear()
+        self._wakeup = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops supervising, workers are left running to be stopped by the caller.
+
+        Gaps still in progress are sent as lasting until now.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            os.write(self._wakeup[1], b"\0")
+            self._thread.join()
+            for fd in self._wakeup:
+                os.close(fd)
+            self._thread = None
+        now = time.monotonic()
+        for supervised in self._supervised.values():
+            if supervised.gap is not None:
+                self._close_gap(supervised, now, None)
+
+    def stats(self):
+        """
+        Returns the restarts and coverage gaps of every supervised component.
+
+        Returns:
+            dict: Restarts, number of gaps, seconds not running and whether the
+                supervisor gave up on it by component.
+        """
+        return {
+            name: {
+                "restarts": supervised.restarts,
+                "given_up": supervised.process is None,
+                "gaps": sum(1 for gap in self.gaps if gap.component == name),
+                "gap_seconds": sum(gap.duration for gap in self.gaps if gap.component == name)
+            } for name, supervised in self._supervised.items()
+        }
+
+    @staticmethod
+    def kill(process):
+        """
+        Kills a worker together with its children, e.g. the browser and its proxy.
+
+        Args:
+            process (Process): Worker to kill.
+        """
+        import psutil
+        try:
+            children = psutil.Process(process.pid).children(recursive=True)
+        except psutil.NoSuchProcess:
+            children = []
+        process.kill()
+        for child in children:
+            try:
+                child.kill()
+            except psutil.NoSuchProcess:
+                pass
+
+    def _spawn(self, supervised):
+        """
+        Starts a new worker for a component.
+
+        Args:
+            supervised (Supervised): The component.
+        """
+        supervised.heartbeat.value = 0.0
+        supervised.last_beat = 0.0
+        supervised.started = time.monotonic()
+        supervised.process = self._workers.start(supervised.component, supervised.target, supervised.args,
+                                                 self._events, supervised.heartbeat)
+
+    def _run(self):
+        """
+        Checks the workers once per interval, and at once when one of them exits.
+        While a restarted worker hasn't run yet it is checked more often, so its
+        first heartbeat and the end of the gap are timed precisely.
+        """
+        while True:
+            running = [s for s in self._supervised.values() if s.process is not None]
+            recovering = any(s.gap is not None for s in running)
+            wait([self._wakeup[0]] + [s.process.sentinel for s in running],
+                 timeout=self.RECOVERY_INTERVAL if recovering else self.interval)
+            if self._stop.is_set():
+                return
+            now = time.monotonic()
+            for supervised in self._supervised.values():
+                self._check(supervised, now)
+
+    def _check(self, supervised, now):
+        """
+        Closes the gap of a component running again, and restarts its worker if it died or stalled.
+
+        Args:
+            supervised (Supervised): The component.
+            now (float): time.monotonic() of the check.
+        """
+        beat = supervised.heartbeat.value
+        if beat > supervised.last_beat:
+            supervised.last_beat = beat
+            if supervised.gap is not None:
+                self._close_gap(supervised, beat, beat - supervised.started)
+                supervised.failures = 0
+
+        process = supervised.process
+        if process is None:
+            return
+        if process.exitcode is not None:
+            reason = f"exited with code {process.exitcode}"
+        elif supervised.last_beat:
+            if now - supervised.last_beat <= self.stall_timeout:
+                return
+            reason = "stalled"
+        else:
+            if now - supervised.started <= self.startup_timeout:
+                return
+            reason = "stalled while starting"
+
+        # The component isn't covered since its last heartbeat, or since the worker started if it never beat
+        if supervised.gap is None:
+            since = supervised.last_beat or supervised.started
+            supervised.gap = {"since": since, "detection": now - since, "reason": reason}
+        if process.exitcode is None:
+            self.kill(process)
+        process.join()
+
+        if supervised.failures >= self.max_restarts:
+            print(f"Supervisor: {supervised.component} {reason}, giving up after {supervised.failures} restarts")
+            supervised.process = None
+            return
+        supervised.failures += 1
+        supervised.restarts += 1
+        self._spawn(supervised)
+        print(f"Supervisor: {supervised.component} {reason}, restarted")
+        if self._on_restart:
+            self._on_restart(supervised.component, supervised.process)
+
+    def _close_gap(self, supervised, end, restart):
+        """
+        Sends the gap of a component to the session.
+
+        Args:
+            supervised (Supervised): The component.
+            end (float): time.monotonic() when the gap ended.
+            restart (float): Seconds from the last restart until the component ran again, None if it didn't.
+        """
+        gap = supervised.gap
+        supervised.gap = None
+        start = time.time() - (time.monotonic() - gap["since"])
+        event = CoverageGap(supervised.component, start, end - gap["since"], gap["reason"], gap["detection"], restart)
+        self.gaps.append(event)
+        self._events.put(event)
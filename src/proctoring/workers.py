@@ -0,0 +1,134 @@
+"""
+    Worker factory for LPS
+
+    Starts the monitoring components from a forkserver zygote that imports the
+    heavy component modules once, so every worker is forked with OpenCV,
+    MediaPipe, Selenium and psutil already loaded instead of importing them
+    again on every exam.
+"""
+import time
+import importlib
+import multiprocessing
+from multiprocessing import forkserver
+
+from proctoring.session.events import WorkerStarted, MemoryUsage
+from proctoring.supervisor import Supervisor
+
+class WorkerFactory:
+    """
+    A class to start monitoring component workers from a preloaded zygote.
+
+    The zygote is the multiprocessing forkserver. It is a separate, single
+    threaded process, so forking from it is safe even though the main process
+    runs the GUI and session threads. Workers share the preloaded modules with
+    the zygote copy-on-write.
+
+    Attributes:
+        context (multiprocessing.context.ForkServerContext): Context workers, queues and events are created from.
+        preload (list): Modules imported by the zygote.
+        profile (tuple): Profiling mode and folder workers started from now on profile
+            themselves with, see profiling.run_profiled. None to not profile.
+    """
+
+    def __init__(self, preload):
+        """
+        Initializes the factory without starting the zygote.
+
+        Args:
+            preload (list): Modules the zygote imports before forking workers.
+        """
+        self.context = multiprocessing.get_context("forkserver")
+        self.preload = list(preload)
+        self.profile = None
+        self.context.set_forkserver_preload(self.preload)
+
+    def warm(self):
+        """
+        Starts the zygote if it isn't running.
+
+        Returns immediately, the zygote imports the preloaded modules in the
+        background and the first worker request waits for it to finish.
+        """
+        forkserver.ensure_running()
+
+    def start(self, component, target, args, events, heartbeat=None):
+        """
+        Forks and starts a worker for a component.
+
+        Args:
+            component (str): Name of the component, e.g. "gaze".
+            target (callable): Picklable function running the component.
+            args (tuple): Arguments for the target.
+            events (Queue): Session event queue the spawn latency is reported on.
+            heartbeat (Value): Heartbeat the component writes to, see Supervisor.beat, None if not supervised.
+
+        Returns:
+            Process: The started worker.
+        """
+        process = self.context.Process(
+            target=_bootstrap,
+            args=(component, time.monotonic(), self.preload, events, target, args, self.profile, heartbeat),
+            name=component
+        )
+        process.start()
+        return process
+
+    @staticmethod
+    def memory():
+        """
+        Measures the memory of all processes of the proctoring system.
+
+        Covers this process and every descendant running the same interpreter,
+        which are the zygote, the workers and the multiprocessing helpers. The
+        browser itself is left out as it shares nothing with the zygote.
+
+        Returns:
+            MemoryUsage: Totals over the measured processes.
+        """
+        import psutil
+        main = psutil.Process()
+        executable = main.exe()
+        count = rss = pss = uss = 0
+        for process in [main] + main.children(recursive=True):
+            try:
+                if process.exe() != executable:
+                    continue
+                info = process.memory_full_info()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            count += 1
+            rss += info.rss
+            pss += getattr(info, "pss", info.rss)
+            uss += info.uss
+        return MemoryUsage(count, rss, pss, uss)
+
+def _bootstrap(component, requested, preload, events, target, args, profile=None, heartbeat=None):
+    """
+    Entry point of a worker, reports the spawn latency and runs the component.
+
+    The preloaded modules are imported first so the latency covers everything a
+    component needs before it can run. In a worker forked from the zygote they
+    are already loaded and this costs nothing.
+
+    Args:
+        component (str): Name of the component.
+        requested (float): time.monotonic() when the worker was requested.
+        preload (list): Modules the component needs.
+        events (Queue): Session event queue.
+        target (callable): Function running the component.
+        args (tuple): Arguments for the target.
+        profile (tuple): Profiling mode and folder, None to run the component unprofiled.
+        heartbeat (Value): Heartbeat of the worker, None if not supervised.
+    """
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    Supervisor.install(heartbeat)
+    events.put(WorkerStarted(component, time.monotonic() - requested))
+    if profile is None:
+        target(*args)
+    else:
+        from proctoring.profiling import run_profiled
+        run_profiled(component, *profile, target, args)
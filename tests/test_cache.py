@@ -0,0 +1,221 @@
+"""
+    Unit tests for the proxy asset cache
+
+    Drives the AssetCache against a local stand-in HTTP server the same way the
+    mitmproxy addon does, and runs made-up flows through the addon hooks,
+    without starting a proxy or a browser.
+"""
+import http.client
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import os
+import time
+
+import pytest
+from mitmproxy.http import Response
+from mitmproxy.test import tflow, tutils
+from proctoring.browser.cache_mitm import AssetCache, AssetCacheAddon
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in origin serving a few assets with different caching headers.
+
+    Counts the requests that reach it so tests can tell hits from misses.
+    """
+    ASSETS = {
+        "/app.js": (b"console.log('canvas')", {"Cache-Control": "public, max-age=3600", "ETag": '"js1"'}),
+        "/app.css": (b"body { margin: 0 }", {"Cache-Control": "no-cache", "ETag": '"css1"'}),
+        "/font.woff": (b"F" * 4000, {"Cache-Control": "max-age=3600"}),
+        "/large.woff": (b"L" * 4000, {"Cache-Control": "max-age=3600"}),
+        "/api/user": (b"{}", {"Cache-Control": "private, max-age=60"}),
+        "/nostore.js": (b"1", {"Cache-Control": "no-store"}),
+    }
+    requests = []
+
+    def do_GET(self):
+        StandInHandler.requests.append(self.path)
+        body, headers = self.ASSETS[self.path]
+        if self.headers.get("If-None-Match") and self.headers.get("If-None-Match") == headers.get("ETag"):
+            self.send_response(304)
+            self.send_header("ETag", headers["ETag"])
+            self.end_headers()
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def origin():
+    """
+    Run the stand-in origin on an ephemeral localhost port.
+    """
+    StandInHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def fetch(cache, url):
+    """
+    Fetch a URL through the cache, mirroring the request/response hooks of the addon.
+    """
+    state, data = cache.lookup("GET", url, {})
+    if state == "hit":
+        return data
+
+    headers = data if state == "revalidate" else {}
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port)
+    conn.request("GET", parts.path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return cache.complete("GET", url, {}, response.status, response.getheaders(), body, revalidating=state == "revalidate")
+
+def addon_flow(addon, url, origin_response=None):
+    """
+    Run a flow through the request and response hooks of the addon like mitmproxy does.
+
+    origin_response is called with the request when it reaches origin and returns the response.
+    """
+    flow = tflow.tflow(req=tutils.treq())
+    flow.request.url = url
+    addon.request(flow)
+    if flow.response is None:
+        flow.response = origin_response(flow.request)
+    addon.response(flow)
+    return flow
+
+def test_fresh_response_is_served_from_cache(origin, tmp_path):
+    """
+    Test that a response with max-age is only fetched once.
+    """
+    cache = AssetCache(str(tmp_path))
+    first = fetch(cache, origin + "/app.js")
+    second = fetch(cache, origin + "/app.js")
+
+    assert first[2] == second[2] == b"console.log('canvas')"
+    assert StandInHandler.requests == ["/app.js"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_no_cache_response_is_revalidated_with_etag(origin, tmp_path):
+    """
+    Test that no-cache entries are revalidated and a 304 returns the cached body.
+    """
+    cache = AssetCache(str(tmp_path))
+    fetch(cache, origin + "/app.css")
+    status, _, body = fetch(cache, origin + "/app.css")
+
+    assert status == 200 and body == b"body { margin: 0 }"
+    assert len(StandInHandler.requests) == 2
+    assert cache.stats()["revalidated"] == 1
+
+def test_uncacheable_responses_are_not_stored(origin, tmp_path):
+    """
+    Test that private and no-store responses always go to origin.
+    """
+    cache = AssetCache(str(tmp_path))
+    for _ in range(2):
+        fetch(cache, origin + "/api/user")
+        fetch(cache, origin + "/nostore.js")
+
+    assert len(StandInHandler.requests) == 4
+    assert cache.stats()["entries"] == 0
+
+def test_lru_eviction_respects_size_cap(origin, tmp_path):
+    """
+    Test that the least recently used entry is evicted once the cap is exceeded.
+    """
+    cache = AssetCache(str(tmp_path), max_bytes=8000)
+    fetch(cache, origin + "/font.woff")
+    fetch(cache, origin + "/app.js")
+    fetch(cache, origin + "/font.woff")
+    fetch(cache, origin + "/large.woff")
+
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup("GET", origin + "/app.js", {})[0] == "miss"
+    assert cache.lookup("GET", origin + "/font.woff", {})[0] == "hit"
+    assert cache.size <= cache.max_bytes
+
+def test_cache_survives_restart(origin, tmp_path):
+    """
+    Test that entries written to disk are picked up by a new cache instance.
+    """
+    fetch(AssetCache(str(tmp_path)), origin + "/app.js")
+    cache = AssetCache(str(tmp_path))
+
+    assert fetch(cache, origin + "/app.js")[2] == b"console.log('canvas')"
+    assert StandInHandler.requests == ["/app.js"]
+
+def test_cache_hit_is_not_stored_again(tmp_path):
+    """
+    Test that the response hook leaves hits alone, so they still expire.
+    """
+    addon = AssetCacheAddon()
+    addon.cache = AssetCache(str(tmp_path))
+    url = "https://canvas.kth.se/app.js"
+    origin = lambda request: Response.make(200, b"js", {"Cache-Control": "max-age=3600"})
+    addon_flow(addon, url, origin)
+    expires = addon.cache._entries[AssetCache.key(url)]["expires"]
+
+    time.sleep(0.01)
+    flow = addon_flow(addon, url)
+
+    assert flow.response.content == b"js"
+    assert addon.cache.stats()["stores"] == 1 and addon.cache.stats()["hits"] == 1
+    assert addon.cache._entries[AssetCache.key(url)]["expires"] == expires
+
+def test_age_shortens_freshness(tmp_path):
+    """
+    Test that time spent in upstream caches counts against max-age.
+    """
+    addon = AssetCacheAddon()
+    addon.cache = AssetCache(str(tmp_path))
+    url = "https://canvas.kth.se/app.js"
+    addon_flow(addon, url, lambda request: Response.make(200, b"js", {"Cache-Control": "max-age=600", "Age": "600", "ETag": '"v1"'}))
+
+    assert addon.cache.lookup("GET", url, {})[0] == "revalidate"
+
+def test_lost_body_is_a_miss_without_validators(tmp_path):
+    """
+    Test that a fresh entry whose body is gone is fetched again without conditional headers.
+    """
+    addon = AssetCacheAddon()
+    addon.cache = AssetCache(str(tmp_path))
+    url = "https://canvas.kth.se/app.js"
+    addon_flow(addon, url, lambda request: Response.make(200, b"js", {"Cache-Control": "max-age=3600", "ETag": '"v1"'}))
+    os.remove(os.path.join(str(tmp_path), AssetCache.key(url) + ".body"))
+
+    sent = []
+    flow = addon_flow(addon, url, lambda request: sent.append(dict(request.headers)) or Response.make(200, b"js"))
+
+    assert "If-None-Match" not in sent[0]
+    assert flow.response.status_code == 200
+
+def test_confirmed_copy_that_is_gone_is_not_forwarded_as_304(tmp_path):
+    """
+    Test that the browser never gets a 304 for a request it didn't make conditional.
+    """
+    addon = AssetCacheAddon()
+    addon.cache = AssetCache(str(tmp_path))
+    url = "https://canvas.kth.se/app.css"
+    addon_flow(addon, url, lambda request: Response.make(200, b"css", {"Cache-Control": "no-cache", "ETag": '"v1"'}))
+
+    def origin(request):
+        # Evicted while the revalidation was on its way
+        addon.cache._remove(AssetCache.key(url))
+        return Response.make(304, b"", {"ETag": '"v1"'})
+    flow = addon_flow(addon, url, origin)
+
+    assert flow.response.status_code == 307
+    assert flow.response.headers["Location"] == url
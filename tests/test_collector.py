@@ -0,0 +1,106 @@
+"""
+    Unit tests for the collector service
+
+    Uploads sessions with the real upload client to a collector on localhost
+    and checks the dashboard aggregates and the SQLite store.
+"""
+import gzip
+import json
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import pytest
+
+from proctoring.collector import Collector
+from proctoring.session import Uploader, Journal, SessionStarted, SessionEnded, GazeAway, ProcessViolation
+
+@pytest.fixture
+def collector(tmp_path):
+    collector = Collector(str(tmp_path / "collector.sqlite3"), port=0)
+    collector.start()
+    yield collector
+    collector.stop()
+
+def url(collector, path=""):
+    return f"http://127.0.0.1:{collector.port}{path}"
+
+def get(collector, path):
+    with urllib.request.urlopen(url(collector, path), timeout=5) as response:
+        return json.loads(response.read())
+
+def post_batch(collector, session, batch, events):
+    body = gzip.compress("".join(Journal.dumps(event) + "\n" for event in events).encode())
+    request = urllib.request.Request(url(collector, "/events"), data=body, method="POST", headers={
+        "Content-Encoding": "gzip", "X-LPS-Session": session, "X-LPS-Student": "alice", "X-LPS-Batch": str(batch)})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, None
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("Retry-After")
+
+def exam(session):
+    now = datetime(2025, 1, 1)
+    return [SessionStarted(now, {"slack"}), GazeAway(0.0, 90.0), GazeAway(100.0, 30.0),
+            ProcessViolation(now, 10, "Slack"), ProcessViolation(now, 11, "discord"), SessionEnded(now)]
+
+def test_uploaded_sessions_are_aggregated_and_stored(collector, tmp_path):
+    """
+    Test that a session uploaded by the client shows in the dashboard aggregates
+    and its events and report are stored.
+    """
+    report = tmp_path / "exam_report.pdf"
+    report.write_bytes(b"%PDF report")
+    uploader = Uploader(url(collector), "session-1", "alice", str(tmp_path / "spool"), flush_interval=0.05)
+    uploader.start()
+    for event in exam("session-1"):
+        uploader.add(event)
+    uploader.upload_report(str(report))
+    uploader.close(5)
+
+    assert get(collector, "/students/alice") == {"gaze_away_minutes": 2.0, "violations": 1, "tabs": 0,
+                                                 "sessions": 1, "active": 0, "last_seen": pytest.approx(time.time(), abs=5)}
+    assert list(get(collector, "/students")) == ["alice"]
+    collector.stop()
+    collector.store.open()
+    stored = [record["type"] for _, student, record in collector.store.replay()]
+    assert stored == ["SessionStarted", "GazeAway", "GazeAway", "ProcessViolation", "ProcessViolation", "SessionEnded"]
+    assert collector.store.report("session-1") == b"%PDF report"
+    collector.store.close()
+
+def test_retried_batches_count_once_and_survive_restart(collector, tmp_path):
+    """
+    Test that a batch uploaded twice is aggregated and stored once, and that
+    the aggregates are rebuilt from the store after a restart.
+    """
+    assert post_batch(collector, "session-1", 0, exam("session-1")) == (204, None)
+    assert post_batch(collector, "session-1", 0, exam("session-1")) == (204, None)
+    assert collector.stats()["duplicates"] == 1
+    collector.stop()
+
+    restarted = Collector(collector.store.path, port=0)
+    restarted.start()
+    try:
+        assert get(restarted, "/students/alice")["violations"] == 1
+        assert get(restarted, "/students/alice")["gaze_away_minutes"] == 2.0
+        assert post_batch(restarted, "session-1", 0, exam("session-1")) == (204, None)
+        assert restarted.stats()["duplicates"] == 1
+    finally:
+        restarted.stop()
+
+def test_full_queue_tells_clients_to_back_off(tmp_path):
+    """
+    Test that uploads are refused with Retry-After while the writer is behind.
+    """
+    collector = Collector(str(tmp_path / "collector.sqlite3"), port=0, queue_size=1, write_batch=1)
+    write = collector.store.write
+    collector.store.write = lambda uploads: (time.sleep(0.5), write(uploads))
+    collector.start()
+    try:
+        answers = [post_batch(collector, "session-1", batch, exam("session-1")) for batch in range(4)]
+        assert (503, str(Collector.RETRY_AFTER)) in answers
+        assert collector.stats()["rejected"] >= 1
+    finally:
+        collector.stop()
+    assert collector.store.rows == 6 * collector.stats()["batches"]
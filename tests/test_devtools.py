@@ -0,0 +1,40 @@
+"""
+    Unit tests for the DevTools tab monitor
+
+    Feeds recorded Target domain messages to the monitor without a browser.
+"""
+from proctoring.browser.devtools import TabMonitor
+
+def target(method, target_id, url, title="Canvas", kind="page"):
+    """
+    Build a Target.targetCreated or Target.targetInfoChanged message.
+    """
+    return {"method": method, "params": {"targetInfo": {
+        "targetId": target_id, "type": kind, "title": title, "url": url, "attached": False}}}
+
+def test_tab_lifecycle_is_translated_into_events():
+    """
+    Test that created, navigated and destroyed tabs produce one event each.
+    """
+    monitor = TabMonitor("ws://127.0.0.1:0/devtools/browser", None)
+
+    created = monitor._handle(target("Target.targetCreated", "A1", "https://canvas.kth.se"))
+    navigated = monitor._handle(target("Target.targetInfoChanged", "A1", "https://canvas.kth.se/courses/1"))
+    destroyed = monitor._handle({"method": "Target.targetDestroyed", "params": {"targetId": "A1"}})
+
+    assert (created["event"], created["url"], created["kind"]) == ("created", "https://canvas.kth.se", "page")
+    assert (navigated["event"], navigated["url"]) == ("navigated", "https://canvas.kth.se/courses/1")
+    assert (destroyed["event"], destroyed["url"], destroyed["target_id"]) == ("destroyed", "https://canvas.kth.se/courses/1", "A1")
+
+def test_title_changes_and_unknown_targets_are_ignored():
+    """
+    Test that info changes without a new URL, other target types and unknown
+    destroyed targets produce no events.
+    """
+    monitor = TabMonitor("ws://127.0.0.1:0/devtools/browser", None)
+    monitor._handle(target("Target.targetCreated", "A1", "https://canvas.kth.se"))
+
+    assert monitor._handle(target("Target.targetInfoChanged", "A1", "https://canvas.kth.se", title="Dashboard")) is None
+    assert monitor._handle(target("Target.targetCreated", "W1", "https://canvas.kth.se/sw.js", kind="service_worker")) is None
+    assert monitor._handle({"method": "Target.targetDestroyed", "params": {"targetId": "B2"}}) is None
+    assert monitor._handle({"id": 1, "result": {}}) is None
@@ -0,0 +1,51 @@
+"""
+    Unit tests for the exec permission gate
+
+    Decides execs of this test process, and gates real execs of an unprivileged
+    user where fanotify is permitted.
+"""
+import os
+import pwd
+import subprocess
+
+import pytest
+
+from proctoring.processes.execgate import ExecGate
+
+def test_verdicts_follow_whitelist_owner_and_ancestry():
+    """
+    Test that whitelisted programs are allowed from the cache and others only
+    for other users or descendants of a safe root.
+    """
+    gate = ExecGate(os.getuid(), ["python", "chrome_"], set(), None)
+
+    assert gate.decide(os.getpid(), "/usr/bin/python3", 1)
+    assert gate.decide(os.getpid(), "/usr/bin/python3", 1) and gate.cache_hits == 1
+    assert gate.decide(os.getpid(), "/lib64/ld-linux-x86-64.so.2", 2)
+    assert not gate.decide(os.getpid(), "/usr/bin/discord", 3)
+
+    gate.safe_roots.add(os.getppid())
+    assert gate.decide(os.getpid(), "/usr/bin/discord", 3)
+    assert ExecGate(os.getuid() + 1, [], set(), None).decide(os.getpid(), "/usr/bin/discord", 3)
+
+@pytest.mark.skipif(os.geteuid() != 0 or not ExecGate.supported(), reason="needs root and fanotify")
+def test_gate_denies_exec_before_it_runs():
+    """
+    Test that a non-whitelisted exec of the exam user fails and is reported, while whitelisted ones run.
+    """
+    nobody = pwd.getpwnam("nobody").pw_uid
+    denied = []
+    gate = ExecGate(nobody, ["true"], set(), lambda pid, name: denied.append(name))
+    try:
+        gate.start()
+    except OSError as e:
+        pytest.skip(f"fanotify not permitted: {e}")
+    try:
+        allowed = subprocess.run(["/bin/true"], user=nobody)
+        with pytest.raises(PermissionError):
+            subprocess.run(["/bin/echo"], user=nobody)
+    finally:
+        gate.stop()
+
+    assert allowed.returncode == 0
+    assert denied == ["echo"] and gate.denied == 1
@@ -1,12 +1,16 @@
 """
     Unit tests for the Gaze tracking module
     
-    Tests the utility functions in the Gaze class without initializing
-    the webcam or tracking components.
+    Tests the utility functions in the Gaze class and the offline re-scoring
+    of gaze recordings without initializing the webcam or tracking components.
 """
+import time
+from types import SimpleNamespace
+
 import pytest
 import numpy as np
-from proctoring.gaze import Gaze
+from proctoring.gaze import Gaze, rescore
+from proctoring.gaze.recording import GazeRecording
 
 class MOCK_LM:
     """
@@ -114,4 +118,55 @@ def test_normal_vector_from_two_vectors(gaze):
     v1 = (lms[0].x, lms[0].y, lms[0].z)
     v2 = (lms[1].x, lms[1].y, lms[1].z)
     normal = np.cross(v1, v2) / np.linalg.norm(np.cross(v1, v2))
-    np.testing.assert_almost_equal(gaze.unit_vector_cross(v1, v2), normal)
\ No newline at end of file
+    np.testing.assert_almost_equal(gaze.unit_vector_cross(v1, v2), normal)
+def replay(frames, stop, x_threshold, y_threshold, min_duration, monkeypatch):
+    """
+    Feeds recorded gaze vectors through Gaze._time frame by frame like the live
+    tracker, stopping at the given time, and returns the reported gaze-aways.
+    """
+    events = []
+    tracker = Gaze.__new__(Gaze)
+    tracker._queue = SimpleNamespace(put=events.append)
+    tracker._metrics = SimpleNamespace(inc=lambda name: None)
+    tracker._gazeaway = False
+    tracker._track = {}
+    monkeypatch.setattr(Gaze, "DEFAULT_X_THRESHOLD", x_threshold)
+    monkeypatch.setattr(Gaze, "DEFAULT_Y_THRESHOLD", y_threshold)
+    monkeypatch.setattr(Gaze, "MIN_GAZE_DURATION", min_duration)
+    for t, x, y in frames:
+        monkeypatch.setattr(time, "time", lambda: t)
+        tracker._track["g_normal"] = (x, y, 1.0)
+        tracker._time()
+    if tracker._gazeaway:
+        monkeypatch.setattr(time, "time", lambda: stop)
+        tracker._report()
+    return events
+
+def test_rescoring_matches_live_tracking(tmp_path, monkeypatch):
+    """
+    Test that re-scoring a recording for a grid of settings finds the gaze-aways
+    the live tracker reports for each of them, including one open when it stopped.
+    """
+    rng = np.random.default_rng(1)
+    t = 1000 + np.cumsum(rng.uniform(0.02, 0.05, 3000))
+    # Gaze moves in slow random walks so gaze-aways of all lengths occur
+    x = np.cumsum(rng.normal(0, 0.02, 3000)).astype(np.float32) % 0.4 - 0.2
+    y = np.cumsum(rng.normal(0, 0.01, 3000)).astype(np.float32) % 0.3 - 0.15
+    x[-50:] = 0.3
+    frames = [(float(a), float(b), float(c)) for a, b, c in zip(t, x.astype(np.float32), y.astype(np.float32))]
+    stop = frames[-1][0] + 0.5
+
+    recording = GazeRecording(str(tmp_path / "session.npy"))
+    for frame_time, gx, gy in frames:
+        recording.add(frame_time, (gx, gy, 1.0))
+    recording.end(stop)
+    recording.save()
+
+    xs, ys, mins = (0.1, 0.15), (0.05, 0.1), (0.25, 1.0)
+    counts, seconds = rescore.rescore([recording.path], xs, ys, mins, processes=2)[recording.path]
+    for i, x_threshold in enumerate(xs):
+        for j, y_threshold in enumerate(ys):
+            for k, min_duration in enumerate(mins):
+                events = replay(frames, stop, x_threshold, y_threshold, min_duration, monkeypatch)
+                assert counts[i, j, k] == len(events) > 0
+                assert seconds[i, j, k] == pytest.approx(sum(event.duration for event in events))
@@ -0,0 +1,51 @@
+"""
+    Unit tests for the resource governor
+
+    Feeds the adaptive throttle made-up scheduler statistics of Chrome.
+"""
+import time
+import multiprocessing
+
+from proctoring.governor import Governor
+
+def test_throttle_follows_chrome_starvation():
+    """
+    Test that the throttle level rises while Chrome waits for CPU and falls once it doesn't.
+    """
+    governor = Governor(multiprocessing.get_context("spawn"), interval=0.01)
+    # Nanoseconds running and waiting of one thread, Chrome waits half of the time, then never
+    samples = iter([(0, 0)] + [(i * 10**8, i * 10**8) for i in range(1, 4)] + [(4 * 10**8 + i * 10**8, 3 * 10**8) for i in range(1, 100)])
+    governor._chrome_schedstat = lambda: {(1, 1): next(samples, (10**12, 3 * 10**8))}
+    governor.start(browser_pid=0)
+    time.sleep(0.5)
+    governor.stop()
+
+    assert governor.max_level == len(Governor.GAZE_MAX_FPS) - 1
+    assert governor.throttle.value == 0
+
+def test_starvation_compares_threads_in_both_samples():
+    """
+    Test that exited and new threads are left out of the starvation.
+    """
+    governor = Governor(multiprocessing.get_context("spawn"), interval=1.0)
+    previous = {(1, 1): (10**9, 10**9), (1, 2): (5 * 10**9, 5 * 10**9)}
+    current = {(1, 1): (2 * 10**9, 10**9), (3, 3): (10**9, 9 * 10**9)}
+
+    assert governor._starvation(previous, current) == 0.0
+    current[(1, 1)] = (2 * 10**9, 2 * 10**9)
+    assert governor._starvation(previous, current) == 0.5
+    assert governor._starvation({}, {}) == 0.0
+
+def test_pace_limits_frame_rate_only_when_throttled():
+    """
+    Test that pacing sleeps out the frame budget of the throttle level.
+    """
+    throttle = multiprocessing.get_context("spawn").Value("i", 0, lock=False)
+    start = time.perf_counter()
+    Governor.pace(throttle, start)
+    assert time.perf_counter() - start < 0.01
+
+    throttle.value = 3
+    start = time.perf_counter()
+    Governor.pace(throttle, start)
+    assert time.perf_counter() - start >= 1 / Governor.GAZE_MAX_FPS[3] - 0.01
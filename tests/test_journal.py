@@ -0,0 +1,50 @@
+"""
+    Unit tests for the session journal
+
+    Runs a journaled session and rebuilds it from the journal file.
+"""
+from datetime import datetime
+from multiprocessing import Queue
+
+from proctoring.session import SessionAggregator, Journal, GazeAway, ProcessViolation, TabActivity, ProxyStatus
+
+def run_session(path):
+    """
+    Run a session with a few events and return its snapshot.
+    """
+    now = datetime.now()
+    session = SessionAggregator(Queue(), journal=Journal(path, sync_interval=0.05))
+    session.start({"code"})
+    session._queue.put(GazeAway(1000.0, 1.5))
+    session._queue.put(ProcessViolation(now, 42, "discord"))
+    session._queue.put(ProcessViolation(now, 43, "code"))
+    session._queue.put(TabActivity(now, "created", "https://canvas.kth.se"))
+    session._queue.put(ProxyStatus({"requests": 10, "blocked": 1, "upstream_latency_ms": 12.5}))
+    session.stop()
+    return session.snapshot()
+
+def test_recovered_session_matches_original(tmp_path):
+    """
+    Test that recovering from the journal gives the same session.
+    """
+    path = tmp_path / "session.jsonl"
+    snapshot = run_session(path)
+
+    assert SessionAggregator.recover(path).snapshot() == snapshot
+
+def test_recovery_after_crash(tmp_path):
+    """
+    Test that a cut-off last record is skipped and the end time is estimated.
+    """
+    path = tmp_path / "session.jsonl"
+    snapshot = run_session(path)
+    lines = path.read_text().splitlines(keepends=True)
+    ended = [line for line in lines if '"SessionEnded"' in line]
+    # Drop the end of the session and cut off the last record mid-write
+    kept = [line for line in lines if line not in ended]
+    path.write_text("".join(kept) + '{"type":"GazeAway","start":10')
+
+    recovered = SessionAggregator.recover(path).snapshot()
+    assert recovered["gazeaway"] == snapshot["gazeaway"]
+    assert recovered["violations"] == snapshot["violations"]
+    assert recovered["end"] is not None
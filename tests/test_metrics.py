@@ -0,0 +1,52 @@
+"""
+    Unit tests for the metrics registry
+
+    Sends buffered metrics through a real queue and scrapes the local endpoint.
+"""
+import urllib.request
+from multiprocessing import Queue
+
+from proctoring.session.metrics import Metrics, Registry, MetricsServer
+
+def test_buffered_metrics_are_aggregated():
+    """
+    Test that a buffer sends one update per flush and the registry sums counters and summaries.
+    """
+    queue = Queue()
+    metrics = Metrics("gaze", queue, interval=3600)
+    registry = Registry()
+    for _ in range(3):
+        metrics.inc("frames_total")
+        metrics.observe("frame_seconds", 0.5)
+        metrics.tick()
+    metrics.set("fps", 30)
+    metrics.flush()
+    metrics.inc("frames_total", 2)
+    metrics.flush()
+
+    registry.update(queue.get(timeout=5))
+    registry.update(queue.get(timeout=5))
+    assert queue.empty()
+    assert registry.snapshot() == [
+        ("fps", "gaze", 30),
+        ("frame_seconds_count", "gaze", 3),
+        ("frame_seconds_sum", "gaze", 1.5),
+        ("frames_total", "gaze", 5)
+    ]
+
+def test_endpoint_serves_prometheus_text():
+    """
+    Test that the endpoint collects gauges on scrape and renders the text format.
+    """
+    registry = Registry()
+    registry.inc("session", "events_total", 7)
+    server = MetricsServer(registry, lambda: registry.set("events", "queue_depth", 2), port=0)
+    port = server.start()
+    try:
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+        body = opener.open(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    finally:
+        server.stop()
+
+    assert '# TYPE lps_events_total counter\nlps_events_total{component="session"} 7\n' in body
+    assert 'lps_queue_depth{component="events"} 2' in body
@@ -0,0 +1,73 @@
+"""
+    Unit tests for the notification dispatcher
+
+    Uses short windows and a recording send callback instead of desktop notifications.
+"""
+import time
+
+from proctoring.notifier import Notifier
+
+SUMMARY = "{count} processes blocked: {items}"
+
+def recording_notifier(**kwargs):
+    """
+    Create a notifier that records sent notifications.
+    """
+    sent = []
+    notifier = Notifier(lambda title, message: sent.append((title, message)), **kwargs)
+    return notifier, sent
+
+def test_burst_is_merged_into_summary():
+    """
+    Test that notifications with the same title inside the window are sent once.
+    """
+    notifier, sent = recording_notifier(window=0.2, interval=0)
+    notifier.start()
+    for name in ["a", "b", "c", "d", "e", "f", "g"]:
+        notifier.notify("Process identified", f"Blocked {name}", item=name, summary=SUMMARY)
+    notifier.notify("Gazeaway", "1 minute")
+    time.sleep(0.5)
+    notifier.stop()
+
+    assert sorted(sent) == [("Gazeaway", "1 minute"),
+                            ("Process identified", "7 processes blocked: a, b, c, d, e and 2 more")]
+    assert notifier.stats() == {"sent": 2, "merged": 6, "dropped": 0}
+
+def test_rate_limit_delays_and_merges():
+    """
+    Test that a title is not sent twice within the interval, later ones are merged.
+    """
+    notifier, sent = recording_notifier(window=0, interval=0.5)
+    notifier.start()
+    notifier.notify("Gazeaway", "1 minute")
+    time.sleep(0.1)
+    notifier.notify("Gazeaway", "2 minutes")
+    notifier.notify("Gazeaway", "3 minutes")
+    time.sleep(0.1)
+    assert sent == [("Gazeaway", "1 minute")]
+
+    time.sleep(0.5)
+    notifier.stop()
+    assert sent == [("Gazeaway", "1 minute"), ("Gazeaway", "3 minutes")]
+
+def test_full_queue_drops_without_blocking():
+    """
+    Test that notify never blocks and counts dropped notifications.
+    """
+    notifier, sent = recording_notifier(maxsize=2)
+    for i in range(5):
+        notifier.notify("Gazeaway", str(i))
+    assert notifier.dropped == 3
+
+def test_stop_without_flush_drops_pending():
+    """
+    Test that notifications still waiting for their window are dropped when stopping without flushing.
+    """
+    notifier, sent = recording_notifier(window=10, interval=0)
+    notifier.start()
+    notifier.notify("Process identified", "Blocked a", item="a", summary=SUMMARY)
+    notifier.notify("Process identified", "Blocked b", item="b", summary=SUMMARY)
+    notifier.stop(timeout=1, flush=False)
+
+    assert sent == []
+    assert notifier.stats() == {"sent": 0, "merged": 1, "dropped": 2}
@@ -0,0 +1,183 @@
+"""
+    Unit tests for the in-process exam proxy
+
+    Starts the proxy on a free port and sends plain HTTP requests and tunnels
+    through it to local stand-in origins.
+"""
+import ssl
+import time
+import asyncio
+import http.client
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from mitmproxy import certs
+from proctoring.browser import whitelist_mitm
+from proctoring.browser.proxy import ProxyEngine
+from proctoring.browser.dns_mitm import DnsCache
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in origin serving one cacheable asset.
+    """
+    requests = 0
+
+    def do_GET(self):
+        StandInHandler.requests += 1
+        body = b"console.log('canvas')"
+        self.send_response(200)
+        self.send_header("Cache-Control", "public, max-age=3600")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def origin(monkeypatch):
+    """
+    Run the stand-in origin on an ephemeral localhost port and whitelist it.
+    """
+    StandInHandler.requests = 0
+    monkeypatch.setattr(whitelist_mitm, "WHITELIST_PATTERNS", [whitelist_mitm.format_domain_pattern("127.0.0.1")])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def tls_origin(origin, tmp_path):
+    """
+    Run the stand-in origin over TLS with a self-signed certificate.
+    """
+    key, cert = certs.create_ca("LPS test", "127.0.0.1", 2048)
+    (tmp_path / "origin.pem").write_bytes(
+        key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+        + cert.public_bytes(serialization.Encoding.PEM))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(tmp_path / "origin.pem")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1], cert.public_bytes(serialization.Encoding.DER)
+    server.shutdown()
+    server.server_close()
+
+def get(port, url):
+    """
+    Send a GET request through the proxy and return the status.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", url)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+def test_proxy_is_ready_and_counts_only_upstream_latency(origin, tmp_path):
+    """
+    Test that the proxy reports its port once listening and that blocked requests
+    and cache hits don't count as upstream responses.
+    """
+    engine = ProxyEngine(port=0, cache_dir=str(tmp_path))
+    port = engine.start()
+    try:
+        assert get(port, origin + "/app.js") == 200
+        assert get(port, origin + "/app.js") == 200
+        assert get(port, "http://example.com/") == 403
+        snapshot = engine.snapshot()
+    finally:
+        engine.stop()
+
+    assert port == engine.stats.port
+    assert StandInHandler.requests == 1
+    assert snapshot["requests"] == 3 and snapshot["blocked"] == 1
+    assert snapshot["cache"]["hits"] == 1
+    assert engine.stats._latency_count == 1
+
+def test_tunnels_are_decided_at_connect(tls_origin, tmp_path):
+    """
+    Test that whitelisted hosts are tunnelled with the origin's own certificate
+    and others are refused before any handshake.
+    """
+    origin_port, origin_cert = tls_origin
+    engine = ProxyEngine(port=0)
+    port = engine.start()
+    try:
+        conn = http.client.HTTPSConnection("127.0.0.1", port, timeout=10, context=ssl._create_unverified_context())
+        conn.set_tunnel("127.0.0.1", origin_port)
+        conn.request("GET", "/app.js")
+        assert conn.sock.getpeercert(binary_form=True) == origin_cert
+        assert conn.getresponse().read() == b"console.log('canvas')"
+        conn.close()
+
+        blocked = http.client.HTTPSConnection("127.0.0.1", port, timeout=10)
+        blocked.set_tunnel("example.com", 443)
+        with pytest.raises(OSError, match="403"):
+            blocked.request("GET", "/")
+        snapshot = engine.snapshot()
+    finally:
+        engine.stop()
+
+    assert snapshot["tunnelled"] == 1 and snapshot["blocked"] == 1
+    assert snapshot["requests"] == 0
+
+def test_dns_cache_respects_ttl_and_shares_lookups():
+    """
+    Test that concurrent lookups resolve once and the entry expires with its TTL.
+    """
+    resolved = []
+
+    async def resolve(host):
+        resolved.append(host)
+        await asyncio.sleep(0.01)
+        return ["127.0.0.1"], 0.1
+
+    async def run():
+        cache = DnsCache(resolve, min_ttl=0)
+        first = await asyncio.gather(*(cache.lookup("canvas.test") for _ in range(5)))
+        cached = await cache.lookup("canvas.test")
+        await asyncio.sleep(0.15)
+        expired = await cache.lookup("canvas.test")
+        return cache, first + [cached, expired]
+
+    cache, addresses = asyncio.run(run())
+    assert addresses == [["127.0.0.1"]] * 7
+    assert resolved == ["canvas.test"] * 2
+    assert cache.stats() == {"hits": 5, "misses": 2, "hosts": 1}
+
+def test_proxy_connects_to_cached_address(origin, monkeypatch):
+    """
+    Test that upstream hosts are resolved through the warmed cache and requests still reach them by name.
+    """
+    resolved = []
+
+    async def resolve(host):
+        resolved.append(host)
+        return ["127.0.0.1"], 60
+
+    monkeypatch.setattr(whitelist_mitm, "WHITELIST_PATTERNS", [whitelist_mitm.format_domain_pattern("canvas.test")])
+    engine = ProxyEngine(port=0)
+    engine.dns.cache.resolve = resolve
+    engine.dns.warm_hosts = ["canvas.test"]
+    port = engine.start()
+    url = origin.replace("127.0.0.1", "canvas.test")
+    try:
+        deadline = time.monotonic() + 5
+        while not engine.dns.cache.stats()["hosts"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert get(port, url + "/app.js") == 200
+        assert get(port, url + "/app.js") == 200
+        snapshot = engine.snapshot()
+    finally:
+        engine.stop()
+
+    assert resolved == ["canvas.test"]
+    assert snapshot["dns"] == {"hits": 2, "misses": 1, "hosts": 1}
+    assert snapshot["ttfb_ms"] >= snapshot["upstream_latency_ms"] > 0
@@ -0,0 +1,90 @@
+"""
+    Unit tests for the incremental report
+
+    Renders a report while a session runs and checks the text of the PDF.
+"""
+import re
+import zlib
+import base64
+from array import array
+from datetime import datetime
+from multiprocessing import Queue
+
+import numpy as np
+import pytest
+
+from proctoring.report import Report, ReportWriter, Export
+from proctoring.session import SessionAggregator, GazeAway, ProcessViolation, TabActivity, CoverageGap
+
+def pdf_text(path):
+    """
+    Returns the content streams of a PDF as one string, ReportLab encodes them as ASCII85 over Flate.
+    """
+    streams = re.findall(rb"stream\r?\n(.*?)~>\s*endstream", path.read_bytes(), re.DOTALL)
+    return "\n".join(zlib.decompress(base64.a85decode(stream.replace(b"\n", b""))).decode("latin-1") for stream in streams)
+
+def test_report_rendered_during_session(tmp_path):
+    """
+    Test that accepted events are rendered in the background and the summary is added at the end.
+    """
+    path = tmp_path / "report.pdf"
+    writer = ReportWriter(str(path))
+    writer.start()
+    now = datetime.now()
+    session = SessionAggregator(Queue(), report=writer)
+    session.start({"code"})
+    session._queue.put(GazeAway(now.timestamp(), 90.0))
+    session._queue.put(ProcessViolation(now, 42, "discord"))
+    session._queue.put(ProcessViolation(now, 43, "code"))
+    session._queue.put(TabActivity(now, "created", "https://canvas.kth.se"))
+    session._queue.put(CoverageGap("gaze", now.timestamp(), 12.5, "exited with code 1", 0.01, 0.4))
+    session.end()
+    session.stop()
+    snapshot = session.snapshot()
+    snapshot["profile"] = [("gaze", "_analyze (gaze.py:163)", 1200, 2.5), ("browser", "run (browser.py:80)", None, 0.75)]
+    writer.finish(snapshot)
+
+    text = pdf_text(path)
+    assert writer.rows == 2
+    assert "discord \\(PID 42\\)" in text
+    assert "PID 43" not in text
+    assert "https://canvas.kth.se" in text
+    assert "Total Time Gazing Away: 1.5 minutes" in text
+    assert "Gaze Away:" in text
+    assert "Not Monitored: gaze 12.5 s in 1 coverage gaps" in text
+    assert "Coverage Gaps:" in text and "exited with code 1" in text
+    assert "_analyze \\(gaze.py:163\\)" in text and "2.500" in text
+    assert np.load(tmp_path / "report-gaze.npy").tolist() == [[now.timestamp(), 90.0]]
+    export = next(path for path in tmp_path.iterdir() if path.suffix in (".npz", ".parquet"))
+    assert Export.read(export)["violation_name"].tolist() == ["discord"]
+
+def test_gaze_timeline_splits_intervals_between_minutes():
+    """
+    Test that intervals are binned per minute and split at minute boundaries.
+    """
+    intervals = np.array([[10.0, 5.0], [50.0, 20.0], [130.0, 100.0]])
+
+    timeline = Report.gaze_timeline(intervals, 0.0, 300.0)
+
+    assert timeline == pytest.approx([15.0, 10.0, 50.0, 50.0, 0.0])
+    assert Report.gaze_histogram(intervals).tolist() == [0, 0, 0, 0, 1, 1, 0, 1]
+
+@pytest.mark.parametrize("extension", ["npz", "parquet"])
+def test_export_round_trip(tmp_path, extension):
+    """
+    Test that an exported session reads back with the same columns in either format.
+    """
+    if extension == "parquet":
+        pytest.importorskip("pyarrow")
+    now = datetime.now()
+    session = {
+        "start": now, "end": now, "gazeaway": 4.0, "gaze_intervals": array("d", [1000.0, 1.5, 1010.0, 2.5]),
+        "violations": [ProcessViolation(now, 42, "discord")]
+    }
+    columns = Export.columns(session)
+    path = getattr(Export, f"write_{extension}")(columns, str(tmp_path / f"session.{extension}"))
+
+    exported = Export.read(path)
+    assert exported.keys() == columns.keys()
+    for name, values in columns.items():
+        assert exported[name].tolist() == values.tolist()
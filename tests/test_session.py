@@ -0,0 +1,62 @@
+"""
+    Unit tests for the session aggregator
+
+    Feeds typed events through a real multiprocessing queue and checks the
+    resulting session snapshot.
+"""
+from datetime import datetime
+from multiprocessing import Queue
+
+import pytest
+from proctoring.session import SessionAggregator, GazeAway, ProcessViolation, TabActivity, ProxyStatus
+
+@pytest.fixture
+def session():
+    """
+    Create a started session that records notifications instead of showing them.
+    """
+    notifications = []
+    session = SessionAggregator(Queue(), lambda title, message, **kwargs: notifications.append(title))
+    session.notifications = notifications
+    session.start({"bash", "code"})
+    yield session
+
+def test_events_are_folded_into_snapshot(session):
+    """
+    Test that all event types end up in the snapshot once the session is stopped.
+    """
+    now = datetime.now()
+    session._queue.put(GazeAway(1000.0, 1.5))
+    session._queue.put(GazeAway(1010.0, 2.5))
+    session._queue.put(ProcessViolation(now, 42, "discord"))
+    session._queue.put(TabActivity(now, "created", "https://canvas.kth.se"))
+    session._queue.put(ProxyStatus({"requests": 10, "blocked": 1}))
+    session.stop()
+
+    snapshot = session.snapshot()
+    assert snapshot["gazeaway"] == pytest.approx(4.0)
+    assert list(snapshot["gaze_intervals"]) == [1000.0, 1.5, 1010.0, 2.5]
+    assert snapshot["violations"] == [ProcessViolation(now, 42, "discord")]
+    assert snapshot["tabs"][0].url == "https://canvas.kth.se"
+    assert snapshot["proxy"]["blocked"] == 1
+    assert snapshot["start"] <= snapshot["end"]
+
+def test_processes_running_at_start_are_not_violations(session):
+    """
+    Test that processes from the initial snapshot are ignored, case insensitively.
+    """
+    session._queue.put(ProcessViolation(datetime.now(), 1, "Code"))
+    session.stop()
+
+    assert session.snapshot()["violations"] == []
+    assert session.notifications == []
+
+def test_gazeaway_notifies_once_per_minute(session):
+    """
+    Test that a gaze-away warning is only sent when a new full minute is reached.
+    """
+    for _ in range(5):
+        session._queue.put(GazeAway(0.0, 30.0))
+    session.stop()
+
+    assert session.notifications == ["Gazeaway", "Gazeaway"]
@@ -0,0 +1,71 @@
+"""
+    Shutdown protocol tests
+
+    Ends an exam whose monitoring processes are stand-in workers, one that
+    flushes and acknowledges the stop and one that ignores it.
+"""
+import sys
+import time
+import subprocess
+from datetime import datetime
+
+import psutil
+
+from proctoring.proctoring import Proctoring
+from proctoring.report import ReportWriter
+from proctoring.notifier import Notifier
+from proctoring.session import SessionAggregator, GazeAway, ComponentStopped
+from proctoring.session.metrics import MetricsServer
+
+def acknowledging(stop, events):
+    """
+    Stand-in worker flushing a gaze-away interval on stop and acknowledging.
+    """
+    stop.wait()
+    events.put(GazeAway(time.time(), 30.0))
+    events.put(ComponentStopped("gaze", datetime.now()))
+
+def stubborn(stop, events, pids):
+    """
+    Stand-in worker with a child process that ignores the stop.
+    """
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    pids.put(child.pid)
+    while True:
+        time.sleep(1)
+
+def test_stragglers_are_killed_and_queued_events_reported(tmp_path, capsys):
+    """
+    Test that the acknowledging worker's events reach the report, the stubborn
+    worker and its child are killed at the deadline and nothing waits longer.
+    """
+    proctoring = Proctoring(governor=False)
+    proctoring.SHUTDOWN_TIMEOUT = 2.0
+    events = proctoring._queues["events"]
+    pids = proctoring._queues["internal_pid"]
+    proctoring._report = ReportWriter(str(tmp_path / "report.pdf"))
+    proctoring._report.start()
+    proctoring._notifier = Notifier(lambda title, message: None, window=60)
+    proctoring._notifier.start()
+    proctoring._session = SessionAggregator(events, proctoring._notifier.notify, report=proctoring._report)
+    proctoring._session.start(set())
+    proctoring._metrics_server = MetricsServer(proctoring._session.metrics)
+    proctoring._processes = {
+        "gaze": proctoring._workers.start("gaze", acknowledging, (proctoring._stop, events), events),
+        "browser": proctoring._workers.start("browser", stubborn, (proctoring._stop, events, pids), events)
+    }
+    child = psutil.Process(pids.get(timeout=30))
+    proctoring.running = True
+
+    start = time.monotonic()
+    proctoring.end_exam()
+    elapsed = time.monotonic() - start
+
+    session = proctoring._session
+    assert elapsed < proctoring.SHUTDOWN_TIMEOUT + 1
+    assert "killed: ['browser'], unacknowledged: ['browser']" in capsys.readouterr().out
+    assert list(session.stopped) == ["gaze"] and session.stopped["gaze"] >= session.end_time
+    assert session.gazeaway == 30.0 and list(session.gaze_intervals)[1::2] == [30.0]
+    assert all(process is None for process in proctoring._processes.values())
+    assert not child.is_running() or child.status() == psutil.STATUS_ZOMBIE
+    assert (tmp_path / "report.pdf").exists()
@@ -0,0 +1,20 @@
+"""
+    Tests for the headless session simulator
+
+    Runs a short simulated exam through the real orchestration and report path.
+"""
+from proctoring.simulator import simulate, summarize
+
+def test_simulated_exam_produces_report(tmp_path):
+    """
+    Test that a simulated exam handles events and writes a journal and report.
+    """
+    measurements = simulate(1, 1.0, {"gaze": 50, "process": 5, "tab": 5}, tmp_path)
+    summary = summarize(measurements)
+
+    assert summary["errors"] == []
+    assert summary["events_per_second"] > 0
+    assert {"orchestrator", "gaze", "browser", "process_monitor"} <= set(summary["components"])
+    exams = tmp_path / "session-0" / "exams"
+    assert list(exams.glob("exam_report-*.pdf"))
+    assert list((exams / "journal").glob("session-*.jsonl"))
@@ -0,0 +1,57 @@
+"""
+    Unit tests for the process snapshot service
+
+    Takes real snapshots of the processes running the tests.
+"""
+import os
+import pwd
+
+import psutil
+import pytest
+
+from proctoring.snapshot import ProcessSnapshot, SnapshotService
+
+def test_snapshot_indexes_by_name_and_owner():
+    """
+    Test that the test process is found by name and among the processes of its user.
+    """
+    snapshot = ProcessSnapshot.take()
+    name = psutil.Process().name()
+    username = pwd.getpwuid(os.getuid())[0]
+
+    assert snapshot.running(name.lower())
+    assert os.getpid() in snapshot.by_name[name.lower()]
+    assert {"pid": os.getpid(), "username": username} in snapshot.user_processes(username)[name]
+
+def test_service_shares_snapshot_until_refreshed():
+    """
+    Test that the service hands out the same snapshot until a refresh and the new one after.
+    """
+    service = SnapshotService()
+    first = service.get(timeout=10)
+
+    assert service.ready()
+    assert service.get(timeout=10) is first
+
+    second = service.refresh().result(timeout=10)
+    assert second is not first
+    assert service.get(timeout=10) is second
+
+def test_failed_snapshot_is_raised_and_refresh_recovers(monkeypatch):
+    """
+    Test that an error taking a snapshot reaches the caller and doesn't block later refreshes.
+    """
+    def fail(cls):
+        raise RuntimeError("no /proc")
+
+    service = SnapshotService()
+    monkeypatch.setattr(ProcessSnapshot, "take", classmethod(fail))
+    service.refresh()
+
+    with pytest.raises(RuntimeError):
+        service.get(timeout=10)
+    assert service.ready()
+
+    monkeypatch.undo()
+    service.refresh()
+    assert isinstance(service.get(timeout=10), ProcessSnapshot)
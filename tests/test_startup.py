@@ -0,0 +1,19 @@
+"""
+    Startup tests
+
+    Checks that loading the GUI does not import the monitoring dependencies,
+    which are only needed once the exam starts.
+"""
+import sys
+import subprocess
+
+HEAVY_MODULES = ["cv2", "mediapipe", "selenium", "psutil", "plyer", "reportlab", "mitmproxy"]
+
+def test_gui_imports_no_monitoring_dependencies():
+    """
+    Test that importing the proctoring system and GUI leaves the heavy modules unloaded.
+    """
+    probe = f"import sys, proctoring, proctoring.examGUI; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+                            env={"PYTHONPATH": ":".join(p for p in sys.path if p)})
+    assert result.stdout.strip() == "[]"
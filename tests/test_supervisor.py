@@ -0,0 +1,94 @@
+"""
+    Unit tests for the worker supervisor
+
+    Supervises real workers from the forkserver zygote that crash or stall
+    on their first run and checks the restarts and coverage gaps.
+"""
+import os
+import sys
+import time
+
+import pytest
+
+from proctoring.workers import WorkerFactory
+from proctoring.supervisor import Supervisor
+from proctoring.session import CoverageGap
+
+def fail_once(flag, failure, stop):
+    """
+    Worker target that crashes or stalls on its first run and beats until stopped after that.
+    """
+    Supervisor.beat()
+    if failure and not os.path.exists(flag):
+        open(flag, "w").close()
+        if failure == "crash":
+            sys.exit(3)
+        time.sleep(60)
+    while not stop.wait(0.01):
+        Supervisor.beat()
+
+def crash(stop):
+    """
+    Worker target that always crashes before it runs.
+    """
+    sys.exit(1)
+
+@pytest.fixture
+def factory():
+    factory = WorkerFactory(["json"])
+    factory.warm()
+    return factory
+
+def supervise(factory, target, args, **options):
+    """
+    Supervises a worker until it failed and ran again, or the supervisor gave up.
+
+    Returns:
+        tuple: The supervisor, the workers it started and the stop event of the worker.
+    """
+    stop = factory.context.Event()
+    events = factory.context.Queue()
+    restarted = []
+    supervisor = Supervisor(factory, events, lambda component, process: restarted.append(process),
+                            interval=0.05, **options)
+    first = supervisor.supervise("test", target, args + (stop,))
+    supervisor.start()
+    deadline = time.monotonic() + 30
+    while not supervisor.gaps and not supervisor.stats()["test"]["given_up"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    supervisor.stop()
+    stop.set()
+    for process in [first] + restarted:
+        process.join(timeout=30)
+    return supervisor, [first] + restarted
+
+@pytest.mark.parametrize("failure, reason", [("crash", "exited with code 3"), ("stall", "stalled")])
+def test_failed_worker_is_restarted_and_gap_recorded(factory, tmp_path, failure, reason):
+    """
+    Test that a crashed or stalled worker is replaced and the time it wasn't
+    running is recorded with detection and restart latency.
+    """
+    supervisor, workers = supervise(factory, fail_once, (str(tmp_path / "failed"), failure), stall_timeout=0.5)
+
+    assert len(workers) == 2
+    assert workers[0].exitcode == (3 if failure == "crash" else -9)
+    assert workers[1].exitcode == 0
+    [gap] = supervisor.gaps
+    assert isinstance(gap, CoverageGap)
+    assert gap.component == "test" and gap.reason == reason
+    assert gap.start == pytest.approx(time.time(), abs=30)
+    assert gap.restart is not None and 0 < gap.restart < gap.duration
+    if failure == "stall":
+        assert gap.detection >= 0.5
+    assert supervisor.stats()["test"] == {"restarts": 1, "given_up": False, "gaps": 1, "gap_seconds": gap.duration}
+
+def test_supervisor_gives_up_on_crash_loop(factory):
+    """
+    Test that a component that never runs again is left down after the
+    restart limit and its gap lasts until the supervisor stops.
+    """
+    supervisor, workers = supervise(factory, crash, (), max_restarts=2)
+
+    assert len(workers) == 3 and supervisor.stats()["test"]["given_up"]
+    [gap] = supervisor.gaps
+    assert gap.reason == "exited with code 1" and gap.restart is None
@@ -0,0 +1,127 @@
+"""
+    Unit tests for the session upload client
+
+    Uploads to a stand-in collector on localhost that records what it receives,
+    can be slowed down and can refuse uploads.
+"""
+import gzip
+import json
+import time
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from proctoring.session import Uploader, GazeAway, ProcessViolation
+
+class Collector(BaseHTTPRequestHandler):
+    """
+    Stand-in collector, answers 503 with Retry-After while refusing.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.delay)
+        if self.server.refuse:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/events":
+            assert self.headers["Content-Encoding"] == "gzip"
+            lines = gzip.decompress(body).decode().splitlines()
+            self.server.events.extend(json.loads(line) for line in lines)
+            self.server.batches.append(int(self.headers["X-LPS-Batch"]))
+        else:
+            self.server.reports.append((self.headers["X-LPS-Session"], self.headers["X-LPS-Student"], body))
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def collector():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Collector)
+    server.delay = 0
+    server.refuse = False
+    server.events = []
+    server.batches = []
+    server.reports = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+
+def violations(count):
+    return [ProcessViolation(datetime(2025, 1, 1), i, f"proc-{i}") for i in range(count)]
+
+def test_events_and_report_are_delivered(collector, tmp_path):
+    """
+    Test that events arrive in batches in order and the report after them.
+    """
+    report = tmp_path / "exam_report.pdf"
+    report.write_bytes(b"%PDF report")
+    uploader = Uploader(collector.url, "session-1", "student", str(tmp_path / "spool"), batch_size=100, flush_interval=0.05)
+    uploader.start()
+    for event in violations(250):
+        uploader.add(event)
+    uploader.add(GazeAway(1735689600.0, 2.5))
+    uploader.upload_report(str(report))
+    uploader.close(5)
+
+    assert [event["pid"] for event in collector.events[:250]] == list(range(250))
+    assert collector.events[-1] == {"type": "GazeAway", "start": 1735689600.0, "duration": 2.5}
+    assert collector.batches == sorted(collector.batches)
+    assert collector.reports == [("session-1", "student", b"%PDF report")]
+    assert uploader.stats()["uploaded"] == 251
+    assert uploader.stats()["sent_bytes"] < uploader.stats()["raw_bytes"]
+    assert not list((tmp_path / "spool" / "session-1").glob("*.gz"))
+
+def test_offline_session_is_spooled_and_resumed(collector, tmp_path):
+    """
+    Test that a session ending while the collector refuses is spooled with a
+    bounded buffer and delivered by the next session.
+    """
+    spool = str(tmp_path / "spool")
+    report = tmp_path / "exam_report.pdf"
+    report.write_bytes(b"%PDF report")
+    collector.refuse = True
+    offline = Uploader(collector.url, "session-1", "student", spool, batch_size=50, flush_interval=0.05, max_buffered=100)
+    offline.start()
+    for event in violations(300):
+        offline.add(event)
+        assert len(offline._buffer) <= 100
+    offline.upload_report(str(report))
+    offline.close(1)
+    assert collector.events == [] and offline.stats()["spooled"] > 0
+
+    collector.refuse = False
+    online = Uploader(collector.url, "session-2", "student", spool, flush_interval=0.05)
+    online.start()
+    online.close(5)
+
+    assert sorted(event["pid"] for event in collector.events) == list(range(300))
+    assert collector.reports == [("session-1", "student", b"%PDF report")]
+    assert not (tmp_path / "spool" / "session-1").exists()
+
+def test_slow_collector_does_not_block_adding(collector, tmp_path):
+    """
+    Test that adding events stays fast while the collector is slow, and
+    everything still arrives.
+    """
+    collector.delay = 0.05
+    uploader = Uploader(collector.url, "session-1", "student", str(tmp_path / "spool"), batch_size=100, flush_interval=0.05)
+    uploader.start()
+    start = time.perf_counter()
+    for event in violations(2000):
+        uploader.add(event)
+    elapsed = time.perf_counter() - start
+    uploader.close(10)
+
+    assert elapsed < 0.5
+    assert sorted(event["pid"] for event in collector.events) == list(range(2000))
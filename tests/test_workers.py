@@ -0,0 +1,69 @@
+"""
+    Unit tests for the worker factory
+
+    Starts real workers from the forkserver zygote.
+"""
+import os
+import time
+
+import pytest
+
+from proctoring.workers import WorkerFactory
+from proctoring.profiling import summarize
+from proctoring.session import WorkerStarted, MemoryUsage
+
+def report_pid(queue):
+    """
+    Worker target sending its process ID.
+    """
+    queue.put(os.getpid())
+
+def test_worker_reports_spawn_latency_and_runs():
+    """
+    Test that a worker reports its spawn latency before running its target.
+    """
+    factory = WorkerFactory(["json"])
+    factory.warm()
+    events = factory.context.Queue()
+    process = factory.start("test", report_pid, (events,), events)
+    started = events.get(timeout=30)
+    pid = events.get(timeout=30)
+    process.join(timeout=30)
+
+    assert isinstance(started, WorkerStarted)
+    assert started.component == "test" and started.latency >= 0
+    assert pid == process.pid and process.exitcode == 0
+
+def test_memory_covers_this_process():
+    """
+    Test that the memory measurement includes at least this process.
+    """
+    memory = WorkerFactory.memory()
+    assert isinstance(memory, MemoryUsage)
+    assert memory.processes >= 1 and memory.rss >= memory.uss > 0
+
+def busy(seconds):
+    """
+    Worker target keeping the CPU busy in a function of its own.
+    """
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(1000))
+
+@pytest.mark.parametrize("mode", ["cprofile", "sample"])
+def test_profiled_worker_dumps_its_profile(tmp_path, mode):
+    """
+    Test that a worker started while profiling dumps a profile that the
+    summary attributes to its component and function.
+    """
+    factory = WorkerFactory(["json"])
+    factory.profile = (mode, str(tmp_path / "session"))
+    events = factory.context.Queue()
+    process = factory.start("test", busy, (0.3,), events)
+    process.join(timeout=30)
+
+    assert process.exitcode == 0
+    rows = summarize(str(tmp_path / "session"))
+    component, function, calls, seconds = next(row for row in rows if row[1].startswith("busy"))
+    assert component == "test" and seconds > 0
+    assert (calls >= 1) if mode == "cprofile" else (calls is None)